@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.db.base import get_db
-from app.llm.vision_client_cached import extract_requirements_from_image_async, is_vl_available
+from app.llm import vision_engine
 from app.schemas.image import ImageAnalysisRequest, ImageAnalysisResponse
 from app.services.documents import save_upload_file
 import logging
@@ -36,7 +36,7 @@ async def analyze_image(
         ImageAnalysisResponse: 包含提取的需求文本和元数据
     """
     # 检查VL模型是否可用
-    if not is_vl_available():
+    if not vision_engine.is_available():
         raise HTTPException(
             status_code=503,
             detail="Vision-Language model is not available. Please check dashscope installation."
@@ -77,13 +77,12 @@ async def analyze_image(
         logger.info(f"Analyzing image: {saved_path}")
 
         # 使用VL模型提取需求（带缓存）
-        extracted_text = await extract_requirements_from_image_async(
-            image_path=saved_path,
+        extracted_text = await vision_engine.analyze(
+            saved_path,
             api_key=vl_config["api_key"],
             model=vl_config["model"],
             base_url=vl_config.get("base_url"),
-            use_cache=True,
-            cache_ttl=7 * 24 * 60 * 60  # 7天缓存
+            prompt_mode="requirement",
         )
 
         # 清理临时文件
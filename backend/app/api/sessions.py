@@ -2,12 +2,16 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Depends, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import session_events
 from app.db import get_db
 from app.schemas import (
     PaginationMeta,
+    SessionBatchCreateRequest,
+    SessionBatchCreateResponse,
+    SessionBatchProgress,
     SessionConfirmationRequest,
     SessionCreateRequest,
     SessionCreateResponse,
@@ -18,6 +22,7 @@ from app.schemas import (
 )
 from app.services import sessions as session_service
 from app.orchestrator import workflow
+from app.orchestrator.batch import batch_scheduler
 
 router = APIRouter()
 
@@ -37,12 +42,17 @@ async def create_session(
     db_session: Annotated[AsyncSession, Depends(get_db)],
     background_tasks: BackgroundTasks,
 ) -> SessionCreateResponse:
+    if workflow.draining:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is shutting down, retry shortly")
     session = await session_service.create_session(
         db_session,
         document_ids=payload.document_ids,
         config=payload.config,
         created_by=payload.created_by,
+        force_regenerate=payload.force_regenerate,
     )
+    # 先提交再启动：队列模式下 worker 可能在请求返回前就取到任务，会话必须已可见
+    await db_session.commit()
     await workflow.launch(session.id)
     return SessionCreateResponse(
         session_id=session.id,
@@ -51,6 +61,43 @@ async def create_session(
     )
 
 
+@router.post(
+    "/batch",
+    summary="Create many analysis sessions and schedule them at a bounded rate",
+    response_model=SessionBatchCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_session_batch(
+    payload: SessionBatchCreateRequest,
+    db_session: Annotated[AsyncSession, Depends(get_db)],
+) -> SessionBatchCreateResponse:
+    if workflow.draining:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is shutting down, retry shortly")
+    batch = await session_service.create_batch(
+        db_session,
+        items=[item.model_dump() for item in payload.items],
+        config=payload.config,
+        created_by=payload.created_by,
+        force_regenerate=payload.force_regenerate,
+    )
+    batch_scheduler.submit(batch.session_ids)
+    return SessionBatchCreateResponse(batch_id=batch.id, session_ids=batch.session_ids)
+
+
+@router.get(
+    "/batch/{batch_id}",
+    summary="Aggregate progress of a session batch",
+    response_model=SessionBatchProgress,
+)
+async def get_session_batch(
+    batch_id: str,
+    db_session: Annotated[AsyncSession, Depends(get_db)],
+) -> SessionBatchProgress:
+    progress = await session_service.get_batch_progress(db_session, batch_id)
+    progress["sessions"] = [_to_session_summary(item) for item in progress["sessions"]]
+    return SessionBatchProgress(**progress)
+
+
 @router.get("", summary="List sessions", response_model=SessionListResponse)
 async def list_sessions(
     db_session: Annotated[AsyncSession, Depends(get_db)],
@@ -92,6 +139,7 @@ async def confirm_session(
     session = await session_service.advance_session(
         db_session,
         session_id=session_id,
+        stage=payload.stage,
         decision=payload.decision,
         comment=payload.comment,
     )
@@ -101,6 +149,15 @@ async def confirm_session(
     }
 
 
+@router.post("/{session_id}/cancel", summary="Cancel a running analysis session")
+async def cancel_session(
+    session_id: str,
+    db_session: Annotated[AsyncSession, Depends(get_db)],
+):
+    session = await session_service.cancel_session(db_session, session_id=session_id)
+    return {"session_id": session.id, "status": session.status.value, "cancelled": True}
+
+
 @router.get(
     "/{session_id}/results",
     summary="Fetch latest session results",
@@ -127,3 +184,16 @@ async def get_session_results(
         version=latest.version,
         generated_at=latest.created_at,
     )
+
+
+@router.get("/{session_id}/spans", summary="Fetch timing spans of the latest workflow run")
+async def get_session_spans(
+    session_id: str,
+    db_session: Annotated[AsyncSession, Depends(get_db)],
+) -> dict:
+    session = await session_service.get_session(db_session, session_id)
+    spans = await session_events.fetch_spans(session_id)
+    if spans is None and session.results:
+        latest = max(session.results, key=lambda res: res.version)
+        spans = (latest.metrics or {}).get("spans")
+    return {"session_id": session_id, "spans": spans or []}
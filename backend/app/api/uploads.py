@@ -20,5 +20,10 @@ async def upload_document(
     """Persist the uploaded document and return metadata."""
 
     result = await documents.handle_upload(db_session, file=file)
-    return DocumentUploadResponse(document=result["document"], is_duplicate=result["is_duplicate"])
+    return DocumentUploadResponse(
+        document=result["document"],
+        is_duplicate=result["is_duplicate"],
+        near_duplicate_of=result.get("near_duplicate_of"),
+        similarity=result.get("similarity"),
+    )
 
@@ -20,6 +20,10 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     for event in history:
         await websocket.send_json(event)
 
+    # 中途加入的客户端一次性接收正在生成中的累计文本，而不是逐个片段回放
+    for snapshot in await session_events.fetch_stream_snapshots(session_id):
+        await websocket.send_json({**snapshot, "snapshot": True})
+
     await manager.connect(session_id, websocket)
 
     try:
@@ -39,8 +43,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
 
                     logger.info(f"收到确认消息: session={session_id}, stage={stage}, result_id={result_id}")
 
-                    # 将确认信息存储到 Redis,供 workflow 等待
-                    await session_events.set_confirmation(
+                    # 存储确认信息并通知等待中的 workflow
+                    await session_events.publish_confirmation(
                         session_id,
                         {
                             "stage": stage,
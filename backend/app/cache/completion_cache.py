@@ -0,0 +1,140 @@
+"""Two-tier (in-process LRU, then Redis) cache of chat completions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_RESULTS = ("memory_hit", "redis_hit", "miss")
+
+
+class _LRU:
+    """Thread-safe LRU of ``key -> (expires_at, value)``."""
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.completion_cache_max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_memory = _LRU()
+_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(_RESULTS, 0))
+_counts_lock = threading.Lock()
+
+
+def compute_key(model: str, system_message: str, prompt: str) -> str:
+    """Return the content address of a completion request."""
+    material = json.dumps(
+        {"model": model, "system": system_message, "prompt": prompt}, ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _redis_key(key: str) -> str:
+    return f"completion_cache:{key}"
+
+
+def _count(stage: str, result: str) -> None:
+    with _counts_lock:
+        _counts[stage][result] += 1
+
+
+async def lookup(key: str, *, stage: str) -> str | None:
+    """Return the cached completion for ``key``, if any."""
+    content = _memory.get(key)
+    if content is not None:
+        _count(stage, "memory_hit")
+        return content
+    if redis is not None:
+        try:
+            content = await redis.get(_redis_key(key))
+        except RedisError:  # pragma: no cover - cache is best effort
+            content = None
+        if content is not None:
+            _memory.put(key, content, settings.completion_cache_ttl_seconds)
+            _count(stage, "redis_hit")
+            return content
+    _count(stage, "miss")
+    return None
+
+
+async def store(key: str, content: str) -> None:
+    """Cache a finished completion in both tiers."""
+    if not content:
+        return
+    ttl = settings.completion_cache_ttl_seconds
+    _memory.put(key, content, ttl)
+    if redis is None:
+        return
+    try:
+        await redis.set(_redis_key(key), content, ex=ttl)
+    except RedisError as exc:  # pragma: no cover - cache is best effort
+        logger.warning("Failed to store completion cache entry: %s", exc)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Return hit and miss counts and the hit rate per stage."""
+    with _counts_lock:
+        snapshot = {stage: dict(counts) for stage, counts in _counts.items()}
+    for counts in snapshot.values():
+        total = sum(counts[result] for result in _RESULTS)
+        hits = counts["memory_hit"] + counts["redis_hit"]
+        counts["hit_rate"] = round(hits / total, 4) if total else 0.0
+    return snapshot
+
+
+def reset() -> None:
+    """Drop the in-process tier and the counters (Redis entries expire on their own)."""
+    _memory.clear()
+    with _counts_lock:
+        _counts.clear()
+
+
+def render_metrics() -> str:
+    """Render per-stage lookup counters in the Prometheus text exposition format."""
+    lines = [
+        "# HELP llm_completion_cache_lookups_total Completion cache lookups by stage and result.",
+        "# TYPE llm_completion_cache_lookups_total counter",
+    ]
+    for stage, counts in sorted(stats().items()):
+        for result in _RESULTS:
+            lines.append(
+                f'llm_completion_cache_lookups_total{{stage="{stage}",result="{result}"}} {counts[result]}'
+            )
+    return "\n".join(lines) + "\n"
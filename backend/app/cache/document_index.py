@@ -0,0 +1,141 @@
+"""Near-duplicate index over uploaded documents and their reusable section artifacts."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Iterable
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+from app.parsers import minhash
+
+logger = logging.getLogger(__name__)
+
+_memory_signatures: dict[str, list[int]] = {}
+_memory_buckets: dict[str, set[str]] = {}
+_memory_links: dict[str, dict[str, Any]] = {}
+_memory_artifacts: dict[tuple[str, str], dict[str, str]] = {}
+
+
+def _signature_key(document_id: str) -> str:
+    return f"docindex:signature:{document_id}"
+
+
+def _bucket_key(band_key: str) -> str:
+    return f"docindex:bucket:{band_key}"
+
+
+def _link_key(document_id: str) -> str:
+    return f"docindex:link:{document_id}"
+
+
+def _artifacts_key(document_id: str, kind: str) -> str:
+    return f"docindex:artifacts:{document_id}:{kind}"
+
+
+async def register(document_id: str, signature: list[int]) -> None:
+    """Add a document signature to the index."""
+    ttl = settings.session_ttl_seconds
+    if redis is None:
+        _memory_signatures[document_id] = signature
+        for band_key in minhash.band_keys(signature):
+            _memory_buckets.setdefault(band_key, set()).add(document_id)
+        return
+    try:
+        await redis.set(_signature_key(document_id), json.dumps(signature), ex=ttl)
+        for band_key in minhash.band_keys(signature):
+            await redis.sadd(_bucket_key(band_key), document_id)
+            await redis.expire(_bucket_key(band_key), ttl)
+    except RedisError as exc:  # pragma: no cover - index is best effort
+        logger.warning("Failed to index document %s: %s", document_id, exc)
+
+
+async def _candidates(signature: list[int]) -> set[str]:
+    band_keys = minhash.band_keys(signature)
+    if redis is None:
+        return set().union(*(_memory_buckets.get(key, set()) for key in band_keys))
+    candidates: set[str] = set()
+    for key in band_keys:
+        candidates.update(await redis.smembers(_bucket_key(key)))
+    return candidates
+
+
+async def _signature(document_id: str) -> list[int] | None:
+    if redis is None:
+        return _memory_signatures.get(document_id)
+    raw = await redis.get(_signature_key(document_id))
+    return json.loads(raw) if raw else None
+
+
+async def find_similar(signature: list[int], *, exclude: str | None = None) -> tuple[str, float] | None:
+    """Return ``(document_id, similarity)`` of the most similar indexed document above the threshold."""
+    best: tuple[str, float] | None = None
+    try:
+        for candidate in await _candidates(signature):
+            if candidate == exclude:
+                continue
+            other = await _signature(candidate)
+            if other is None:
+                continue
+            score = minhash.similarity(signature, other)
+            if score >= settings.near_duplicate_threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+    except RedisError as exc:  # pragma: no cover - index is best effort
+        logger.warning("Near-duplicate lookup failed: %s", exc)
+        return None
+    return best
+
+
+async def link(document_id: str, source_id: str, similarity: float) -> None:
+    """Record that ``document_id`` is a near duplicate of ``source_id``."""
+    entry = {"source": source_id, "similarity": similarity}
+    if redis is None:
+        _memory_links[document_id] = entry
+        return
+    try:
+        await redis.set(_link_key(document_id), json.dumps(entry), ex=settings.session_ttl_seconds)
+    except RedisError as exc:  # pragma: no cover - index is best effort
+        logger.warning("Failed to link document %s: %s", document_id, exc)
+
+
+async def get_link(document_id: str) -> dict[str, Any] | None:
+    """Return ``{"source", "similarity"}`` for a near-duplicate document, if any."""
+    if redis is None:
+        return _memory_links.get(document_id)
+    try:
+        raw = await redis.get(_link_key(document_id))
+        return json.loads(raw) if raw else None
+    except RedisError:  # pragma: no cover - index is best effort
+        return None
+
+
+async def save_artifact(document_ids: Iterable[str], kind: str, key: str, value: Any) -> None:
+    """Store an artifact of one document section under each of ``document_ids``."""
+    payload = json.dumps(value, ensure_ascii=False)
+    for document_id in document_ids:
+        if redis is None:
+            _memory_artifacts.setdefault((document_id, kind), {})[key] = payload
+            continue
+        try:
+            await redis.hset(_artifacts_key(document_id, kind), key, payload)
+            await redis.expire(_artifacts_key(document_id, kind), settings.session_ttl_seconds)
+        except RedisError as exc:  # pragma: no cover - index is best effort
+            logger.warning("Failed to store %s artifact for %s: %s", kind, document_id, exc)
+
+
+async def load_artifact(document_ids: Iterable[str], kind: str, key: str) -> Any | None:
+    """Return the first artifact stored for ``key`` under any of ``document_ids``."""
+    for document_id in document_ids:
+        if redis is None:
+            raw = _memory_artifacts.get((document_id, kind), {}).get(key)
+        else:
+            try:
+                raw = await redis.hget(_artifacts_key(document_id, kind), key)
+            except RedisError:  # pragma: no cover - index is best effort
+                raw = None
+        if raw is not None:
+            return json.loads(raw)
+    return None
@@ -1,12 +1,13 @@
 """Image VL extraction result caching."""
 
+import asyncio
 import json
 import hashlib
 import logging
 from typing import Optional
 from pathlib import Path
 
-from app.cache.redis_client import redis_client
+from app.cache.redis_client import redis
 
 logger = logging.getLogger(__name__)
 
@@ -34,26 +35,36 @@ def get_image_hash(image_path: str | Path) -> str:
     return sha256_hash.hexdigest()
 
 
-async def get_cached_extraction(image_path: str | Path, model: str) -> Optional[str]:
+def _cache_key(model: str, image_hash: str, prompt_mode: str) -> str:
+    # 不同提示词模式的输出不同，需分别缓存
+    return f"{CACHE_PREFIX}:{model}:{prompt_mode}:{image_hash}"
+
+
+async def get_cached_extraction(
+    image_path: str | Path, model: str, prompt_mode: str = "requirement"
+) -> Optional[str]:
     """
     从缓存获取VL模型提取的结果。
 
     Args:
         image_path: 图片文件路径
         model: 使用的VL模型名称
+        prompt_mode: 提示词模式
 
     Returns:
         缓存的提取文本，如果不存在则返回None
     """
+    if redis is None:
+        return None
     try:
         # 计算图片哈希
-        image_hash = get_image_hash(image_path)
+        image_hash = await asyncio.to_thread(get_image_hash, image_path)
 
         # 构建缓存键：包含模型名称以区分不同模型的结果
-        cache_key = f"{CACHE_PREFIX}:{model}:{image_hash}"
+        cache_key = _cache_key(model, image_hash, prompt_mode)
 
         # 从Redis获取缓存
-        cached_data = await redis_client.get(cache_key)
+        cached_data = await redis.get(cache_key)
 
         if cached_data:
             logger.info(f"Cache hit for image hash {image_hash[:8]}... with model {model}")
@@ -73,6 +84,7 @@ async def cache_extraction(
     image_path: str | Path,
     model: str,
     extracted_text: str,
+    prompt_mode: str = "requirement",
     ttl: int = DEFAULT_TTL
 ) -> bool:
     """
@@ -82,28 +94,32 @@ async def cache_extraction(
         image_path: 图片文件路径
         model: 使用的VL模型名称
         extracted_text: 提取的文本
+        prompt_mode: 提示词模式
         ttl: 缓存时间（秒）
 
     Returns:
         是否缓存成功
     """
+    if redis is None:
+        return False
     try:
         # 计算图片哈希
-        image_hash = get_image_hash(image_path)
+        image_hash = await asyncio.to_thread(get_image_hash, image_path)
 
         # 构建缓存键
-        cache_key = f"{CACHE_PREFIX}:{model}:{image_hash}"
+        cache_key = _cache_key(model, image_hash, prompt_mode)
 
         # 准备缓存数据
         cache_data = {
             "extracted_text": extracted_text,
             "model": model,
+            "prompt_mode": prompt_mode,
             "image_hash": image_hash,
             "text_length": len(extracted_text)
         }
 
         # 存储到Redis
-        await redis_client.set(
+        await redis.set(
             cache_key,
             json.dumps(cache_data, ensure_ascii=False),
             ex=ttl
@@ -131,25 +147,28 @@ async def invalidate_cache(image_path: str | Path, model: Optional[str] = None)
     Returns:
         是否删除成功
     """
+    if redis is None:
+        return False
     try:
         # 计算图片哈希
-        image_hash = get_image_hash(image_path)
+        image_hash = await asyncio.to_thread(get_image_hash, image_path)
 
         if model:
-            # 删除特定模型的缓存
-            cache_key = f"{CACHE_PREFIX}:{model}:{image_hash}"
-            deleted = await redis_client.delete(cache_key)
+            # 删除特定模型的缓存（所有提示词模式）
+            pattern = f"{CACHE_PREFIX}:{model}:*:{image_hash}"
+            keys = [key async for key in redis.scan_iter(match=pattern)]
+            deleted = await redis.delete(*keys) if keys else 0
             logger.info(f"Deleted cache for model {model}, image hash {image_hash[:8]}...")
         else:
             # 删除所有模型的缓存
             # 使用pattern匹配所有相关的键
-            pattern = f"{CACHE_PREFIX}:*:{image_hash}"
+            pattern = f"{CACHE_PREFIX}:*:*:{image_hash}"
             keys = []
-            async for key in redis_client.scan_iter(match=pattern):
+            async for key in redis.scan_iter(match=pattern):
                 keys.append(key)
 
             if keys:
-                deleted = await redis_client.delete(*keys)
+                deleted = await redis.delete(*keys)
                 logger.info(f"Deleted {deleted} cache entries for image hash {image_hash[:8]}...")
             else:
                 deleted = 0
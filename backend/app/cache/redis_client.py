@@ -20,12 +20,14 @@ class InMemoryRedis:
     def __init__(self) -> None:
         self._store: dict[str, list[str]] = {}
         self._kv: dict[str, str] = {}
+        self._sets: dict[str, set[str]] = {}
+        self._hashes: dict[str, dict[str, str]] = {}
 
     async def ping(self) -> bool:
         return True
 
-    async def rpush(self, key: str, value: str) -> None:
-        self._store.setdefault(key, []).append(value)
+    async def rpush(self, key: str, *values: str) -> None:
+        self._store.setdefault(key, []).extend(values)
 
     async def expire(self, key: str, _ttl: int) -> None:  # noqa: D401
         return
@@ -38,12 +40,35 @@ class InMemoryRedis:
             end = min(len(values), end + 1)
         return values[start:end]
 
-    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+    async def set(
+        self, key: str, value: str, ex: int | None = None, px: int | None = None, nx: bool = False
+    ) -> bool | None:
+        if nx and key in self._kv:
+            return None
         self._kv[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._kv.pop(key, None) is not None for key in keys)
+
+    async def exists(self, *keys: str) -> int:
+        return sum(key in self._kv for key in keys)
 
     async def get(self, key: str) -> str | None:
         return self._kv.get(key)
 
+    async def sadd(self, key: str, *values: str) -> None:
+        self._sets.setdefault(key, set()).update(values)
+
+    async def smembers(self, key: str) -> set[str]:
+        return set(self._sets.get(key, set()))
+
+    async def hset(self, key: str, field: str, value: str) -> None:
+        self._hashes.setdefault(key, {})[field] = value
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self._hashes.get(key, {}).get(field)
+
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -0,0 +1,101 @@
+"""Reuse the results of earlier sessions with identical documents and configuration."""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Config keys that do not influence the generated output (bookkeeping added by the API)
+_VOLATILE_CONFIG_KEYS = {"force_regenerate", "confirmations", "batch_id", "cancelled"}
+
+_memory_entries: dict[str, Dict[str, Any]] = {}
+
+
+def _entry_key(cache_key: str) -> str:
+    return f"result_cache:{cache_key}"
+
+
+@lru_cache()
+def prompt_fingerprint() -> str:
+    """Hash the stage runner sources, which embed every stage prompt."""
+    from app.llm import autogen_runner, vision_engine
+
+    digest = hashlib.sha256()
+    for module in (autogen_runner, vision_engine):
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _model_names() -> dict[str, Any]:
+    return {
+        "analysis": settings.get_agent_config("analysis")["model"],
+        "test": settings.get_agent_config("test")["model"],
+        "review": settings.get_agent_config("review")["model"],
+        "vl": settings.vl_model if settings.vl_enabled else None,
+        "pdf_ocr": settings.pdf_ocr_model if settings.pdf_ocr_enabled else None,
+        "multimodal": settings.analysis_multimodal_enabled,
+    }
+
+
+def compute_key(checksums: Iterable[str], config: Dict[str, Any]) -> str:
+    """Return the cache key for a document set and session configuration."""
+    material = {
+        "documents": sorted(checksums),
+        "config": {k: v for k, v in (config or {}).items() if k not in _VOLATILE_CONFIG_KEYS},
+        "prompts": prompt_fingerprint(),
+        "models": _model_names(),
+        "chunking": {
+            "text_limit": settings.document_text_limit,
+            "chunk_tokens": settings.analysis_chunk_tokens,
+        },
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(stage_payloads: Iterable[Any], test_cases: Dict[str, Any]) -> bool:
+    """Return whether a finished result may be memoized.
+
+    A stored result is served to every later session with the same inputs, so
+    results where a stage reported an ``error`` (such as unparsable model
+    output) or that contain no test cases are not stored.
+    """
+    if any(isinstance(payload, dict) and payload.get("error") for payload in stage_payloads):
+        return False
+    modules = test_cases.get("modules") if isinstance(test_cases, dict) else None
+    return any(isinstance(module, dict) and module.get("cases") for module in modules or [])
+
+
+async def lookup(cache_key: str) -> Dict[str, Any] | None:
+    """Return ``{"session_id", "version"}`` of the memoized result, if any."""
+    if redis is None:
+        return _memory_entries.get(cache_key)
+    try:
+        raw = await redis.get(_entry_key(cache_key))
+        return json.loads(raw) if raw else None
+    except RedisError:
+        return _memory_entries.get(cache_key)
+
+
+async def store(cache_key: str, *, session_id: str, version: int) -> None:
+    """Register a completed session result under ``cache_key``."""
+    entry = {"session_id": session_id, "version": version}
+    if redis is None:
+        _memory_entries[cache_key] = entry
+        return
+    try:
+        # Results live as long as their session, so the entry never outlives its source
+        await redis.set(_entry_key(cache_key), json.dumps(entry), ex=settings.session_ttl_seconds)
+    except RedisError:  # pragma: no cover - cache is best effort
+        _memory_entries[cache_key] = entry
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 from typing import Any, Dict, List
 
 from redis import RedisError
 
 from app.cache.redis_client import redis
 from app.config import settings
+from app.utils import tracing
+
+logger = logging.getLogger(__name__)
 
 
 def _events_key(session_id: str) -> str:
@@ -23,9 +28,32 @@ def _confirmation_key(session_id: str) -> str:
     return f"session:{session_id}:confirmation"
 
 
+def _confirmation_channel(session_id: str) -> str:
+    return f"session:{session_id}:confirmation:notify"
+
+
+def _streams_key(session_id: str) -> str:
+    return f"session:{session_id}:streams"
+
+
+def _stream_text_key(session_id: str, stream_id: str) -> str:
+    return f"session:{session_id}:stream:{stream_id}"
+
+
+def _spans_key(session_id: str) -> str:
+    return f"session:{session_id}:spans"
+
+
 _memory_events: dict[str, list[Dict[str, Any]]] = {}
 _memory_status: dict[str, Dict[str, Any]] = {}
 _memory_confirmations: dict[str, Dict[str, Any]] = {}
+_confirmation_signals: dict[str, asyncio.Event] = {}
+# Re-read interval for confirmations while Redis pub/sub notifications are unavailable
+_CONFIRMATION_POLL_SECONDS = 3.0
+# Snapshots of in-flight agent streams (event fields, text fragments), owned by the
+# process running the workflow
+_memory_streams: dict[str, dict[str, tuple[Dict[str, Any], list[str]]]] = {}
+_memory_spans: dict[str, list[Dict[str, Any]]] = {}
 
 
 async def append_event(session_id: str, event: Dict[str, Any]) -> None:
@@ -34,13 +62,31 @@ async def append_event(session_id: str, event: Dict[str, Any]) -> None:
         return
     try:
         payload = json.dumps(event)
-        await redis.rpush(_events_key(session_id), payload)
-        await redis.expire(_events_key(session_id), settings.session_ttl_seconds * 2)
+        with tracing.span("redis.append_event"):
+            await redis.rpush(_events_key(session_id), payload)
+            await redis.expire(_events_key(session_id), settings.session_ttl_seconds * 2)
     except RedisError:  # pragma: no cover - ignore cache errors
         _memory_events.setdefault(session_id, []).append(event)
         return
 
 
+async def append_events(session_id: str, events: List[Dict[str, Any]]) -> None:
+    """Append several events with a single RPUSH."""
+    if not events:
+        return
+    if redis is None:
+        _memory_events.setdefault(session_id, []).extend(events)
+        return
+    try:
+        payloads = [json.dumps(event) for event in events]
+        with tracing.span("redis.append_events", count=len(events)):
+            await redis.rpush(_events_key(session_id), *payloads)
+            await redis.expire(_events_key(session_id), settings.session_ttl_seconds * 2)
+    except RedisError:  # pragma: no cover - ignore cache errors
+        _memory_events.setdefault(session_id, []).extend(events)
+        return
+
+
 async def fetch_events(session_id: str) -> List[Dict[str, Any]]:
     if redis is None:
         return _memory_events.get(session_id, [])
@@ -56,7 +102,8 @@ async def set_status(session_id: str, status: Dict[str, Any]) -> None:
         _memory_status[session_id] = status
         return
     try:
-        await redis.set(_status_key(session_id), json.dumps(status), ex=settings.session_ttl_seconds * 2)
+        with tracing.span("redis.set_status"):
+            await redis.set(_status_key(session_id), json.dumps(status), ex=settings.session_ttl_seconds * 2)
     except RedisError:
         _memory_status[session_id] = status
         return
@@ -72,6 +119,94 @@ async def get_status(session_id: str) -> Dict[str, Any] | None:
         return _memory_status.get(session_id)
 
 
+async def store_spans(session_id: str, spans: List[Dict[str, Any]]) -> None:
+    """Persist the spans recorded during a workflow execution."""
+    if redis is None:
+        _memory_spans[session_id] = spans
+        return
+    try:
+        await redis.set(_spans_key(session_id), json.dumps(spans), ex=settings.session_ttl_seconds * 2)
+    except RedisError:
+        _memory_spans[session_id] = spans
+
+
+async def fetch_spans(session_id: str) -> List[Dict[str, Any]] | None:
+    """Return the spans of the latest workflow execution, if still cached."""
+    if redis is None:
+        return _memory_spans.get(session_id)
+    try:
+        raw = await redis.get(_spans_key(session_id))
+        return json.loads(raw) if raw else None
+    except RedisError:
+        return _memory_spans.get(session_id)
+
+
+async def append_stream_snapshot(
+    session_id: str, stream_id: str, event: Dict[str, Any], delta: str
+) -> None:
+    """Append ``delta`` to the accumulated text of an agent stream.
+
+    Only the new text is written (Redis ``APPEND``), so keeping the snapshot
+    current costs work proportional to the stream rather than its square.
+    ``event`` carries the other snapshot fields and replaces the stored ones.
+    """
+    streams = _memory_streams.setdefault(session_id, {})
+    parts = streams[stream_id][1] if stream_id in streams else []
+    parts.append(delta)
+    streams[stream_id] = (event, parts)
+
+    if redis is None:
+        return
+    text_key = _stream_text_key(session_id, stream_id)
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.hset(_streams_key(session_id), stream_id, json.dumps(event))
+        pipe.append(text_key, delta)
+        pipe.expire(_streams_key(session_id), settings.session_ttl_seconds)
+        pipe.expire(text_key, settings.session_ttl_seconds)
+        await pipe.execute()
+    except RedisError:  # pragma: no cover - snapshot is best effort
+        return
+
+
+async def clear_stream_snapshot(session_id: str, stream_id: str) -> None:
+    """Drop the snapshot of a finished agent stream."""
+    streams = _memory_streams.get(session_id, {})
+    streams.pop(stream_id, None)
+    if not streams:
+        _memory_streams.pop(session_id, None)
+
+    if redis is None:
+        return
+    try:
+        await redis.hdel(_streams_key(session_id), stream_id)
+        await redis.delete(_stream_text_key(session_id, stream_id))
+    except RedisError:  # pragma: no cover - snapshot is best effort
+        return
+
+
+def _memory_snapshots(session_id: str) -> List[Dict[str, Any]]:
+    return [
+        {**event, "content": "".join(parts)}
+        for event, parts in _memory_streams.get(session_id, {}).values()
+    ]
+
+
+async def fetch_stream_snapshots(session_id: str) -> List[Dict[str, Any]]:
+    """Return snapshots of the agent streams currently in progress."""
+    if redis is None:
+        return _memory_snapshots(session_id)
+    try:
+        events = await redis.hgetall(_streams_key(session_id))
+        snapshots = []
+        for stream_id, raw in events.items():
+            content = await redis.get(_stream_text_key(session_id, stream_id))
+            snapshots.append({**json.loads(raw), "content": content or ""})
+        return snapshots
+    except RedisError:
+        return _memory_snapshots(session_id)
+
+
 async def set_confirmation(session_id: str, confirmation: Dict[str, Any]) -> None:
     """Store confirmation data from user."""
     if redis is None:
@@ -105,3 +240,92 @@ async def clear_confirmation(session_id: str) -> None:
     except RedisError:
         _memory_confirmations.pop(session_id, None)
         return
+
+
+async def publish_confirmation(session_id: str, confirmation: Dict[str, Any]) -> None:
+    """Store confirmation data and notify workflows waiting on it.
+
+    Waiters in this process are woken through an ``asyncio.Event``; waiters in
+    other processes are woken through a Redis pub/sub message.
+    """
+    await set_confirmation(session_id, confirmation)
+
+    signal = _confirmation_signals.get(session_id)
+    if signal is not None:
+        signal.set()
+
+    if redis is None:
+        return
+    try:
+        await redis.publish(_confirmation_channel(session_id), json.dumps(confirmation))
+    except (RedisError, AttributeError):  # pragma: no cover - in-memory client has no pub/sub
+        return
+
+
+async def wait_for_confirmation(
+    session_id: str,
+    stage: str,
+    timeout: float,
+) -> Dict[str, Any] | None:
+    """Wait until a confirmation for ``stage`` is published, or ``timeout`` elapses.
+
+    The stored confirmation is re-read only when a notification arrives, so a
+    waiting workflow issues no Redis traffic while the user is thinking. Without
+    a working subscription it is re-read every few seconds instead.
+    Returns the confirmation payload, or ``None`` on timeout.
+    """
+    signal = _confirmation_signals.setdefault(session_id, asyncio.Event())
+    pubsub = await _subscribe(_confirmation_channel(session_id))
+    listener = asyncio.create_task(_relay_notifications(pubsub, signal)) if pubsub else None
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            # 先清除信号再读取，避免读取与通知之间的竞态导致丢失唤醒
+            signal.clear()
+            confirmation = await get_confirmation(session_id)
+            if confirmation and confirmation.get("stage") == stage:
+                return confirmation
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            if redis is not None and (listener is None or listener.done()):
+                # 订阅失败或已断开时收不到其他进程的通知，改为定期重新读取
+                remaining = min(remaining, _CONFIRMATION_POLL_SECONDS)
+            try:
+                await asyncio.wait_for(signal.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        if listener is not None:
+            listener.cancel()
+        if pubsub is not None:
+            try:
+                await pubsub.reset()
+            except RedisError:  # pragma: no cover - best effort cleanup
+                pass
+        if _confirmation_signals.get(session_id) is signal:
+            _confirmation_signals.pop(session_id, None)
+
+
+async def _subscribe(channel: str):
+    if redis is None or not hasattr(redis, "pubsub"):
+        return None
+    try:
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(channel)
+        return pubsub
+    except RedisError as exc:
+        logger.warning("Failed to subscribe to %s, falling back to local notifications: %s", channel, exc)
+        return None
+
+
+async def _relay_notifications(pubsub, signal: asyncio.Event) -> None:
+    try:
+        async for message in pubsub.listen():
+            if message.get("type") == "message":
+                signal.set()
+    except RedisError as exc:  # pragma: no cover - connection dropped
+        logger.warning("Confirmation subscription lost: %s", exc)
@@ -28,6 +28,24 @@ class Settings(BaseSettings):
     vl_model: str = Field(default="qwen3-vl-flash", alias="VL_MODEL", description="VL 模型名称（图片识别）")
     vl_api_key: str | None = Field(default=None, alias="VL_API_KEY", description="VL 模型 API Key，默认使用 QWEN_API_KEY")
     vl_base_url: str | None = Field(default=None, alias="VL_BASE_URL", description="VL 模型 base URL")
+    vl_max_concurrency: int = Field(
+        default=4,
+        ge=1,
+        alias="VL_MAX_CONCURRENCY",
+        description="每个进程并发执行的 VL/OCR 模型调用数上限（专用线程池大小）",
+    )
+    vl_max_retries: int = Field(
+        default=3,
+        ge=0,
+        alias="VL_MAX_RETRIES",
+        description="VL/OCR 模型调用失败或限流时的最大重试次数（认证错误不重试）",
+    )
+    vl_cache_ttl_seconds: int = Field(
+        default=7 * 24 * 60 * 60,
+        ge=60,
+        alias="VL_CACHE_TTL_SECONDS",
+        description="VL/OCR 识别结果按图片内容、模型与提示词模式缓存的时间（秒）",
+    )
 
     # PDF文档专用OCR模型配置
     pdf_ocr_enabled: bool = Field(default=True, alias="PDF_OCR_ENABLED", description="对PDF使用专用OCR模型")
@@ -39,6 +57,11 @@ class Settings(BaseSettings):
     analysis_agent_model: str = Field(default="qwen3-vl-flash", alias="ANALYSIS_AGENT_MODEL")
     analysis_agent_api_key: str | None = Field(default=None, alias="ANALYSIS_AGENT_API_KEY")
     analysis_agent_base_url: str | None = Field(default=None, alias="ANALYSIS_AGENT_BASE_URL")
+    analysis_agent_fallback_model: str | None = Field(
+        default=None,
+        alias="ANALYSIS_AGENT_FALLBACK_MODEL",
+        description="阶段时间预算不足或主模型延迟过高时改用的更快模型",
+    )
 
     # 多模态分析配置
     analysis_multimodal_enabled: bool = Field(
@@ -51,17 +74,39 @@ class Settings(BaseSettings):
     test_agent_model: str = Field(default="qwen3-next-80b-a3b-instruct", alias="TEST_AGENT_MODEL")
     test_agent_api_key: str | None = Field(default=None, alias="TEST_AGENT_API_KEY")
     test_agent_base_url: str | None = Field(default=None, alias="TEST_AGENT_BASE_URL")
+    test_agent_fallback_model: str | None = Field(
+        default=None,
+        alias="TEST_AGENT_FALLBACK_MODEL",
+        description="阶段时间预算不足或主模型延迟过高时改用的更快模型",
+    )
 
     # 质量评审专家专用配置
     review_agent_model: str = Field(default="qwen3-next-80b-a3b-instruct", alias="REVIEW_AGENT_MODEL")
     review_agent_api_key: str | None = Field(default=None, alias="REVIEW_AGENT_API_KEY")
     review_agent_base_url: str | None = Field(default=None, alias="REVIEW_AGENT_BASE_URL")
+    review_agent_fallback_model: str | None = Field(
+        default=None,
+        alias="REVIEW_AGENT_FALLBACK_MODEL",
+        description="阶段时间预算不足或主模型延迟过高时改用的更快模型",
+    )
 
     database_url: str = Field(
         default="sqlite+aiosqlite:///./ai_requirement.db",
         description="SQLAlchemy database URL",
         alias="DATABASE_URL",
     )
+    db_pool_size: int = Field(
+        default=5,
+        ge=1,
+        alias="DB_POOL_SIZE",
+        description="数据库连接池常驻连接数；工作流仅在写入时占用连接，按并发写入量而非会话数设置",
+    )
+    db_max_overflow: int = Field(
+        default=10,
+        ge=0,
+        alias="DB_MAX_OVERFLOW",
+        description="连接池在常驻连接之外允许临时创建的连接数",
+    )
     redis_url: str = Field(
         default="redis://localhost:6379/0",
         description="Redis connection URI",
@@ -91,6 +136,262 @@ class Settings(BaseSettings):
         alias="UPLOAD_DIR",
     )
     llm_timeout: int = Field(default=120, alias="LLM_TIMEOUT")
+    llm_http_max_connections: int = Field(
+        default=32,
+        ge=1,
+        alias="LLM_HTTP_MAX_CONNECTIONS",
+        description="每个模型端点共享客户端的最大 HTTP 连接数",
+    )
+    llm_http_keepalive_connections: int = Field(
+        default=16,
+        ge=0,
+        alias="LLM_HTTP_KEEPALIVE_CONNECTIONS",
+        description="每个模型端点保持复用的空闲 HTTP 连接数",
+    )
+    rate_limit_enabled: bool = Field(
+        default=True,
+        alias="RATE_LIMIT_ENABLED",
+        description="调用模型前按（模型, API Key）的 RPM/TPM 令牌桶限流，所有进程通过 Redis 共享额度",
+    )
+    llm_rpm_limit: int = Field(
+        default=600,
+        ge=0,
+        alias="LLM_RPM_LIMIT",
+        description="对话模型每个（模型, API Key）每分钟请求数上限；0 表示不限制",
+    )
+    llm_tpm_limit: int = Field(
+        default=1_000_000,
+        ge=0,
+        alias="LLM_TPM_LIMIT",
+        description="对话模型每个（模型, API Key）每分钟 token 数上限；0 表示不限制",
+    )
+    vl_rpm_limit: int = Field(
+        default=60,
+        ge=0,
+        alias="VL_RPM_LIMIT",
+        description="VL/OCR 模型每个（模型, API Key）每分钟请求数上限；0 表示不限制",
+    )
+    vl_tpm_limit: int = Field(
+        default=100_000,
+        ge=0,
+        alias="VL_TPM_LIMIT",
+        description="VL/OCR 模型每个（模型, API Key）每分钟 token 数上限；0 表示不限制",
+    )
+    session_time_budget_seconds: int = Field(
+        default=0,
+        ge=0,
+        alias="SESSION_TIME_BUDGET_SECONDS",
+        description="单个会话智能体阶段的总时间预算（秒，不含等待确认），按阶段权重分配；0 表示不限制",
+    )
+    llm_fallback_latency_ms: int = Field(
+        default=0,
+        ge=0,
+        alias="LLM_FALLBACK_LATENCY_MS",
+        description="主模型在某阶段的近期平均耗时超过该值（毫秒）时直接改用备用模型；0 表示不按延迟切换",
+    )
+    llm_hedge_enabled: bool = Field(
+        default=False,
+        alias="LLM_HEDGE_ENABLED",
+        description="流式调用超过首 token 阈值仍无输出时，向备用端点/模型发送对冲请求，取先返回者",
+    )
+    llm_hedge_percentile: float = Field(
+        default=95.0,
+        ge=50.0,
+        le=99.9,
+        alias="LLM_HEDGE_PERCENTILE",
+        description="对冲阈值取主端点近期首 token 延迟的该分位数",
+    )
+    llm_hedge_delay_ms: int = Field(
+        default=3000,
+        ge=0,
+        alias="LLM_HEDGE_DELAY_MS",
+        description="延迟样本不足时使用的对冲阈值（毫秒）",
+    )
+    llm_hedge_model: str | None = Field(
+        default=None,
+        alias="LLM_HEDGE_MODEL",
+        description="对冲请求使用的模型，默认与主请求相同",
+    )
+    llm_hedge_base_url: str | None = Field(
+        default=None,
+        alias="LLM_HEDGE_BASE_URL",
+        description="对冲请求使用的备用端点 base URL，默认与主请求相同",
+    )
+    llm_hedge_api_key: str | None = Field(
+        default=None,
+        alias="LLM_HEDGE_API_KEY",
+        description="备用端点的 API Key，默认与主请求相同",
+    )
+
+    # 工作流并发配置
+    document_preprocess_concurrency: int = Field(
+        default=4,
+        ge=1,
+        alias="DOCUMENT_PREPROCESS_CONCURRENCY",
+        description="单个会话内并行预处理（VL/OCR/文本提取）的文档数量上限",
+    )
+
+    speculative_test_generation: bool = Field(
+        default=False,
+        alias="SPECULATIVE_TEST_GENERATION",
+        description="需求分析等待确认期间提前生成测试用例；用户未修改直接确认时复用结果",
+    )
+
+    test_generation_concurrency: int = Field(
+        default=4,
+        ge=1,
+        alias="TEST_GENERATION_CONCURRENCY",
+        description="按功能模块并行生成测试用例时，单个会话同时生成的模块数量上限",
+    )
+
+    document_text_limit: int = Field(
+        default=200_000,
+        ge=1000,
+        alias="DOCUMENT_TEXT_LIMIT",
+        description="单个文档提取文本的字符数上限",
+    )
+    near_duplicate_enabled: bool = Field(
+        default=True,
+        alias="NEAR_DUPLICATE_ENABLED",
+        description="上传时为文档文本建立 MinHash 索引，近似重复文档复用原文档未变化部分的提取与分析结果",
+    )
+    near_duplicate_threshold: float = Field(
+        default=0.8,
+        ge=0.5,
+        le=1.0,
+        alias="NEAR_DUPLICATE_THRESHOLD",
+        description="判定为近似重复文档的最低相似度（估计的 Jaccard 相似度）",
+    )
+    analysis_chunk_tokens: int = Field(
+        default=6000,
+        ge=500,
+        alias="ANALYSIS_CHUNK_TOKENS",
+        description="文本模式需求分析单次提示词的文档 token 上限，超出时分片并行分析后合并",
+    )
+    analysis_map_concurrency: int = Field(
+        default=4,
+        ge=1,
+        alias="ANALYSIS_MAP_CONCURRENCY",
+        description="大文档分片分析时单个会话同时分析的片段数量上限",
+    )
+    result_cache_enabled: bool = Field(
+        default=True,
+        alias="RESULT_CACHE_ENABLED",
+        description="相同文档集合与配置的会话直接复用历史分析结果，不再调用模型",
+    )
+    completion_cache_enabled: bool = Field(
+        default=True,
+        alias="COMPLETION_CACHE_ENABLED",
+        description="用例生成、质量评审与用例补全阶段按模型与提示词缓存模型输出",
+    )
+    completion_cache_ttl_seconds: int = Field(
+        default=86400,
+        ge=60,
+        alias="COMPLETION_CACHE_TTL_SECONDS",
+        description="模型输出缓存的有效期（秒），进程内与 Redis 两级缓存均适用",
+    )
+    completion_cache_max_entries: int = Field(
+        default=256,
+        ge=1,
+        alias="COMPLETION_CACHE_MAX_ENTRIES",
+        description="进程内模型输出缓存（LRU）的最大条目数",
+    )
+
+    # 智能体流式输出推送：按时间或累计字符数合并片段后再推送，避免刷爆 WebSocket 与 Redis
+    stream_flush_interval_ms: int = Field(
+        default=100,
+        ge=10,
+        alias="STREAM_FLUSH_INTERVAL_MS",
+        description="流式输出片段合并推送的时间间隔（毫秒）",
+    )
+    stream_flush_max_chars: int = Field(
+        default=512,
+        ge=1,
+        alias="STREAM_FLUSH_MAX_CHARS",
+        description="待推送片段累计达到该字符数时立即推送",
+    )
+    progress_flush_interval_ms: int = Field(
+        default=250,
+        ge=10,
+        alias="PROGRESS_FLUSH_INTERVAL_MS",
+        description="进度与系统消息写入 Redis 的合并间隔（毫秒）；WebSocket 推送不受影响，阶段结束时立即写入",
+    )
+
+    # LLM 调用准入控制：全局 / 单模型 / 单租户（created_by）并发上限，超出时按租户公平排队
+    llm_max_concurrency: int = Field(
+        default=16,
+        ge=1,
+        alias="LLM_MAX_CONCURRENCY",
+        description="全局同时执行的智能体阶段调用上限",
+    )
+    llm_max_concurrency_per_model: int = Field(
+        default=8,
+        ge=1,
+        alias="LLM_MAX_CONCURRENCY_PER_MODEL",
+        description="单个模型同时执行的调用上限",
+    )
+    llm_max_concurrency_per_tenant: int = Field(
+        default=2,
+        ge=1,
+        alias="LLM_MAX_CONCURRENCY_PER_TENANT",
+        description="单个租户（created_by）同时执行的调用上限",
+    )
+
+    # 工作流执行模式：inline 在 API 进程内执行；queue 通过 Redis 队列交给独立 worker 执行
+    workflow_mode: Literal["inline", "queue"] = Field(
+        default="inline",
+        alias="WORKFLOW_MODE",
+        description="工作流执行模式（inline / queue）",
+    )
+    worker_concurrency: int = Field(
+        default=2,
+        ge=1,
+        alias="WORKER_CONCURRENCY",
+        description="单个 worker 进程同时执行的工作流数量",
+    )
+    workflow_lease_seconds: int = Field(
+        default=60,
+        ge=5,
+        alias="WORKFLOW_LEASE_SECONDS",
+        description="worker 任务租约时长，超时未续约的任务会被其他 worker 重新领取",
+    )
+    workflow_heartbeat_interval: int = Field(
+        default=15,
+        ge=1,
+        alias="WORKFLOW_HEARTBEAT_INTERVAL",
+        description="worker 续约心跳间隔（秒），应明显小于租约时长",
+    )
+    workflow_resume_grace_seconds: int = Field(
+        default=30,
+        ge=0,
+        alias="WORKFLOW_RESUME_GRACE_SECONDS",
+        description="启动时仅恢复创建超过该时长（秒）的 created 会话，较新的会话可能正由其他进程启动",
+    )
+
+    batch_max_sessions: int = Field(
+        default=500,
+        ge=1,
+        alias="BATCH_MAX_SESSIONS",
+        description="单次批量创建的会话数量上限",
+    )
+    batch_max_active_sessions: int = Field(
+        default=4,
+        ge=1,
+        alias="BATCH_MAX_ACTIVE_SESSIONS",
+        description="批量会话同时执行的工作流数量上限（进程内执行模式，等待确认的会话不计入）",
+    )
+    batch_launch_interval_ms: int = Field(
+        default=500,
+        ge=0,
+        alias="BATCH_LAUNCH_INTERVAL_MS",
+        description="批量会话相邻两次启动之间的最小间隔（毫秒），使模型调用速率保持平稳",
+    )
+    shutdown_drain_timeout: int = Field(
+        default=30,
+        ge=0,
+        alias="SHUTDOWN_DRAIN_TIMEOUT",
+        description="停止服务时等待执行中阶段完成的最长时间（秒），超时的会话重启后从检查点恢复",
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -114,8 +415,16 @@ class Settings(BaseSettings):
         path.mkdir(parents=True, exist_ok=True)
         return path
 
-    def get_agent_config(self, agent_type: Literal["analysis", "test", "review"]) -> dict:
-        """获取指定智能体的模型配置，支持 fallback 到默认 Qwen 配置."""
+    def get_agent_config(
+        self,
+        agent_type: Literal["analysis", "test", "review"],
+        *,
+        fallback: bool = False,
+    ) -> dict:
+        """获取指定智能体的模型配置，支持 fallback 到默认 Qwen 配置.
+
+        ``fallback`` 为 True 且配置了备用模型时返回备用（更快）模型，API Key 与地址不变。
+        """
 
         config_map = {
             "analysis": (
@@ -136,6 +445,8 @@ class Settings(BaseSettings):
         }
 
         model, api_key, base_url = config_map[agent_type]
+        if fallback:
+            model = self.get_fallback_model(agent_type) or model
 
         return {
             "model": model or self.qwen_model or "qwen-plus",
@@ -143,6 +454,14 @@ class Settings(BaseSettings):
             "base_url": base_url or self.qwen_base_url,
         }
 
+    def get_fallback_model(self, agent_type: Literal["analysis", "test", "review"]) -> str | None:
+        """获取指定智能体的备用模型，未配置时返回 None."""
+        return {
+            "analysis": self.analysis_agent_fallback_model,
+            "test": self.test_agent_fallback_model,
+            "review": self.review_agent_fallback_model,
+        }[agent_type]
+
     def get_vl_config(self) -> dict:
         """获取 VL 模型配置."""
         return {
@@ -12,11 +12,20 @@ class Base(DeclarativeBase):
     """Declarative base for SQLAlchemy models."""
 
 
+# Workflows only hold a connection while writing, so the pool is sized for
+# concurrent writes rather than for the number of running sessions.
+_pool_options = (
+    {}
+    if settings.database_url.startswith("sqlite")
+    else {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}
+)
+
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
     future=True,
     pool_pre_ping=True,
+    **_pool_options,
 )
 
 AsyncSessionLocal = async_sessionmaker(
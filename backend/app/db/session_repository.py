@@ -2,13 +2,20 @@
 
 from datetime import datetime, timedelta
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import Select, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.models.document import Document
-from app.models.session import AgentStage, Session, SessionResult, SessionStatus
+from app.models.session import (
+    AgentRun,
+    AgentStage,
+    Session,
+    SessionBatch,
+    SessionResult,
+    SessionStatus,
+)
 
 
 async def create_session(
@@ -118,6 +125,23 @@ async def add_session_result(
     return result_record
 
 
+async def get_session_result(
+    session: AsyncSession,
+    *,
+    session_id: str,
+    version: int,
+) -> SessionResult | None:
+    """Fetch a specific result version of a session."""
+
+    stmt = (
+        select(SessionResult)
+        .where(SessionResult.session_id == session_id)
+        .where(SessionResult.version == version)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
 async def update_session_status(
     session: AsyncSession,
     *,
@@ -143,3 +167,116 @@ async def update_session_status(
     db_session.last_activity_at = datetime.utcnow()
     await session.flush()
     return db_session
+
+
+async def create_batch(
+    session: AsyncSession,
+    *,
+    session_ids: list[str],
+    created_by: str | None = None,
+) -> SessionBatch:
+    """Record a group of sessions created together."""
+
+    batch = SessionBatch(session_ids=session_ids, created_by=created_by)
+    session.add(batch)
+    await session.flush()
+    return batch
+
+
+async def get_batch(session: AsyncSession, batch_id: str) -> SessionBatch | None:
+    """Fetch a session batch by identifier."""
+
+    return await session.get(SessionBatch, batch_id)
+
+
+async def list_sessions_by_ids(session: AsyncSession, session_ids: list[str]) -> list[Session]:
+    """Return the sessions with the given identifiers, in the given order."""
+
+    if not session_ids:
+        return []
+    result = await session.execute(select(Session).where(Session.id.in_(session_ids)))
+    by_id = {item.id: item for item in result.scalars().unique()}
+    return [by_id[session_id] for session_id in session_ids if session_id in by_id]
+
+
+# Statuses of sessions whose workflow has not finished
+RESUMABLE_STATUSES = (
+    SessionStatus.created,
+    SessionStatus.processing,
+    SessionStatus.awaiting_confirmation,
+)
+
+
+def is_resumable(analysis_session: Session) -> bool:
+    """Return whether a session's workflow still has stages left to run."""
+
+    return analysis_session.status in RESUMABLE_STATUSES and not (analysis_session.config or {}).get(
+        "cancelled"
+    )
+
+
+async def list_resumable_sessions(
+    session: AsyncSession, *, created_before: datetime | None = None
+) -> list[Session]:
+    """Return unexpired sessions whose workflow was interrupted or never started.
+
+    Sessions still ``created`` are only returned when created before
+    ``created_before``, since a newer one may be about to start elsewhere.
+    """
+
+    stmt: Select[tuple[Session]] = (
+        select(Session)
+        .where(Session.status.in_(RESUMABLE_STATUSES))
+        .where((Session.expires_at.is_(None)) | (Session.expires_at > datetime.utcnow()))
+        .order_by(Session.last_activity_at)
+    )
+    if created_before is not None:
+        stmt = stmt.where(
+            (Session.status != SessionStatus.created) | (Session.created_at < created_before)
+        )
+    result = await session.execute(stmt)
+    return list(result.scalars().unique())
+
+
+async def record_agent_run(
+    session: AsyncSession,
+    *,
+    session_id: str,
+    stage: AgentStage,
+    payload: dict,
+    started_at: datetime,
+    error: str | None = None,
+) -> AgentRun:
+    """Persist a finished (or failed) agent stage execution as a checkpoint."""
+
+    run = AgentRun(
+        session_id=session_id,
+        stage=stage,
+        payload=payload,
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        error=error,
+    )
+    session.add(run)
+    await session.flush()
+    return run
+
+
+async def update_agent_run_payload(session: AsyncSession, run_id: str, payload: dict) -> None:
+    """Replace the payload of a recorded agent run, e.g. after user confirmation."""
+
+    await session.execute(update(AgentRun).where(AgentRun.id == run_id).values(payload=payload))
+
+
+async def list_stage_checkpoints(session: AsyncSession, session_id: str) -> dict[AgentStage, AgentRun]:
+    """Return the latest successful agent run for each stage of a session."""
+
+    stmt = (
+        select(AgentRun)
+        .where(AgentRun.session_id == session_id)
+        .where(AgentRun.error.is_(None))
+        .where(AgentRun.finished_at.is_not(None))
+        .order_by(AgentRun.finished_at)
+    )
+    result = await session.execute(stmt)
+    return {run.stage: run for run in result.scalars().unique()}
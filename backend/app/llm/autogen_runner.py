@@ -2,26 +2,65 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
 import logging
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, Callable
+from typing import AsyncIterator, Callable, Iterator
 
 try:  # pragma: no cover - optional dependency
     from autogen import AssistantAgent
 except Exception:  # pragma: no cover
     AssistantAgent = None  # type: ignore
 
-try:  # pragma: no cover - optional dependency
-    from openai import OpenAI
-except Exception:  # pragma: no cover
-    OpenAI = None  # type: ignore
-
+from app.cache import completion_cache
 from app.config import settings
+from app.llm import client_pool, hedging, rate_limiter
+from app.parsers.chunking import estimate_tokens, split_documents
+from app.utils import tracing
 
 logger = logging.getLogger(__name__)
 
+# 工作流在阶段超出时间预算时置位，线程内的智能体调用随之改用备用模型
+_use_fallback_model: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "use_fallback_model", default=False
+)
+
+
+@contextmanager
+def use_fallback_model(enabled: bool = True) -> Iterator[None]:
+    """在当前上下文（含其中创建的任务与线程）中切换到各智能体的备用模型."""
+    token = _use_fallback_model.set(enabled)
+    try:
+        yield
+    finally:
+        _use_fallback_model.reset(token)
+
+
+# force_regenerate 的会话跳过模型输出缓存的查询，但仍写入新的输出
+_bypass_completion_cache: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "bypass_completion_cache", default=False
+)
+
+
+@contextmanager
+def bypass_completion_cache(enabled: bool = True) -> Iterator[None]:
+    """在当前上下文中不读取模型输出缓存（生成结果仍会写入缓存）."""
+    token = _bypass_completion_cache.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass_completion_cache.reset(token)
+
+
+def resolve_agent_config(agent_type: str) -> dict:
+    """返回智能体当前应使用的模型配置（考虑备用模型切换）."""
+    return settings.get_agent_config(agent_type, fallback=_use_fallback_model.get())
+
 
 def _extract_json(content: str) -> dict:
     logger.info(f"尝试从响应中提取 JSON，响应长度: {len(content) if content else 0}")
@@ -41,84 +80,53 @@ def _extract_json(content: str) -> dict:
         return {"modules": [], "error": f"JSON解析失败: {str(e)}", "raw_response": content[:500] if content else ""}
 
 
-def _agent(system_message: str, agent_type: str = "default") -> AssistantAgent:
-    """创建智能体，根据类型使用不同的模型配置."""
-    if AssistantAgent is None:  # pragma: no cover - handled by caller
-        raise RuntimeError("AutoGen 未安装，无法启用 autogen 模式")
-
-    # 获取智能体专用配置
-    if agent_type in ("analysis", "test", "review"):
-        config = settings.get_agent_config(agent_type)
-    else:
-        # fallback 到默认配置
-        config = {
-            "model": settings.qwen_model,
-            "base_url": settings.qwen_base_url,
-            "api_key": settings.qwen_api_key,
-        }
-
-    logger.info(f"创建 {agent_type} 智能体，使用模型: {config['model']}")
-
-    return AssistantAgent(
-        name=f"{agent_type}_agent",
-        system_message=system_message,
-        llm_config={
-            "config_list": [config],
-            "timeout": settings.llm_timeout,
-        },
-        human_input_mode="NEVER",
-        max_consecutive_auto_reply=1,
-        code_execution_config=False,
-    )
-
-
-def _generate(agent: AssistantAgent, prompt: str) -> str:
-    logger.info(f"发送 Prompt 到 LLM，长度: {len(prompt)}")
-    logger.debug(f"Prompt 内容前500字符: {prompt[:500]}")
-    try:
-        reply = agent.generate_reply(messages=[{"role": "user", "content": prompt}])
-        logger.info(f"收到 LLM 响应，类型: {type(reply)}")
-        logger.debug(f"完整响应: {reply}")
-
-        if isinstance(reply, str):
-            logger.info(f"响应是字符串，长度: {len(reply)}")
-            return reply
-        if isinstance(reply, dict):
-            content = reply.get("content", "")
-            logger.info(f"响应是字典，提取 content 字段，长度: {len(content)}")
-            return content
-
-        result = str(reply)
-        logger.warning(f"响应类型未知，转为字符串: {result[:200]}")
-        return result
-    except Exception as e:
-        logger.error(f"LLM 调用失败: {e}", exc_info=True)
-        raise
-
-
-def _generate_streaming(
+async def _cached_completion(
+    cache_stage: str | None, model: str, system_message: str, prompt: str
+) -> tuple[str | None, str | None]:
+    """查询模型输出缓存，返回 (缓存键, 缓存内容)；未启用缓存时均为 None."""
+    if not cache_stage or not settings.completion_cache_enabled:
+        return None, None
+    cache_key = completion_cache.compute_key(model, system_message, prompt)
+    if _bypass_completion_cache.get():
+        tracing.annotate(completion_cache="bypass")
+        return cache_key, None
+    cached = await completion_cache.lookup(cache_key, stage=cache_stage)
+    if cached is not None:
+        logger.info(f"命中模型输出缓存: stage={cache_stage}, model={model}, 长度: {len(cached)}")
+        tracing.annotate(completion_cache="hit", response_chars=len(cached))
+    return cache_key, cached
+
+
+async def _acquire_quota(config: dict, prompt_tokens: int) -> None:
+    """调用前按（模型, API Key）占用 RPM/TPM 额度，额度不足时等待."""
+    waited = await rate_limiter.acquire(config["model"], config.get("api_key"), tokens=prompt_tokens)
+    if waited > 0:
+        logger.info(f"模型 {config['model']} 达到限流额度，等待 {waited:.2f}s")
+        tracing.annotate(rate_limit_wait_ms=round(waited * 1000, 3))
+
+
+async def _generate_streaming(
     system_message: str,
     prompt: str,
     agent_type: str = "default",
     on_chunk: Callable[[str], None] | None = None,
+    cache_stage: str | None = None,
 ) -> str:
-    """流式生成LLM响应,逐chunk回调.
+    """流式生成LLM响应,逐chunk回调（复用进程内共享的异步客户端）.
 
     Args:
         system_message: 系统提示
         prompt: 用户提示
         agent_type: 智能体类型
         on_chunk: 回调函数,接收每个chunk
+        cache_stage: 指定时按（模型, 系统提示, 提示词）缓存输出，并按该阶段统计命中率
 
     Returns:
         完整的响应内容
     """
-    if OpenAI is None:
-        raise RuntimeError("OpenAI 未安装，无法启用流式模式")
-
     # 获取智能体配置
     if agent_type in ("analysis", "test", "review"):
-        config = settings.get_agent_config(agent_type)
+        config = resolve_agent_config(agent_type)
     else:
         config = {
             "model": settings.qwen_model,
@@ -128,39 +136,100 @@ def _generate_streaming(
 
     logger.info(f"流式生成: {agent_type} 智能体，使用模型: {config['model']}")
 
-    client = OpenAI(
-        api_key=config["api_key"],
-        base_url=config.get("base_url"),
-        timeout=settings.llm_timeout,
-    )
+    cache_key, cached = await _cached_completion(cache_stage, config["model"], system_message, prompt)
+    if cached is not None:
+        # 命中缓存时整体回放给流式回调，下游推送与解析逻辑保持不变
+        if on_chunk:
+            on_chunk(cached)
+        return cached
 
     messages = [
         {"role": "system", "content": system_message},
         {"role": "user", "content": prompt},
     ]
+    prompt_tokens = estimate_tokens(system_message) + estimate_tokens(prompt)
 
-    try:
-        stream = client.chat.completions.create(
-            model=config["model"],
-            messages=messages,
-            stream=True,
+    async def _open(target: dict) -> tuple[dict, object, AsyncIterator[str], str]:
+        """发送请求并读到第一个 token，记录该端点的首 token 延迟."""
+        client = client_pool.get_client(target.get("base_url"), target["api_key"])
+        await _acquire_quota(target, prompt_tokens)
+        request_started = time.perf_counter()
+        try:
+            opened = await client.chat.completions.create(
+                model=target["model"],
+                messages=messages,
+                stream=True,
+            )
+            contents = _delta_contents(opened)
+            try:
+                first = await anext(contents, "")
+            except BaseException:
+                await opened.response.aclose()
+                raise
+        except asyncio.CancelledError:
+            # 输给对冲请求被取消时，首 token 延迟至少为已等待的时长，按截尾样本记录；
+            # 否则分位数只由快速样本计算，对冲延迟会越来越短
+            hedging.endpoint_latency.observe(
+                hedging.endpoint_key(target), time.perf_counter() - request_started
+            )
+            raise
+        hedging.endpoint_latency.observe(
+            hedging.endpoint_key(target), time.perf_counter() - request_started
         )
+        return target, opened, contents, first
 
-        full_content = ""
-        for chunk in stream:
-            if chunk.choices and len(chunk.choices) > 0:
-                delta = chunk.choices[0].delta
-                if delta.content:
-                    full_content += delta.content
-                    if on_chunk:
-                        on_chunk(delta.content)
+    async def _discard(result: tuple[dict, object, AsyncIterator[str], str]) -> None:
+        await result[1].response.aclose()
 
+    tracing.annotate(prompt_chars=len(system_message) + len(prompt))
+    started = time.perf_counter()
+    secondary = hedging.secondary_config(config)
+    stream = None
+    try:
+        (target, stream, contents, full_content), hedged = await hedging.race(
+            lambda: _open(config),
+            (lambda: _open(secondary)) if secondary else None,
+            delay=hedging.hedge_delay(config) if secondary else 0.0,
+            discard=_discard,
+        )
+        tracing.annotate(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+        if hedged:
+            # 对冲请求先返回首个 token，主请求已取消
+            logger.info(f"对冲请求先返回首个 token，改用 {target.get('base_url') or '默认端点'} 的 {target['model']}")
+            tracing.annotate(hedged_model=target["model"])
+        if full_content and on_chunk:
+            on_chunk(full_content)
+        async for text in contents:
+            full_content += text
+            if on_chunk:
+                on_chunk(text)
+
+        tracing.annotate(response_chars=len(full_content))
         logger.info(f"流式生成完成，总长度: {len(full_content)}")
+        await rate_limiter.consume(target["model"], target["api_key"], estimate_tokens(full_content))
+        if cache_key is not None and target["model"] == config["model"]:
+            await completion_cache.store(cache_key, full_content)
         return full_content
 
+    except asyncio.CancelledError:
+        logger.info(f"流式生成已取消: {agent_type} 智能体")
+        raise
     except Exception as e:
         logger.error(f"流式LLM调用失败: {e}", exc_info=True)
         raise
+    finally:
+        if stream is not None:
+            # 未读完（取消或出错）时关闭响应，立即停止生成并把连接还给连接池
+            await stream.response.aclose()
+
+
+async def _delta_contents(stream) -> AsyncIterator[str]:
+    """逐个产出流式响应中的非空文本片段."""
+    async for chunk in stream:
+        if chunk.choices and len(chunk.choices) > 0:
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield delta.content
 
 
 @dataclass
@@ -224,7 +293,7 @@ def _merge_test_cases(base: dict, supplement: dict) -> dict:
     return result
 
 
-def run_requirement_analysis(
+async def run_requirement_analysis(
     document_data: list[dict],
     on_chunk: Callable[[str], None] | None = None,
 ) -> tuple[dict, str]:
@@ -246,18 +315,18 @@ def run_requirement_analysis(
     # 检查是否启用多模态模式
     if settings.analysis_multimodal_enabled:
         logger.info("使用多模态分析模式（直接处理图片/PDF）")
-        return _run_multimodal_analysis(document_data, on_chunk=on_chunk)
+        return await _run_multimodal_analysis(document_data, on_chunk=on_chunk)
     else:
         logger.info("使用文本分析模式（预处理+文本分析）")
-        return _run_text_based_analysis(document_data, on_chunk=on_chunk)
+        return await _run_text_based_analysis(document_data, on_chunk=on_chunk)
 
 
-def _run_multimodal_analysis(
+async def _run_multimodal_analysis(
     document_data: list[dict],
     on_chunk: Callable[[str], None] | None = None,
 ) -> tuple[dict, str]:
     """使用多模态VL模型直接分析图片/PDF（保留视觉信息）."""
-    from app.llm.multimodal_client import analyze_with_multimodal
+    from app.llm import vision_engine
     from app.config import settings
 
     logger.info("=" * 50)
@@ -266,7 +335,7 @@ def _run_multimodal_analysis(
     logger.info("=" * 50)
 
     # 获取多模态模型配置
-    config = settings.get_agent_config("analysis")
+    config = resolve_agent_config("analysis")
     logger.info(f"使用多模态模型: {config['model']}")
 
     # 收集所有分析结果
@@ -292,25 +361,17 @@ def _run_multimodal_analysis(
             emit_progress(f"正在分析第 {idx}/{total_docs} 个文档：{doc_name}")
 
             try:
-                # 异步调用转同步
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(
-                        analyze_with_multimodal(
-                            file_path=doc_path,
-                            api_key=config["api_key"],
-                            model=config["model"],
-                            base_url=config.get("base_url"),
-                        )
-                    )
-                    all_analysis_results.append(result)
-                    logger.info(f"文档 {doc_name} 多模态分析成功")
-                    emit_progress(f"已完成第 {idx}/{total_docs} 个文档：{doc_name}")
-                finally:
-                    asyncio.set_event_loop(None)
-                    loop.close()
+                # PDF 使用专用 OCR 模型，图片使用多模态模型
+                result = await vision_engine.analyze(
+                    doc_path,
+                    api_key=config["api_key"],
+                    model=vision_engine.DOCUMENT_OCR_MODEL if doc_type == "pdf" else config["model"],
+                    base_url=config.get("base_url"),
+                    prompt_mode="analysis",
+                )
+                all_analysis_results.append(result)
+                logger.info(f"文档 {doc_name} 多模态分析成功")
+                emit_progress(f"已完成第 {idx}/{total_docs} 个文档：{doc_name}")
 
             except Exception as e:
                 logger.error(f"多模态分析失败: {doc_name}, error={e}", exc_info=True)
@@ -341,47 +402,130 @@ def _run_multimodal_analysis(
     return analysis_payload, combined_analysis
 
 
-def _run_text_based_analysis(
+_ANALYSIS_SYSTEM_MESSAGE = (
+    "你是一位资深需求分析师。请仔细阅读需求文档,识别并提取文档中的所有具体功能模块、业务场景和业务规则。"
+    "必须基于文档的实际内容进行分析,不要使用泛化的占位符(如'模块1'、'场景1')。"
+    "输出JSON格式,包含: modules (name为实际模块名, scenarios为具体场景描述[], rules为具体规则描述[]), risks[]。"
+)
+_ANALYSIS_REQUIREMENTS = (
+    "1. 必须提取文档中的实际功能模块名称(如'设备登录'、'网络设置'、'国标平台')，不要使用'模块1'、'模块2'等占位符\n"
+    "2. 必须描述文档中的具体业务场景(如'用户密码登录'、'8路视频通道接入')，不要使用'场景1'、'场景2'等占位符\n"
+    "3. 必须提取文档中的具体业务规则和性能指标(如'启动时间≤2分钟'、'视频延时≤50ms')\n"
+    "4. 输出JSON格式: {\"modules\": [{\"name\": \"实际模块名\", \"scenarios\": [{\"description\": \"具体场景描述\"}], \"rules\": [{\"description\": \"具体规则描述\"}]}], \"risks\": [{\"description\": \"风险描述\"}]}\n"
+)
+
+
+def plan_analysis_chunks(document_data: list[dict]) -> list[str]:
+    """将文档内容按 token 上限切分为若干片段，文档较小时只返回一个片段."""
+    sections = [
+        (
+            f"=== 文档 {idx}: {doc.get('name', f'文档{idx}')} ({doc.get('type', 'text')}) ===",
+            doc.get("content", "") or "",
+        )
+        for idx, doc in enumerate(document_data, 1)
+    ]
+    return split_documents(sections, settings.analysis_chunk_tokens)
+
+
+async def run_requirement_analysis_chunk(
+    chunk: str,
+    index: int,
+    total: int,
+    on_chunk: Callable[[str], None] | None = None,
+) -> tuple[dict, str]:
+    """分析大文档的单个片段（map），返回该片段的需求分析JSON."""
+    logger.info(f"需求分析片段 {index}/{total}，长度: {len(chunk)} 字符")
+    prompt = (
+        f"以下是需求文档的第 {index}/{total} 部分,请只分析本部分出现的内容。重要提示:\n"
+        f"{_ANALYSIS_REQUIREMENTS}"
+        "5. 本部分没有涉及的模块不要输出,跨部分的模块使用文档中的原始名称以便合并\n\n"
+        f"需求文档内容:\n{chunk}"
+    )
+    content = await _generate_streaming(
+        system_message=_ANALYSIS_SYSTEM_MESSAGE,
+        prompt=prompt,
+        agent_type="analysis",
+        on_chunk=on_chunk,
+    )
+    return _extract_json(content), content
+
+
+def _description_key(item) -> str:
+    if isinstance(item, dict):
+        value = item.get("description") or item.get("name") or json.dumps(item, ensure_ascii=False, sort_keys=True)
+    else:
+        value = item
+    return " ".join(str(value).split()).lower()
+
+
+def _merge_items(target: list, items) -> None:
+    seen = {_description_key(item) for item in target}
+    for item in items or []:
+        key = _description_key(item)
+        if key and key not in seen:
+            seen.add(key)
+            target.append(item)
+
+
+def merge_analysis_payloads(payloads: list[dict]) -> dict:
+    """合并各片段的需求分析结果（reduce）：同名模块合并场景与规则，风险去重."""
+    result: dict = {"modules": [], "risks": []}
+    modules: dict[str, dict] = {}
+    for payload in payloads:
+        if not isinstance(payload, dict):
+            continue
+        for key, value in payload.items():
+            if key not in ("modules", "risks") and key not in result and value:
+                result[key] = value
+        for module in payload.get("modules") or []:
+            if not isinstance(module, dict):
+                continue
+            name = (module.get("name") or module.get("module") or "").strip()
+            if not name:
+                continue
+            key = name.lower()
+            if key not in modules:
+                modules[key] = {**module, "name": name, "scenarios": [], "rules": []}
+                result["modules"].append(modules[key])
+            _merge_items(modules[key]["scenarios"], module.get("scenarios"))
+            _merge_items(modules[key]["rules"], module.get("rules"))
+        _merge_items(result["risks"], payload.get("risks"))
+    return result
+
+
+async def _run_text_based_analysis(
     document_data: list[dict],
     on_chunk: Callable[[str], None] | None = None,
 ) -> tuple[dict, str]:
-    """传统文本模式分析（预处理+流式生成）."""
+    """传统文本模式分析（预处理+流式生成），超出单次提示词上限的文档分片分析后合并."""
     logger.info("=" * 50)
     logger.info("阶段 1/4: 需求分析（文本模式）")
     logger.info(f"输入文档数量: {len(document_data)}")
     logger.info("=" * 50)
 
-    # 构建综合文档内容
-    combined_content_parts = []
-    for idx, doc in enumerate(document_data, 1):
-        doc_name = doc.get("name", f"文档{idx}")
-        doc_type = doc.get("type", "text")
-        doc_content = doc.get("content", "")
-
-        combined_content_parts.append(f"=== 文档 {idx}: {doc_name} ({doc_type}) ===")
-        combined_content_parts.append(doc_content)
-        combined_content_parts.append("")
-
-    documents_text = "\n".join(combined_content_parts)
+    chunks = plan_analysis_chunks(document_data)
+    if len(chunks) > 1:
+        # 工作流中由编排层并行执行各片段；此处为直接调用时的顺序执行
+        logger.info(f"文档超出单次分析上限，分为 {len(chunks)} 个片段顺序分析")
+        payloads = [
+            (await run_requirement_analysis_chunk(chunk, index, len(chunks), on_chunk))[0]
+            for index, chunk in enumerate(chunks, 1)
+        ]
+        merged = merge_analysis_payloads(payloads)
+        return merged, json.dumps(merged, ensure_ascii=False, indent=2)
+
+    documents_text = chunks[0] if chunks else ""
     logger.info(f"合并后文档长度: {len(documents_text)} 字符")
 
-    system_message = (
-        "你是一位资深需求分析师。请仔细阅读需求文档,识别并提取文档中的所有具体功能模块、业务场景和业务规则。"
-        "必须基于文档的实际内容进行分析,不要使用泛化的占位符(如'模块1'、'场景1')。"
-        "输出JSON格式,包含: modules (name为实际模块名, scenarios为具体场景描述[], rules为具体规则描述[]), risks[]。"
-    )
     analysis_prompt = (
         "请根据以下需求文档进行详细分析。重要提示:\n"
-        "1. 必须提取文档中的实际功能模块名称(如'设备登录'、'网络设置'、'国标平台')，不要使用'模块1'、'模块2'等占位符\n"
-        "2. 必须描述文档中的具体业务场景(如'用户密码登录'、'8路视频通道接入')，不要使用'场景1'、'场景2'等占位符\n"
-        "3. 必须提取文档中的具体业务规则和性能指标(如'启动时间≤2分钟'、'视频延时≤50ms')\n"
-        "4. 输出JSON格式: {\"modules\": [{\"name\": \"实际模块名\", \"scenarios\": [{\"description\": \"具体场景描述\"}], \"rules\": [{\"description\": \"具体规则描述\"}]}], \"risks\": [{\"description\": \"风险描述\"}]}\n\n"
-        f"需求文档内容:\n{documents_text[:8000]}"
+        f"{_ANALYSIS_REQUIREMENTS}\n"
+        f"需求文档内容:\n{documents_text}"
     )
 
     # 使用流式生成
-    analysis_content = _generate_streaming(
-        system_message=system_message,
+    analysis_content = await _generate_streaming(
+        system_message=_ANALYSIS_SYSTEM_MESSAGE,
         prompt=analysis_prompt,
         agent_type="analysis",
         on_chunk=on_chunk,
@@ -392,7 +536,20 @@ def _run_text_based_analysis(
     return analysis_payload, analysis_content
 
 
-def run_test_generation(
+_TEST_GENERATION_SYSTEM_MESSAGE = (
+    "你是一位资深测试工程师。根据需求分析结果,为每个具体功能模块生成详细的测试用例。"
+    "请以Markdown格式输出,包含清晰的章节结构和表格。"
+)
+_TEST_GENERATION_REQUIREMENTS = (
+    "1. 按功能模块组织,每个模块使用 ## 标题\n"
+    "2. 使用表格展示测试用例,包含列: 用例ID | 标题 | 前置条件 | 测试步骤 | 预期结果 | 优先级\n"
+    "3. 测试步骤和前置条件使用简洁的文本描述或编号列表\n"
+    "4. 覆盖正常流程、异常处理、边界条件等场景\n"
+    "5. 专注于功能行为和业务逻辑的验证\n"
+)
+
+
+async def run_test_generation(
     analysis_payload: dict,
     on_chunk: Callable[[str], None] | None = None,
 ) -> tuple[dict, str]:
@@ -409,33 +566,75 @@ def run_test_generation(
     logger.info("阶段 2/4: 测试用例生成（Markdown格式）")
     logger.info("=" * 50)
 
-    system_message = (
-        "你是一位资深测试工程师。根据需求分析结果,为每个具体功能模块生成详细的测试用例。"
-        "请以Markdown格式输出,包含清晰的章节结构和表格。"
-    )
+    system_message = _TEST_GENERATION_SYSTEM_MESSAGE
     test_prompt = (
         "以下是需求分析结果,请以Markdown格式生成测试用例。要求:\n"
-        "1. 按功能模块组织,每个模块使用 ## 标题\n"
-        "2. 使用表格展示测试用例,包含列: 用例ID | 标题 | 前置条件 | 测试步骤 | 预期结果 | 优先级\n"
-        "3. 测试步骤和前置条件使用简洁的文本描述或编号列表\n"
-        "4. 覆盖正常流程、异常处理、边界条件等场景\n"
-        "5. 专注于功能行为和业务逻辑的验证\n\n"
+        f"{_TEST_GENERATION_REQUIREMENTS}\n"
         f"需求分析结果:\n{json.dumps(analysis_payload, ensure_ascii=False)}"
     )
 
     # 使用流式生成
-    test_content = _generate_streaming(
+    test_content = await _generate_streaming(
         system_message=system_message,
         prompt=test_prompt,
         agent_type="test",
         on_chunk=on_chunk,
+        cache_stage="test_generation",
     )
     logger.info("测试用例生成完成（Markdown格式）")
 
     return {}, test_content  # payload为空，只返回Markdown文本
 
 
-def run_quality_review(
+async def run_test_generation_for_module(
+    module: dict,
+    analysis_payload: dict,
+    on_chunk: Callable[[str], None] | None = None,
+) -> tuple[dict, str]:
+    """为单个功能模块生成测试用例（流式输出Markdown）.
+
+    Args:
+        module: 需求分析结果中的单个模块
+        analysis_payload: 完整的需求分析结果，仅取模块以外的上下文
+        on_chunk: 可选的流式回调函数
+
+    Returns:
+        tuple[dict, str]: (空dict, 以 ## 模块名 开头的Markdown测试用例)
+    """
+    module_name = (module.get("name") or module.get("module") or "未命名模块").strip()
+    logger.info(f"阶段 2/4: 测试用例生成（模块: {module_name}）")
+
+    # 其他模块只提供名称，避免提示词随模块数量线性增长
+    context = {key: value for key, value in analysis_payload.items() if key != "modules"}
+    context["other_modules"] = [
+        other.get("name")
+        for other in _collect_module_cases(analysis_payload)
+        if isinstance(other, dict) and other is not module and other.get("name")
+    ]
+
+    test_prompt = (
+        f"以下是需求分析结果中的「{module_name}」模块,请只为该模块以Markdown格式生成测试用例。要求:\n"
+        f"{_TEST_GENERATION_REQUIREMENTS}"
+        f"6. 只输出一个 ## {module_name} 章节,不要为其他模块生成用例\n\n"
+        f"模块详情:\n{json.dumps(module, ensure_ascii=False)}\n\n"
+        f"需求背景:\n{json.dumps(context, ensure_ascii=False)}"
+    )
+
+    test_content = await _generate_streaming(
+        system_message=_TEST_GENERATION_SYSTEM_MESSAGE,
+        prompt=test_prompt,
+        agent_type="test",
+        on_chunk=on_chunk,
+        cache_stage="test_generation",
+    )
+    if not test_content.lstrip().startswith("#"):
+        test_content = f"## {module_name}\n\n{test_content}"
+    logger.info(f"模块测试用例生成完成: {module_name}")
+
+    return {}, test_content
+
+
+async def run_quality_review(
     test_content: str,
     on_chunk: Callable[[str], None] | None = None,
 ) -> tuple[dict, str]:
@@ -464,18 +663,19 @@ def run_quality_review(
         f"测试用例:\n{test_content}"
     )
 
-    review_content = _generate_streaming(
+    review_content = await _generate_streaming(
         system_message=system_message,
         prompt=review_prompt,
         agent_type="review",
         on_chunk=on_chunk,
+        cache_stage="review",
     )
     logger.info("质量评审完成（Markdown格式）")
 
     return {}, review_content  # payload为空，只返回Markdown文本
 
 
-def run_test_completion(
+async def run_test_completion(
     test_content: str,
     review_content: str,
     on_chunk: Callable[[str], None] | None = None,
@@ -508,11 +708,12 @@ def run_test_completion(
     )
 
     # 使用流式生成
-    completion_content = _generate_streaming(
+    completion_content = await _generate_streaming(
         system_message=system_message,
         prompt=completion_prompt,
         agent_type="test",
         on_chunk=on_chunk,
+        cache_stage="test_completion",
     )
     logger.info("用例补全完成（Markdown格式）")
 
@@ -520,7 +721,7 @@ def run_test_completion(
 
 
 # 保留原有的run_analysis函数用于兼容性(已弃用)
-def run_analysis(documents_text: str) -> AutogenOutputs:
+async def run_analysis(documents_text: str) -> AutogenOutputs:
     """[已弃用] 一次性执行所有智能体分析.
 
     建议使用新的分阶段函数: run_requirement_analysis, run_test_generation,
@@ -532,10 +733,10 @@ def run_analysis(documents_text: str) -> AutogenOutputs:
     logger.warning("run_analysis 已弃用，建议使用分阶段函数")
 
     # 调用新的分阶段函数
-    analysis_payload, analysis_content = run_requirement_analysis(documents_text)
-    test_payload, test_content = run_test_generation(analysis_payload)
-    review_payload, review_content = run_quality_review(test_payload)
-    completion_payload, completion_content = run_test_completion(
+    analysis_payload, analysis_content = await run_requirement_analysis(documents_text)
+    test_payload, test_content = await run_test_generation(analysis_payload)
+    review_payload, review_content = await run_quality_review(test_payload)
+    completion_payload, completion_content = await run_test_completion(
         analysis_payload, test_payload, review_payload
     )
 
@@ -0,0 +1,65 @@
+"""Shared keep-alive async clients for the OpenAI-compatible chat endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+try:  # pragma: no cover - optional dependency
+    import httpx
+    from openai import AsyncOpenAI
+except Exception:  # pragma: no cover
+    httpx = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_clients: dict[tuple[int, str | None, str | None], "AsyncOpenAI"] = {}
+
+
+def get_client(base_url: str | None, api_key: str | None) -> "AsyncOpenAI":
+    """Return the shared client for an endpoint, creating it on first use."""
+    if AsyncOpenAI is None:
+        raise RuntimeError("OpenAI 未安装，无法启用流式模式")
+    # httpx.AsyncClient 绑定首次连接时的事件循环，因此按事件循环分别缓存
+    key = (id(asyncio.get_running_loop()), base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        logger.info("Creating pooled LLM client for %s", base_url or "default endpoint")
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.llm_timeout,
+            http_client=httpx.AsyncClient(
+                timeout=settings.llm_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.llm_http_max_connections,
+                    max_keepalive_connections=settings.llm_http_keepalive_connections,
+                ),
+            ),
+        )
+        _clients[key] = client
+    return client
+
+
+async def warm_up() -> None:
+    """Create the clients of every configured agent endpoint at startup."""
+    if AsyncOpenAI is None:
+        return
+    for agent_type in ("analysis", "test", "review"):
+        config = settings.get_agent_config(agent_type)
+        if config.get("api_key"):
+            get_client(config.get("base_url"), config["api_key"])
+
+
+async def close_all() -> None:
+    """Close the pooled clients created on the running loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _clients if key[0] == loop_id]:
+        client = _clients.pop(key)
+        try:
+            await client.close()
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Failed to close LLM client: %s", exc)
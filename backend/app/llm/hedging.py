@@ -0,0 +1,132 @@
+"""Hedged streaming chat requests and per-endpoint first-token latency."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Samples kept per endpoint, and how many are needed before the percentile is trusted
+WINDOW_SIZE = 200
+MIN_SAMPLES = 20
+
+
+class EndpointLatency:
+    """Sliding window of first-token latencies per ``(base_url, model)``."""
+
+    def __init__(self, window: int = WINDOW_SIZE) -> None:
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, endpoint: str, percentile: float) -> float | None:
+        """Return the ``percentile`` (0-100) latency, or ``None`` with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+endpoint_latency = EndpointLatency()
+
+
+def endpoint_key(config: dict) -> str:
+    return f"{config.get('base_url') or 'default'}|{config['model']}"
+
+
+def secondary_config(config: dict) -> dict | None:
+    """Return the configuration hedged requests go to, or ``None`` when hedging is off."""
+    if not settings.llm_hedge_enabled:
+        return None
+    return {
+        "model": settings.llm_hedge_model or config["model"],
+        "api_key": settings.llm_hedge_api_key or config.get("api_key"),
+        "base_url": settings.llm_hedge_base_url or config.get("base_url"),
+    }
+
+
+def hedge_delay(config: dict) -> float:
+    """Seconds to wait for the primary's first token before hedging."""
+    # 取近期首 token 延迟的分位数，只有慢于平时的请求才会对冲；样本不足时使用固定延迟
+    observed = endpoint_latency.percentile(endpoint_key(config), settings.llm_hedge_percentile)
+    if observed is None:
+        return settings.llm_hedge_delay_ms / 1000
+    return observed
+
+
+async def race(
+    primary: Callable[[], Awaitable[T]],
+    secondary: Callable[[], Awaitable[T]] | None,
+    *,
+    delay: float,
+    discard: Callable[[T], Awaitable[None]],
+) -> tuple[T, bool]:
+    """Run ``primary`` and, after ``delay`` or on failure, ``secondary``; return the first result.
+
+    Returns ``(result, hedged_won)``. The losing attempt is cancelled, or passed to
+    ``discard`` when it finished at the same time. Raises the primary's error
+    when every attempt failed.
+    """
+    primary_task = asyncio.create_task(primary())
+    if secondary is None:
+        return await primary_task, False
+
+    tasks = {primary_task}
+    secondary_task: asyncio.Task | None = None
+    errors: list[BaseException] = []
+    loop = asyncio.get_running_loop()
+    hedge_at = loop.time() + delay
+    try:
+        while True:
+            timeout = None if secondary_task is not None else max(0.0, hedge_at - loop.time())
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finished = sorted(done, key=lambda task: task is not primary_task)
+            winner = next((task for task in finished if task.exception() is None), None)
+            if winner is not None:
+                tasks -= {winner}
+                for other in tasks:
+                    await _cancel(other, discard)
+                return winner.result(), winner is secondary_task
+            tasks -= done
+            errors.extend(task.exception() for task in finished)
+            if secondary_task is None:
+                logger.info(
+                    "Primary request %s, sending hedged request",
+                    "failed" if done else f"produced no token within {delay * 1000:.0f} ms",
+                )
+                secondary_task = asyncio.create_task(secondary())
+                tasks.add(secondary_task)
+            elif not tasks:
+                raise errors[0]
+    except BaseException:
+        for task in tasks:
+            await _cancel(task, discard)
+        raise
+
+
+async def _cancel(task: asyncio.Task, discard: Callable[[T], Awaitable[None]]) -> None:
+    task.cancel()
+    # asyncio.wait does not raise the task's error, but still lets our own cancellation through
+    await asyncio.wait([task])
+    if not task.cancelled() and task.exception() is None:
+        # Finished before the cancellation landed: release what it holds
+        await discard(task.result())
@@ -0,0 +1,180 @@
+"""Shared requests-per-minute and tokens-per-minute buckets for model calls."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Literal
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Kind = Literal["chat", "vl"]
+
+# VL calls are charged this much per image up front; the actual usage is settled afterwards
+IMAGE_TOKEN_ESTIMATE = 1280
+
+# A refilled bucket covers one minute of quota; idle buckets expire after two
+_WINDOW_MS = 60_000
+_BUCKET_TTL_MS = 2 * _WINDOW_MS
+
+# KEYS: request bucket, token bucket
+# ARGV: request limit, token limit, tokens, force (charge without checking), TTL in ms
+# Returns the milliseconds to wait, 0 when the call was admitted and charged
+_TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local costs = {1, tonumber(ARGV[3])}
+local force = ARGV[4] == '1'
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  if limits[i] > 0 then
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or limits[i]
+    local ts = tonumber(state[2]) or now
+    level = math.min(limits[i], level + (now - ts) * limits[i] / 60000)
+    levels[i] = level
+    local cost = math.min(costs[i], limits[i])
+    if level < cost then
+      wait = math.max(wait, math.ceil((cost - level) * 60000 / limits[i]))
+    end
+  end
+end
+if force then
+  wait = 0
+end
+for i = 1, 2 do
+  if levels[i] ~= nil then
+    local level = levels[i]
+    if wait == 0 then
+      level = level - costs[i]
+    end
+    redis.call('HSET', KEYS[i], 'level', tostring(level), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[i], ARGV[5])
+  end
+end
+return wait
+"""
+
+
+@dataclass
+class _Bucket:
+    level: float
+    updated: float
+
+
+_local_buckets: dict[str, _Bucket] = {}
+_script = None
+_scripting_available = True
+
+
+def _limits(kind: Kind) -> tuple[int, int]:
+    if kind == "vl":
+        return settings.vl_rpm_limit, settings.vl_tpm_limit
+    return settings.llm_rpm_limit, settings.llm_tpm_limit
+
+
+def _bucket_keys(model: str, api_key: str | None) -> tuple[str, str]:
+    # Never put the key itself into Redis
+    key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    prefix = f"ratelimit:{model}:{key_id}"
+    return f"{prefix}:requests", f"{prefix}:tokens"
+
+
+def _take_local(keys: tuple[str, str], limits: tuple[int, int], tokens: int, force: bool) -> int:
+    now = time.monotonic() * 1000
+    costs = (1, tokens)
+    wait = 0
+    levels: dict[str, float] = {}
+    for key, limit, cost in zip(keys, limits, costs):
+        if limit <= 0:
+            continue
+        bucket = _local_buckets.get(key) or _Bucket(level=limit, updated=now)
+        level = min(limit, bucket.level + (now - bucket.updated) * limit / _WINDOW_MS)
+        levels[key] = level
+        cost = min(cost, limit)
+        if level < cost:
+            wait = max(wait, int((cost - level) * _WINDOW_MS / limit) + 1)
+    if force:
+        wait = 0
+    for key, cost in zip(keys, costs):
+        if key in levels:
+            level = levels[key] - cost if wait == 0 else levels[key]
+            _local_buckets[key] = _Bucket(level=level, updated=now)
+    return wait
+
+
+async def _take(keys: tuple[str, str], limits: tuple[int, int], tokens: int, force: bool) -> int:
+    global _script, _scripting_available
+    if redis is not None and _scripting_available and hasattr(redis, "register_script"):
+        try:
+            if _script is None:
+                _script = redis.register_script(_TAKE_SCRIPT)
+            wait = await _script(
+                keys=list(keys),
+                args=[limits[0], limits[1], tokens, 1 if force else 0, _BUCKET_TTL_MS],
+            )
+            return int(wait)
+        except RedisError as exc:
+            if "unknown command" in str(exc).lower():
+                logger.info("Redis cannot run scripts, rate limiting per process")
+                _scripting_available = False
+            else:
+                logger.warning("Rate limiter unavailable, falling back to local buckets: %s", exc)
+    # Redis 不可用或不支持脚本（如 fakeredis）时仅在本进程内限流
+    return _take_local(keys, limits, tokens, force)
+
+
+async def acquire(model: str, api_key: str | None, *, tokens: int = 0, kind: Kind = "chat") -> float:
+    """Wait until one request of ``tokens`` fits the model's quota and charge it.
+
+    Returns the number of seconds spent waiting.
+    """
+    limits = _limits(kind)
+    if not settings.rate_limit_enabled or not any(limit > 0 for limit in limits):
+        return 0.0
+    keys = _bucket_keys(model, api_key)
+    waited = 0.0
+    while True:
+        wait_ms = await _take(keys, limits, max(tokens, 0), False)
+        if wait_ms <= 0:
+            return waited
+        logger.info("Rate limit reached for %s, waiting %d ms", model, wait_ms)
+        await asyncio.sleep(wait_ms / 1000)
+        waited += wait_ms / 1000
+
+
+async def consume(model: str, api_key: str | None, tokens: int, *, kind: Kind = "chat") -> None:
+    """Charge tokens used beyond the estimate taken in :func:`acquire`."""
+    limits = _limits(kind)
+    if not settings.rate_limit_enabled or tokens <= 0 or limits[1] <= 0:
+        return
+    await _take(_bucket_keys(model, api_key), (0, limits[1]), tokens, True)
+
+
+def usage_tokens(response: object) -> int | None:
+    """Return the total tokens reported by a DashScope response, if any."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    try:
+        return int(usage["input_tokens"]) + int(usage["output_tokens"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def reset() -> None:
+    """Forget the process-local buckets (used by tests)."""
+    global _script, _scripting_available
+    _local_buckets.clear()
+    _script = None
+    _scripting_available = True
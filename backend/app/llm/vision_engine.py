@@ -0,0 +1,312 @@
+"""DashScope VL/OCR model calls with caching, rate limiting and retries."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Literal
+
+from app.cache import image_cache
+from app.config import settings
+from app.llm import rate_limiter
+from app.parsers.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+try:  # pragma: no cover - optional dependency
+    from dashscope import MultiModalConversation
+except ImportError:  # pragma: no cover
+    MultiModalConversation = None  # type: ignore
+    logger.warning("dashscope not available, VL image recognition will be disabled")
+
+DASHSCOPE_AVAILABLE = MultiModalConversation is not None
+
+PromptMode = Literal["layout", "requirement", "analysis"]
+
+LAYOUT_ANALYSIS_PROMPT = """请识别并提取图片中的所有文字内容，保持原有的排版结构和段落层次。
+
+要求：
+1. 按照从上到下、从左到右的顺序提取文字
+2. 保留标题、序号、列表等结构
+3. 如果有表格，请尽量还原表格的行列结构
+4. 不要对内容进行总结、分析或解读，仅提取原文
+5. 保持原有的换行和段落分隔
+
+请直接输出识别的文字内容，不要添加任何额外的说明或评论。"""
+
+REQUIREMENT_EXTRACTION_PROMPT = """请仔细分析这张图片中的需求文档信息，并提取以下内容：
+
+1. **业务场景**：图片中描述的业务场景或用户故事
+2. **功能点**：具体的功能需求和特性
+3. **业务流程**：如果有流程图或步骤说明，请详细描述
+4. **业务规则**：约束条件、验证规则、业务逻辑
+5. **数据要求**：涉及的数据字段、格式、范围等
+6. **界面元素**：如果是界面截图，描述页面布局、控件、交互等
+7. **其他重要信息**：任何其他与需求相关的信息
+
+请用清晰、结构化的文字输出，便于后续进行测试用例设计。如果图片中包含表格，请保留表格结构。如果包含流程图，请用文字描述流程的每个步骤和分支。"""
+
+MULTIMODAL_ANALYSIS_PROMPT = """请仔细分析这份需求文档（图片/PDF），并提取结构化信息。
+
+**分析要求：**
+1. **功能模块**：识别文档中的所有功能模块，提取实际模块名称（不使用"模块1"等占位符）
+2. **业务场景**：描述每个模块的具体业务场景和用户故事
+3. **业务规则**：提取约束条件、验证规则、性能指标等
+4. **视觉理解**（充分利用图像的视觉信息）：
+   - 如果是流程图，请描述完整的流程步骤、分支条件和循环
+   - 如果是UI原型/界面截图，请描述页面布局、控件类型（按钮、输入框、下拉框等）和交互方式
+   - 如果是架构图/系统图，请描述系统组件、模块划分和它们之间的关系
+   - 如果包含表格，请完整保留表格的行列结构和内容
+   - 注意箭头、连线、颜色、图标等视觉元素的含义
+
+**输出格式（严格JSON格式）：**
+```json
+{
+  "modules": [
+    {
+      "name": "实际功能模块名（如：用户登录模块、订单管理模块）",
+      "scenarios": [
+        {"description": "具体业务场景描述（如：用户通过手机号+验证码登录）"}
+      ],
+      "rules": [
+        {"description": "具体业务规则描述（如：验证码有效期5分钟，最多重发3次）"}
+      ]
+    }
+  ],
+  "risks": [
+    {"description": "测试风险点描述"}
+  ]
+}
+```
+
+**重要提示：**
+- 必须基于图片的**完整视觉信息**进行分析
+- 提取文档中的**实际内容**，避免使用泛化占位符
+- 如果图片包含多页或多个部分，请完整分析所有内容
+- 输出必须是有效的JSON格式，不要添加markdown代码块标记
+"""
+
+PROMPTS: dict[str, str] = {
+    "layout": LAYOUT_ANALYSIS_PROMPT,
+    "requirement": REQUIREMENT_EXTRACTION_PROMPT,
+    "analysis": MULTIMODAL_ANALYSIS_PROMPT,
+}
+
+# Multimodal analysis reads documents (rather than images) with the dedicated OCR model
+DOCUMENT_OCR_MODEL = "qwen-vl-ocr-latest"
+
+_INITIAL_DELAY = 1.0
+_MAX_DELAY = 60.0
+
+
+class VisionError(Exception):
+    """VL 模型调用或解析失败."""
+
+
+class VisionRateLimitError(VisionError):
+    """VL 模型 API 限流."""
+
+
+class VisionAuthError(VisionError):
+    """VL 模型认证失败，不重试."""
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def is_available() -> bool:
+    """检查 VL 模型是否可用."""
+    return DASHSCOPE_AVAILABLE
+
+
+def parse_response(response: Any) -> str:
+    """Return the text of a ``MultiModalConversation`` response or raise a :class:`VisionError`."""
+    if response.status_code == HTTPStatus.OK:
+        content = response.output.choices[0]["message"]["content"]
+        if isinstance(content, list):
+            # qwen3-vl 等模型返回 [{"text": "..."}, ...]
+            parts = [item["text"] for item in content if isinstance(item, dict) and "text" in item]
+            text = "\n".join(parts) if parts else str(content)
+        elif isinstance(content, str):
+            text = content
+        else:
+            logger.warning("Unexpected VL content type: %s", type(content))
+            text = str(content)
+        if not text.strip():
+            raise VisionError("VL model returned empty content")
+        return text
+
+    message = (
+        f"VL model call failed - Request ID: {getattr(response, 'request_id', None)}, "
+        f"Status: {response.status_code}, Error code: {getattr(response, 'code', None)}, "
+        f"Error message: {getattr(response, 'message', None)}"
+    )
+    if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        raise VisionRateLimitError(message)
+    if response.status_code in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+        raise VisionAuthError(message)
+    raise VisionError(message)
+
+
+# SDK 调用是同步的（其异步版本会在事件循环上同步上传本地文件），放到专用线程池执行：
+# 按 VL_MAX_CONCURRENCY 限制单进程并发，且不占用 to_thread 的默认线程池
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.vl_max_concurrency, thread_name_prefix="vl"
+            )
+        return _executor
+
+
+async def _settle(model: str, api_key: str, response: Any, estimated_tokens: int) -> None:
+    """Charge the tokens a response used beyond the estimate taken up front."""
+    used_tokens = rate_limiter.usage_tokens(response)
+    if used_tokens is not None:
+        await rate_limiter.consume(model, api_key, used_tokens - estimated_tokens, kind="vl")
+
+
+def _settle_abandoned(
+    future: Future, loop: asyncio.AbstractEventLoop, model: str, api_key: str, estimated_tokens: int
+) -> None:
+    # 在执行器线程中回调：请求已被放弃，只在事件循环上结算额度
+    if future.cancelled() or future.exception() is not None or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_settle(model, api_key, future.result(), estimated_tokens), loop)
+    except RuntimeError:  # pragma: no cover - loop closed concurrently
+        pass
+
+
+async def _call(
+    model: str, api_key: str, base_url: str | None, messages: list[dict], estimated_tokens: int
+) -> Any:
+    call_kwargs: dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "result_format": "message",
+        "api_key": api_key,
+    }
+    if base_url:
+        call_kwargs["base_url"] = base_url
+    # 已发出的请求无法中断，取消后仍占用一个线程直到 DashScope 返回
+    future = _get_executor().submit(lambda: MultiModalConversation.call(**call_kwargs))
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # 尚未开始的请求随取消一并撤回；已发出的请求无法中断，完成后仅结算额度
+        if not future.cancelled():
+            logger.info("VL call to %s cancelled while in flight; it will finish in the background", model)
+            loop = asyncio.get_running_loop()
+            future.add_done_callback(
+                lambda done: _settle_abandoned(done, loop, model, api_key, estimated_tokens)
+            )
+        raise
+
+
+async def analyze(
+    path: str | Path,
+    *,
+    model: str,
+    api_key: str | None,
+    base_url: str | None = None,
+    prompt_mode: PromptMode = "requirement",
+    use_cache: bool = True,
+) -> str:
+    """使用 VL 模型识别图片/文档，返回模型输出的文本.
+
+    Raises:
+        ValueError: 未配置 API Key 或提示词模式无效
+        FileNotFoundError: 文件不存在
+        ImportError: 未安装 dashscope
+        VisionError: 重试后仍调用失败
+    """
+    if not api_key:
+        raise ValueError("api_key is required for VL model")
+    if prompt_mode not in PROMPTS:
+        raise ValueError(f"Invalid prompt_mode: {prompt_mode}")
+    path = Path(path).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    if not DASHSCOPE_AVAILABLE:
+        raise ImportError("dashscope package is not installed. Please install it with: pip install dashscope>=1.24.6")
+
+    if use_cache:
+        cached = await image_cache.get_cached_extraction(path, model, prompt_mode)
+        if cached:
+            return cached
+
+    prompt = PROMPTS[prompt_mode]
+    messages = [{"role": "user", "content": [{"image": f"file://{path}"}, {"text": prompt}]}]
+    estimated_tokens = rate_limiter.IMAGE_TOKEN_ESTIMATE + estimate_tokens(prompt)
+    max_retries = settings.vl_max_retries
+    delay = _INITIAL_DELAY
+    logger.info("Calling VL model %s (%s) on %s", model, prompt_mode, path.name)
+
+    for attempt in range(max_retries + 1):
+        try:
+            await rate_limiter.acquire(model, api_key, tokens=estimated_tokens, kind="vl")
+            response = await _call(model, api_key, base_url, messages, estimated_tokens)
+            await _settle(model, api_key, response, estimated_tokens)
+            text = parse_response(response)
+        except VisionAuthError:
+            raise
+        except Exception as exc:  # noqa: BLE001 - SDK and network errors are retried alike
+            if attempt >= max_retries:
+                raise VisionError(f"Failed after {max_retries + 1} attempts: {exc}") from exc
+            # 限流时退避更久
+            factor = 4 if isinstance(exc, VisionRateLimitError) else 2
+            logger.warning(
+                "VL attempt %d/%d failed: %s. Retrying in %.1fs", attempt + 1, max_retries + 1, exc, delay
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * factor, _MAX_DELAY)
+            continue
+
+        logger.info("VL model %s returned %d characters for %s", model, len(text), path.name)
+        if use_cache:
+            await image_cache.cache_extraction(path, model, text, prompt_mode, ttl=settings.vl_cache_ttl_seconds)
+        return text
+
+    raise VisionError("VL model call failed")  # pragma: no cover - loop always returns or raises
+
+
+def analyze_sync(path: str | Path, **kwargs: Any) -> str:
+    """Blocking :func:`analyze` for synchronous callers running in worker threads.
+
+    The call runs on the loop bound by :func:`start`, which owns the shared
+    Redis client used by the cache and rate limiter.
+    """
+    loop = _loop
+    if loop is None or not loop.is_running():
+        raise RuntimeError("vision engine is not started; await vision_engine.start() on the application loop first")
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("analyze_sync must not be called on the event loop; await analyze() instead")
+    return asyncio.run_coroutine_threadsafe(analyze(path, **kwargs), loop).result()
+
+
+async def start() -> None:
+    """Bind the engine to the running loop (application startup)."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+
+
+async def shutdown() -> None:
+    """Release the VL executor (application shutdown)."""
+    global _executor, _loop
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+    _loop = None
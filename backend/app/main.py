@@ -4,10 +4,16 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api import api_router, websocket
+from app.cache import completion_cache
 from app.config import settings
 from app.db import init_models
+from app.llm import client_pool, vision_engine
+from app.orchestrator import workflow
+from app.orchestrator.batch import batch_scheduler
+from app.utils import tracing
 from app.utils.logger import configure_logging
 
 
@@ -18,7 +24,15 @@ async def lifespan(app: FastAPI):
     configure_logging("DEBUG" if settings.debug else "INFO")
     _ = settings.resolved_upload_dir
     await init_models()
+    await client_pool.warm_up()
+    await vision_engine.start()
+    await workflow.resume_interrupted()
     yield
+    # 滚动发布：停止接收新会话，等待执行中的阶段完成后再退出
+    await batch_scheduler.stop()
+    await workflow.drain(settings.shutdown_drain_timeout)
+    await client_pool.close_all()
+    await vision_engine.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -41,6 +55,11 @@ def create_app() -> FastAPI:
     async def healthcheck():
         return {"status": "ok"}
 
+    @app.get("/metrics", tags=["system"], summary="Workflow latency histograms and cache counters")
+    async def metrics():
+        body = tracing.render_metrics() + completion_cache.render_metrics()
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
     return app
 
 
@@ -2,4 +2,4 @@
 
 from app.db.base import Base  # noqa: F401
 from app.models.document import Document  # noqa: F401
-from app.models.session import AgentRun, Session, SessionResult  # noqa: F401
+from app.models.session import AgentRun, Session, SessionBatch, SessionResult  # noqa: F401
@@ -128,3 +128,18 @@ class SessionResult(Base):
     )
 
     session: Mapped[Session] = relationship("Session", back_populates="results", lazy="joined")
+
+
+class SessionBatch(Base):
+    """Group of sessions created together through the batch endpoint."""
+
+    __tablename__ = "session_batches"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid4()), index=True
+    )
+    session_ids: Mapped[list] = mapped_column(JSON, default=list)
+    created_by: Mapped[Optional[str]] = mapped_column(String(128))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False), default=datetime.utcnow, nullable=False
+    )
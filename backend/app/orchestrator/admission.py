@@ -0,0 +1,183 @@
+"""Global, per-model and per-tenant concurrency slots for LLM stage calls."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+@dataclass(eq=False)
+class _Waiter:
+    model: str
+    tenant: str
+    future: asyncio.Future
+    on_position: PositionCallback | None = None
+    position: int | None = field(default=None)
+
+
+class AdmissionController:
+    """Bound concurrent LLM calls with fair-share queuing across tenants."""
+
+    def __init__(self, *, max_total: int, max_per_model: int, max_per_tenant: int) -> None:
+        self.max_total = max_total
+        self.max_per_model = max_per_model
+        self.max_per_tenant = max_per_tenant
+        self._active_total = 0
+        self._active_models: Counter[str] = Counter()
+        self._active_tenants: Counter[str] = Counter()
+        # tenant -> FIFO of waiters; dict order is the round-robin rotation
+        self._queues: dict[str, deque[_Waiter]] = {}
+        self._callbacks: set[asyncio.Task] = set()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        *,
+        model: str,
+        tenant: str,
+        on_position: PositionCallback | None = None,
+    ) -> AsyncIterator[float]:
+        """Hold an admission slot for the duration of the block.
+
+        Yields the number of seconds spent waiting in the queue.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await self._acquire(model, tenant, on_position)
+        try:
+            yield loop.time() - started
+        finally:
+            self._release(model, tenant)
+
+    async def _acquire(self, model: str, tenant: str, on_position: PositionCallback | None) -> None:
+        # Only bypass the queue when nobody is waiting, otherwise newcomers would jump ahead
+        if not self._queues and self._has_capacity(model, tenant):
+            self._take(model, tenant)
+            return
+
+        waiter = _Waiter(
+            model=model,
+            tenant=tenant,
+            future=asyncio.get_running_loop().create_future(),
+            on_position=on_position,
+        )
+        self._queues.setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        self._publish_positions()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted and cancelled at the same time: hand the slot back
+                self._release(model, tenant)
+            else:
+                self._discard(waiter)
+                self._dispatch()
+                self._publish_positions()
+            raise
+
+        if waiter.position is not None:
+            self._notify(waiter, 0)
+
+    def _release(self, model: str, tenant: str) -> None:
+        self._active_total -= 1
+        self._active_models[model] -= 1
+        self._active_tenants[tenant] -= 1
+        if self._active_models[model] <= 0:
+            del self._active_models[model]
+        if self._active_tenants[tenant] <= 0:
+            del self._active_tenants[tenant]
+        self._dispatch()
+        self._publish_positions()
+
+    def _has_capacity(self, model: str, tenant: str) -> bool:
+        return (
+            self._active_total < self.max_total
+            and self._active_models[model] < self.max_per_model
+            and self._active_tenants[tenant] < self.max_per_tenant
+        )
+
+    def _take(self, model: str, tenant: str) -> None:
+        self._active_total += 1
+        self._active_models[model] += 1
+        self._active_tenants[tenant] += 1
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queue heads, rotating through tenants."""
+        granted = True
+        while granted and self._queues and self._active_total < self.max_total:
+            granted = False
+            for tenant in list(self._queues):
+                waiter = self._queues[tenant][0]
+                if not self._has_capacity(waiter.model, tenant):
+                    continue
+                queue = self._queues.pop(tenant)
+                queue.popleft()
+                if queue:
+                    # Served tenants move to the back of the rotation
+                    self._queues[tenant] = queue
+                self._take(waiter.model, tenant)
+                waiter.future.set_result(None)
+                granted = True
+                break
+
+    def _discard(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.tenant)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[waiter.tenant]
+
+    def _publish_positions(self) -> None:
+        """Report fair-share queue positions (1-based) to waiters whose position changed."""
+        queues = [list(queue) for queue in self._queues.values()]
+        position = 0
+        for depth in range(max((len(queue) for queue in queues), default=0)):
+            for queue in queues:
+                if depth >= len(queue):
+                    continue
+                position += 1
+                waiter = queue[depth]
+                if waiter.position != position:
+                    waiter.position = position
+                    self._notify(waiter, position)
+
+    def _notify(self, waiter: _Waiter, position: int) -> None:
+        if waiter.on_position is None:
+            return
+
+        async def _run() -> None:
+            try:
+                await waiter.on_position(position)
+            except Exception:  # pragma: no cover - notification is best effort
+                logger.exception("Failed to report admission queue position")
+
+        task = asyncio.get_running_loop().create_task(_run())
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+
+admission_controller = AdmissionController(
+    max_total=settings.llm_max_concurrency,
+    max_per_model=settings.llm_max_concurrency_per_model,
+    max_per_tenant=settings.llm_max_concurrency_per_tenant,
+)
@@ -0,0 +1,109 @@
+"""Paced launching of sessions created through the batch endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Iterable
+
+from app.config import settings
+from app.db.base import AsyncSessionLocal
+from app.models.session import Session, SessionStatus
+from app.orchestrator.workflow import workflow
+
+logger = logging.getLogger(__name__)
+
+LaunchCallback = Callable[[str], Awaitable["asyncio.Task | None"]]
+AwaitingCheck = Callable[[str], bool]
+
+
+class BatchScheduler:
+    """Start queued sessions at a bounded, steady rate."""
+
+    # 进程内执行模式下限制同时执行的批量会话数（等待确认的会话不计入）；队列模式由 worker 池限流，这里只控制入队节奏。
+    # 排队中的会话保持 created，进程重启后由 resume_interrupted 重新交给调度器
+
+    def __init__(
+        self,
+        launch: LaunchCallback,
+        *,
+        max_active: int,
+        launch_interval: float,
+        is_awaiting: AwaitingCheck | None = None,
+    ) -> None:
+        self.max_active = max_active
+        self.launch_interval = launch_interval
+        self._launch = launch
+        self._is_awaiting = is_awaiting or (lambda session_id: False)
+        self._pending: deque[str] = deque()
+        self._active: dict[asyncio.Task, str] = {}
+        self._runner: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, session_ids: Iterable[str]) -> None:
+        """Queue sessions for launch; must be called from the event loop."""
+        queued = set(self._pending)
+        self._pending.extend(session_id for session_id in session_ids if session_id not in queued)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    def wake(self) -> None:
+        """Re-check the active limit, e.g. after a session started waiting for confirmation."""
+        self._wakeup.set()
+
+    def _running(self) -> int:
+        return sum(1 for session_id in self._active.values() if not self._is_awaiting(session_id))
+
+    async def _run(self) -> None:
+        while self._pending:
+            while self._running() >= self.max_active:
+                self._wakeup.clear()
+                wakeup = asyncio.create_task(self._wakeup.wait())
+                try:
+                    await asyncio.wait({*self._active, wakeup}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    wakeup.cancel()
+
+            session_id = self._pending.popleft()
+            if not await self._is_launchable(session_id):
+                continue
+
+            try:
+                task = await self._launch(session_id)
+            except Exception:
+                logger.exception("Failed to launch batch session %s", session_id)
+                continue
+            if task is not None:
+                self._active[task] = session_id
+                task.add_done_callback(lambda done: self._active.pop(done, None))
+
+            if self._pending and self.launch_interval > 0:
+                await asyncio.sleep(self.launch_interval)
+
+    async def stop(self) -> None:
+        """Stop launching; sessions still queued stay ``created`` for the next process."""
+        if self._runner is not None and not self._runner.done():
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+        self._pending.clear()
+
+    @staticmethod
+    async def _is_launchable(session_id: str) -> bool:
+        # 排队期间被取消的会话不再启动
+        async with AsyncSessionLocal() as db_session:
+            session = await db_session.get(Session, session_id)
+        return session is not None and session.status == SessionStatus.created
+
+
+batch_scheduler = BatchScheduler(
+    workflow.launch,
+    max_active=settings.batch_max_active_sessions,
+    launch_interval=settings.batch_launch_interval_ms / 1000,
+    is_awaiting=workflow.is_awaiting_confirmation,
+)
+workflow.add_awaiting_listener(batch_scheduler.wake)
@@ -0,0 +1,109 @@
+"""Per-session time budgets and model latency estimates for agent stages."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+from app.config import settings
+from app.models.session import AgentStage
+
+# Relative share of the session budget per stage
+STAGE_WEIGHTS: dict[AgentStage, float] = {
+    AgentStage.requirement_analysis: 3.0,
+    AgentStage.test_generation: 4.0,
+    AgentStage.review: 1.5,
+    AgentStage.test_completion: 2.5,
+}
+
+# Estimates older than this are ignored, so a model that was slow gets another chance
+ESTIMATE_TTL_SECONDS = 600
+
+# Agent whose model configuration serves each stage
+STAGE_AGENTS: dict[AgentStage, str] = {
+    AgentStage.requirement_analysis: "analysis",
+    AgentStage.test_generation: "test",
+    AgentStage.review: "review",
+    AgentStage.test_completion: "test",
+}
+
+
+@dataclass(frozen=True)
+class StagePlan:
+    """How a stage should run: which model and under which deadline."""
+
+    timeout: float | None
+    use_fallback: bool
+
+
+class StageLatency:
+    """Exponentially weighted moving average of stage durations per model."""
+
+    def __init__(self, alpha: float = 0.3) -> None:
+        self.alpha = alpha
+        self._averages: dict[tuple[str, AgentStage], tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, stage: AgentStage, seconds: float) -> None:
+        key = (model, stage)
+        now = time.monotonic()
+        with self._lock:
+            previous = self._averages.get(key)
+            if previous is None or now - previous[1] > ESTIMATE_TTL_SECONDS:
+                average = seconds
+            else:
+                average = previous[0] + self.alpha * (seconds - previous[0])
+            self._averages[key] = (average, now)
+
+    def estimate(self, model: str, stage: AgentStage) -> float | None:
+        with self._lock:
+            entry = self._averages.get((model, stage))
+        if entry is None or time.monotonic() - entry[1] > ESTIMATE_TTL_SECONDS:
+            return None
+        return entry[0]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._averages.clear()
+
+
+stage_latency = StageLatency()
+
+
+def stage_budget(stage: AgentStage, *, spent: float, remaining_stages: Iterable[AgentStage]) -> float | None:
+    """Return the seconds available to ``stage``, or ``None`` when budgets are disabled."""
+    total = settings.session_time_budget_seconds
+    if total <= 0:
+        return None
+    # 预算不含等待人工确认的时间；按剩余阶段的权重分配，快速阶段省下的时间留给后续阶段
+    weights = [STAGE_WEIGHTS.get(item, 1.0) for item in set(remaining_stages) | {stage}]
+    share = STAGE_WEIGHTS.get(stage, 1.0) / sum(weights)
+    return max(0.0, (total - spent) * share)
+
+
+def plan_stage(stage: AgentStage, *, spent: float, remaining_stages: Iterable[AgentStage]) -> StagePlan:
+    """Choose the model and deadline for the next attempt of ``stage``.
+
+    The deadline only applies when a fallback model exists; without one the
+    stage runs as before and is bounded by ``LLM_TIMEOUT`` per request only.
+    """
+    agent_type = STAGE_AGENTS.get(stage)
+    primary = settings.get_agent_config(agent_type)["model"] if agent_type else None
+    fallback = settings.get_fallback_model(agent_type) if agent_type else None
+    if not fallback or fallback == primary:
+        return StagePlan(timeout=None, use_fallback=False)
+
+    budget = stage_budget(stage, spent=spent, remaining_stages=remaining_stages)
+    estimate = stage_latency.estimate(primary, stage)
+    slow = (
+        settings.llm_fallback_latency_ms > 0
+        and estimate is not None
+        and estimate * 1000 > settings.llm_fallback_latency_ms
+    )
+    over_budget = budget is not None and (budget <= 0 or (estimate is not None and estimate > budget))
+    if over_budget or slow:
+        # 预算已耗尽、主模型预计无法按时完成或近期延迟过高：直接使用备用模型
+        return StagePlan(timeout=None, use_fallback=True)
+    return StagePlan(timeout=budget, use_fallback=False)
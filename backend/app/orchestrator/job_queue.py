@@ -0,0 +1,142 @@
+"""Redis-backed job queue with worker leases for ``WORKFLOW_MODE=queue``."""
+
+from __future__ import annotations
+
+import logging
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "workflow:jobs:pending"
+_PROCESSING_KEY = "workflow:jobs:processing"
+_CANCEL_CHANNEL = "workflow:cancel"
+
+
+def _lease_key(session_id: str) -> str:
+    return f"workflow:jobs:lease:{session_id}"
+
+
+def is_available() -> bool:
+    """Return whether a real Redis backend is configured for the queue."""
+
+    return redis is not None and hasattr(redis, "blmove")
+
+
+async def enqueue(session_id: str) -> None:
+    """Append a session workflow job to the pending queue."""
+
+    if redis is None:
+        raise RuntimeError("Redis is required for the workflow job queue")
+    await redis.lpush(_PENDING_KEY, session_id)
+    logger.info("Enqueued workflow job for session %s", session_id)
+
+
+async def claim(worker_id: str, timeout: float = 5.0) -> str | None:
+    """Block up to ``timeout`` seconds for a job and take a lease on it."""
+
+    try:
+        session_id = await redis.blmove(_PENDING_KEY, _PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    except RedisError as exc:
+        logger.warning("Failed to claim workflow job: %s", exc)
+        return None
+    if session_id is None:
+        return None
+    await redis.set(_lease_key(session_id), worker_id, ex=settings.workflow_lease_seconds)
+    logger.info("Worker %s claimed session %s", worker_id, session_id)
+    return session_id
+
+
+async def heartbeat(session_id: str, worker_id: str) -> bool:
+    """Extend the lease on a job. Returns ``False`` if the lease was lost."""
+
+    key = _lease_key(session_id)
+    owner = await redis.get(key)
+    if owner not in (None, worker_id):
+        return False
+    await redis.set(key, worker_id, ex=settings.workflow_lease_seconds)
+    return True
+
+
+async def complete(session_id: str) -> None:
+    """Remove a finished job from the processing list and drop its lease."""
+
+    await redis.lrem(_PROCESSING_KEY, 0, session_id)
+    await redis.delete(_lease_key(session_id))
+
+
+async def release(session_id: str) -> None:
+    """Hand an unfinished job back to the queue so another worker resumes it."""
+
+    await redis.lrem(_PROCESSING_KEY, 0, session_id)
+    await redis.delete(_lease_key(session_id))
+    await redis.rpush(_PENDING_KEY, session_id)
+    logger.info("Released workflow job for session %s back to the queue", session_id)
+
+
+async def remove_pending(session_id: str) -> bool:
+    """Drop a job that no worker has claimed yet. Returns whether it was queued."""
+
+    try:
+        return bool(await redis.lrem(_PENDING_KEY, 0, session_id))
+    except RedisError as exc:
+        logger.warning("Failed to remove pending job for session %s: %s", session_id, exc)
+        return False
+
+
+async def publish_cancel(session_id: str) -> None:
+    """Ask whichever worker holds the job for ``session_id`` to cancel it."""
+
+    try:
+        await redis.publish(_CANCEL_CHANNEL, session_id)
+    except RedisError as exc:
+        logger.warning("Failed to publish cancellation for session %s: %s", session_id, exc)
+
+
+async def subscribe_cancellations():
+    """Return a pub/sub subscription delivering cancelled session identifiers."""
+
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(_CANCEL_CHANNEL)
+    return pubsub
+
+
+class LeaseReaper:
+    """Re-queue jobs whose worker stopped heartbeating.
+
+    A job is re-queued only after its lease is missing on two consecutive
+    sweeps, so a job caught between ``BLMOVE`` and the lease write is not
+    stolen from the worker that just claimed it.
+    """
+
+    def __init__(self) -> None:
+        self._suspects: set[str] = set()
+
+    async def sweep(self) -> list[str]:
+        try:
+            processing = await redis.lrange(_PROCESSING_KEY, 0, -1)
+        except RedisError as exc:
+            logger.warning("Failed to inspect processing jobs: %s", exc)
+            return []
+
+        orphaned = []
+        for session_id in set(processing):
+            if await redis.exists(_lease_key(session_id)):
+                continue
+            orphaned.append(session_id)
+
+        requeued = []
+        for session_id in orphaned:
+            if session_id not in self._suspects:
+                continue
+            # LREM returns the removed count, so concurrent reapers never re-queue twice
+            if await redis.lrem(_PROCESSING_KEY, 0, session_id):
+                await redis.rpush(_PENDING_KEY, session_id)
+                requeued.append(session_id)
+                logger.warning("Lease expired for session %s, job re-queued", session_id)
+
+        self._suspects = set(orphaned) - set(requeued)
+        return requeued
@@ -0,0 +1,67 @@
+"""Write-behind buffer for session progress events and status."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from app.cache import session_events
+from app.config import settings
+from app.websocket.manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    """Coalesce the persisted events and status of one session."""
+
+    def __init__(self, session_id: str, *, interval: float | None = None) -> None:
+        self.session_id = session_id
+        # 广播与下一次落盘之间连接的客户端可能在历史回放中漏掉事件，间隔应保持较短
+        self._interval = (
+            interval if interval is not None else settings.progress_flush_interval_ms / 1000
+        )
+        self._events: list[Dict[str, Any]] = []
+        self._status: Dict[str, Any] | None = None
+        self._timer: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._events) + (self._status is not None)
+
+    async def publish(self, event: Dict[str, Any], status: Dict[str, Any] | None = None) -> None:
+        """Broadcast ``event`` now and schedule it (and ``status``) for persistence."""
+        self._events.append(event)
+        if status is not None:
+            self._status = status
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        await manager.broadcast(self.session_id, event)
+
+    async def flush(self) -> None:
+        """Persist everything buffered so far."""
+        if self._timer is not None and not self._timer.done():
+            # Nothing is left for the scheduled flush to write
+            self._timer.cancel()
+        async with self._lock:
+            events, self._events = self._events, []
+            status, self._status = self._status, None
+            if events:
+                await session_events.append_events(self.session_id, events)
+            if status is not None:
+                await session_events.set_status(self.session_id, status)
+
+    async def close(self) -> None:
+        """Flush the remaining updates and stop the pending timer."""
+        await self.flush()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._interval)
+        self._timer = None
+        try:
+            # An explicit flush() may cancel this task; a write that has started still completes
+            await asyncio.shield(self.flush())
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Failed to flush progress for session %s: %s", self.session_id, exc)
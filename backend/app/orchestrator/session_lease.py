@@ -0,0 +1,75 @@
+"""Ownership leases for workflows executed inside API processes."""
+
+from __future__ import annotations
+
+import logging
+
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _owner_key(session_id: str) -> str:
+    return f"workflow:owner:{session_id}"
+
+
+def _ttl_ms() -> int:
+    return int(settings.workflow_lease_seconds * 1000)
+
+
+async def acquire(session_id: str, owner_id: str) -> bool:
+    """Take the lease on a session. Returns ``False`` if another run holds it."""
+
+    # 没有 Redis 时无需协调，认领总是成功
+    if redis is None:
+        return True
+    try:
+        return bool(await redis.set(_owner_key(session_id), owner_id, nx=True, px=_ttl_ms()))
+    except RedisError as exc:
+        logger.warning("Failed to take lease on session %s, running without it: %s", session_id, exc)
+        return True
+
+
+async def renew(session_id: str, owner_id: str) -> bool:
+    """Extend a lease held by ``owner_id``. Returns ``False`` if it was lost."""
+
+    if redis is None:
+        return True
+    key = _owner_key(session_id)
+    try:
+        owner = await redis.get(key)
+        if owner not in (None, owner_id):
+            return False
+        await redis.set(key, owner_id, px=_ttl_ms())
+    except RedisError as exc:
+        # 短暂的 Redis 故障不应中断执行中的会话，租约在下次心跳时续上
+        logger.warning("Failed to renew lease on session %s: %s", session_id, exc)
+    return True
+
+
+async def release(session_id: str, owner_id: str) -> None:
+    """Drop the lease if ``owner_id`` still holds it."""
+
+    if redis is None:
+        return
+    key = _owner_key(session_id)
+    try:
+        if await redis.get(key) == owner_id:
+            await redis.delete(key)
+    except RedisError as exc:
+        logger.warning("Failed to release lease on session %s: %s", session_id, exc)
+
+
+async def is_held(session_id: str) -> bool:
+    """Return whether some process currently holds the session's lease."""
+
+    if redis is None:
+        return False
+    try:
+        return bool(await redis.exists(_owner_key(session_id)))
+    except RedisError as exc:
+        logger.warning("Failed to read lease on session %s: %s", session_id, exc)
+        return False
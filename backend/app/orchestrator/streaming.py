@@ -0,0 +1,117 @@
+"""Coalesce streamed LLM tokens into batched WebSocket events."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.cache import session_events
+from app.config import settings
+from app.models.session import AgentStage
+from app.parsers.markdown_cases import MarkdownCaseParser
+from app.websocket.manager import manager
+
+
+class StreamCoalescer:
+    """Forward tokens of one agent stream to the session's WebSocket clients."""
+
+    def __init__(
+        self,
+        session_id: str,
+        *,
+        stage: AgentStage,
+        sender: str,
+        module: str | None = None,
+        case_parser: MarkdownCaseParser | None = None,
+    ) -> None:
+        self.session_id = session_id
+        self.stage = stage
+        self.sender = sender
+        self.module = module
+        self.stream_id = f"{stage.value}:{module}" if module else stage.value
+        self._interval = settings.stream_flush_interval_ms / 1000
+        self._max_chars = settings.stream_flush_max_chars
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._parts: list[str] = []
+        self._length = 0
+        self._case_parser = case_parser
+        self._case_count = 0
+        self._closed = False
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    async def __aenter__(self) -> "StreamCoalescer":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._closed = True
+        self._wakeup.set()
+        try:
+            await self._task
+        finally:
+            await session_events.clear_stream_snapshot(self.session_id, self.stream_id)
+
+    def on_chunk(self, text: str) -> None:
+        """Buffer a token; flushes early once ``STREAM_FLUSH_MAX_CHARS`` are pending."""
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self._max_chars:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+        await self._flush()
+        if self._case_parser is not None:
+            await self._publish_cases(self._case_parser.close())
+        if self._length:
+            await manager.broadcast(self.session_id, self._event(done=True))
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        delta = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+
+        event = self._event(delta=delta, offset=self._length)
+        self._parts.append(delta)
+        self._length += len(delta)
+        await manager.broadcast(self.session_id, event)
+        await session_events.append_stream_snapshot(self.session_id, self.stream_id, self._event(), delta)
+        if self._case_parser is not None:
+            await self._publish_cases(self._case_parser.feed(delta))
+
+    async def _publish_cases(self, rows: list[tuple[str, dict]]) -> None:
+        for module, case in rows:
+            self._case_count += 1
+            event = self._event(case=case, index=self._case_count)
+            # 表格中的模块名以解析结果为准
+            event["module"] = module
+            await manager.broadcast(self.session_id, {**event, "type": "test_case"})
+
+    def _event(self, **fields) -> dict:
+        event = {
+            "type": "agent_stream",
+            "stage": self.stage.value,
+            "sender": self.sender,
+            "stream_id": self.stream_id,
+            **fields,
+            "timestamp": time.time(),
+        }
+        if self.module:
+            event["module"] = self.module
+        return event
@@ -3,31 +3,53 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import hashlib
 import json
 import logging
+import os
+import socket
 import tempfile
 import textwrap
 import time
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.cache import session_events
+from app.cache import document_index, result_cache, session_events
 from app.db import session_repository
 from app.db.base import AsyncSessionLocal
+from app.llm import vision_engine
 from app.llm.autogen_runner import (
     AutogenOutputs,
+    bypass_completion_cache,
+    resolve_agent_config,
     run_analysis,
     run_requirement_analysis,
+    run_requirement_analysis_chunk,
     run_test_generation,
+    run_test_generation_for_module,
     run_quality_review,
+    _merge_test_cases,
+    merge_analysis_payloads,
+    plan_analysis_chunks,
     run_test_completion,
+    use_fallback_model,
 )
-from app.llm.vision_client_enhanced import extract_requirements_with_retry, is_vl_available
 from app.models.document import Document
-from app.models.session import AgentStage, SessionStatus
+from app.models.session import AgentRun, AgentStage, Session, SessionStatus
+from app.orchestrator import deadlines, job_queue, session_lease
+from app.orchestrator.admission import admission_controller
+from app.orchestrator.progress import ProgressBuffer
+from app.orchestrator.streaming import StreamCoalescer
+from app.parsers.markdown_cases import MarkdownCaseParser
 from app.parsers.text_extractor import extract_text
+from app.utils import tracing
 from app.config import settings
 from app.websocket.manager import manager
 
@@ -48,6 +70,45 @@ except Exception:  # pragma: no cover - fallback when Pillow missing
     ImageFont = None  # type: ignore
 
 
+_IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+
+
+def _render_pdf_first_page(storage_path: str) -> Path | None:
+    """将PDF首页渲染为临时PNG文件，供OCR模型识别；调用方负责删除文件."""
+    with fitz.open(storage_path) as pdf_doc:  # type: ignore[arg-type]
+        if pdf_doc.page_count == 0:
+            return None
+        page = pdf_doc.load_page(0)
+        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+        tmp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+        tmp_file.close()
+        pix.save(tmp_file.name)
+        return Path(tmp_file.name)
+
+
+def _read_pdf_first_page_text(storage_path: str) -> str:
+    """读取PDF首页的文本层，用于判断首页内容是否变化."""
+    if fitz is None:
+        return ""
+    with fitz.open(storage_path) as pdf_doc:  # type: ignore[arg-type]
+        if pdf_doc.page_count == 0:
+            return ""
+        return pdf_doc.load_page(0).get_text()
+
+
+_DOCUMENT_HEADER_PATTERN = re.compile(r"^=== 文档 \d+: .* ===(（续）)?$", re.MULTILINE)
+
+
+def _section_key(model: str | None, text: str) -> str:
+    """文档片段的内容指纹：忽略文档标题行与空白差异，重新上传时文件名变化不影响复用.
+
+    包含提示词指纹，修改分析或 OCR 提示词后不再复用旧结果。
+    """
+    normalized = " ".join(_DOCUMENT_HEADER_PATTERN.sub("", text).split())
+    material = f"{model}\n{result_cache.prompt_fingerprint()}\n{normalized}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
 @dataclass
 class StageResult:
     stage: AgentStage
@@ -58,6 +119,7 @@ class StageResult:
     duration_seconds: float | None = None
 
 
+@tracing.traced("markdown.parse_test_cases")
 def _parse_markdown_test_cases(markdown_text: str) -> dict:
     """解析Markdown格式的测试用例为JSON结构.
 
@@ -175,6 +237,7 @@ def _parse_markdown_test_cases(markdown_text: str) -> dict:
     return {"modules": modules}
 
 
+@tracing.traced("markdown.parse_review")
 def _parse_review_markdown(markdown_text: str) -> dict:
     """解析质量评审Markdown为结构化数据.
 
@@ -245,31 +308,248 @@ def _parse_review_markdown(markdown_text: str) -> dict:
     return result
 
 
+def _module_fingerprint(module: dict) -> str:
+    """模块内容（名称、场景、规则等）的指纹，内容不变时测试用例可复用."""
+    encoded = json.dumps(module, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    """读取被放弃任务的结果，避免未处理异常的告警日志."""
+    if not task.cancelled():
+        task.exception()
+
+
+class WorkflowInterrupted(Exception):
+    """工作流因服务停止而在阶段边界中断，可从检查点恢复."""
+
+
 class AnalysisWorkflow:
     """Orchestrate asynchronous analysis workflow with AutoGen or simulation."""
 
     def __init__(self) -> None:
         self._tasks: set[asyncio.Task] = set()
+        self._session_tasks: dict[str, asyncio.Task] = {}
+        # 置位后不再开始新的阶段，等待确认的会话立即让出
+        self._stop_event = asyncio.Event()
+        # 进程内执行会话时持有的租约归属标识
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._adopter: asyncio.Task | None = None
+        # 正在等待用户确认的会话，及其状态变化时的通知回调（批量调度器据此让出并发槽位）
+        self._awaiting: set[str] = set()
+        self._awaiting_listeners: list[Callable[[], None]] = []
+
+    @property
+    def draining(self) -> bool:
+        return self._stop_event.is_set()
+
+    def begin_drain(self) -> None:
+        self._stop_event.set()
+
+    async def drain(self, timeout: float) -> None:
+        """停止接收新会话，等待执行中的阶段完成（最长 timeout 秒）.
+
+        未完成的会话保持 processing / awaiting_confirmation 状态，重启后从检查点恢复。
+        """
+        self.begin_drain()
+        tasks = set(self._tasks)
+        if not tasks:
+            return
 
-    async def launch(self, session_id: str) -> None:
-        task = asyncio.create_task(self._run(session_id))
+        logger.info("Draining %s in-flight workflows (timeout %ss)", len(tasks), timeout)
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning(
+                "Drain deadline reached, cancelling %s workflows; they resume from checkpoints",
+                len(pending),
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def launch(self, session_id: str, *, resuming: bool = False) -> asyncio.Task | None:
+        """启动会话工作流；进程内执行时返回对应任务，入队、停止中或由其他进程持有时返回 None.
+
+        resuming 为 True 时，取得租约后重新确认会话仍需恢复，避免重跑刚被其他进程完成的会话。
+        """
+        if self.draining:
+            # 会话保持 created 状态，由下一个进程启动时恢复
+            logger.warning("Workflow is draining, session %s will start after restart", session_id)
+            return None
+
+        if settings.workflow_mode == "queue":
+            if job_queue.is_available():
+                await job_queue.enqueue(session_id)
+                return None
+            logger.warning("Workflow queue unavailable, running session %s in-process", session_id)
+
+        if not await session_lease.acquire(session_id, self.owner_id):
+            logger.info("Session %s is owned by another process, not starting it", session_id)
+            return None
+        if resuming and not await self._is_resumable(session_id):
+            await session_lease.release(session_id, self.owner_id)
+            return None
+
+        task = asyncio.create_task(self._run_owned(session_id))
         self._tasks.add(task)
+        self._session_tasks[session_id] = task
         task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._forget(session_id, task))
+        return task
 
-    async def _run(self, session_id: str) -> None:
-        logger.info("Starting workflow for session %s", session_id)
+    async def _run_owned(self, session_id: str) -> bool:
+        renewer = asyncio.create_task(self._renew_lease(session_id, asyncio.current_task()))
+        try:
+            return await self.run(session_id)
+        finally:
+            renewer.cancel()
+            await session_lease.release(session_id, self.owner_id)
+
+    async def _renew_lease(self, session_id: str, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(settings.workflow_heartbeat_interval)
+            if not await session_lease.renew(session_id, self.owner_id):
+                logger.warning("Lease for session %s was lost, abandoning workflow", session_id)
+                task.cancel()
+                return
+
+    @staticmethod
+    async def _is_resumable(session_id: str) -> bool:
+        async with AsyncSessionLocal() as db_session:
+            session = await db_session.get(Session, session_id)
+        return session is not None and session_repository.is_resumable(session)
+
+    def is_awaiting_confirmation(self, session_id: str) -> bool:
+        return session_id in self._awaiting
+
+    def add_awaiting_listener(self, callback: Callable[[], None]) -> None:
+        """注册回调，会话开始或结束等待用户确认时调用."""
+        self._awaiting_listeners.append(callback)
+
+    def _set_awaiting(self, session_id: str, awaiting: bool) -> None:
+        if awaiting:
+            self._awaiting.add(session_id)
+        else:
+            self._awaiting.discard(session_id)
+        for callback in self._awaiting_listeners:
+            callback()
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        if self._session_tasks.get(session_id) is task:
+            del self._session_tasks[session_id]
+
+    async def cancel(self, session_id: str, timeout: float = 5.0) -> bool:
+        """取消会话工作流，返回是否找到了执行中或排队中的任务.
+
+        本进程内的任务直接取消（同时中断线程中的流式请求并释放准入槽位）；
+        队列模式下移出待处理队列，并通知正在执行该会话的 worker。
+        """
+        found = False
+        task = self._session_tasks.get(session_id)
+        if task is not None and not task.done():
+            found = True
+            task.cancel()
+            await asyncio.wait({task}, timeout=timeout)
+
+        if settings.workflow_mode == "queue" and job_queue.is_available():
+            if await job_queue.remove_pending(session_id):
+                found = True
+            await job_queue.publish_cancel(session_id)
+        return found
+
+    async def resume_interrupted(self) -> list[str]:
+        """重新启动进程中断时仍在执行的会话，从最后完成的阶段继续."""
+        if settings.workflow_mode == "queue" and job_queue.is_available():
+            # 队列模式下由 worker 的租约回收机制负责恢复
+            return []
+
+        # 刚创建的会话可能正由其他进程启动（尚未取得租约），留出宽限期
+        grace = timedelta(seconds=settings.workflow_resume_grace_seconds)
         async with AsyncSessionLocal() as db_session:
-            executor = SessionWorkflowExecution(db_session=db_session, session_id=session_id)
+            sessions = await session_repository.list_resumable_sessions(
+                db_session, created_before=datetime.utcnow() - grace
+            )
+
+        from app.orchestrator.batch import batch_scheduler
+
+        session_ids = []
+        batched = []
+        owned_elsewhere = []
+        for session in sessions:
+            if await session_lease.is_held(session.id):
+                # 其他进程仍在执行（租约有效），不重复启动
+                owned_elsewhere.append(session.id)
+                continue
+            session_ids.append(session.id)
+            if session.status == SessionStatus.created and session.config.get("batch_id"):
+                # 尚未启动的批量会话重新交给批量调度器限速启动
+                batched.append(session.id)
+                continue
+            logger.info("Resuming interrupted workflow for session %s", session.id)
+            await self.launch(session.id, resuming=True)
+        if batched:
+            logger.info("Re-scheduling %s batch sessions that had not started", len(batched))
+            batch_scheduler.submit(batched)
+        if owned_elsewhere:
+            logger.info("%s sessions are owned by other processes, watching their leases", len(owned_elsewhere))
+            self._adopter = asyncio.create_task(self._adopt_orphans(owned_elsewhere))
+        return session_ids
+
+    async def _adopt_orphans(self, session_ids: list[str]) -> None:
+        """等待其他进程持有的会话：持有者崩溃、租约过期后由本进程接管."""
+        pending = list(session_ids)
+        while pending:
             try:
-                await executor.execute()
-            except Exception as exc:  # pragma: no cover - unexpected runtime failures
-                logger.exception("Workflow failed for session %s: %s", session_id, exc)
+                await asyncio.wait_for(self._stop_event.wait(), timeout=settings.workflow_lease_seconds)
+                return
+            except asyncio.TimeoutError:
+                pass
+            remaining = []
+            for session_id in pending:
+                if await session_lease.is_held(session_id):
+                    remaining.append(session_id)
+                    continue
+                if await self._is_resumable(session_id):
+                    logger.info("Lease on session %s expired, resuming it here", session_id)
+                    await self.launch(session_id, resuming=True)
+            pending = remaining
+
+    async def run(self, session_id: str) -> bool:
+        """执行会话工作流；因服务停止而中断时返回 False."""
+        logger.info("Starting workflow for session %s", session_id)
+        with tracing.session_trace(session_id) as trace:
+            executor = SessionWorkflowExecution(
+                session_id=session_id,
+                stop_event=self._stop_event,
+                on_awaiting=lambda awaiting: self._set_awaiting(session_id, awaiting),
+            )
+            try:
+                try:
+                    await executor.execute()
+                except WorkflowInterrupted:
+                    logger.info("Workflow for session %s paused for shutdown", session_id)
+                    await executor.flush_status()
+                    await executor.notify_interrupted()
+                    return False
+                except Exception as exc:  # pragma: no cover - unexpected runtime failures
+                    logger.exception("Workflow failed for session %s: %s", session_id, exc)
+                    await executor.flush_status()
+            finally:
+                await executor.close()
+                await session_events.store_spans(session_id, trace.export())
+        return True
 
 
 class SessionWorkflowExecution:
-    def __init__(self, db_session: AsyncSession, session_id: str) -> None:
-        self.db_session = db_session
+    def __init__(
+        self,
+        session_id: str,
+        stop_event: asyncio.Event | None = None,
+        on_awaiting: Callable[[bool], None] | None = None,
+    ) -> None:
         self.session_id = session_id
+        self._stop_event = stop_event or asyncio.Event()
+        self._on_awaiting = on_awaiting
         self._stage_labels = {
             AgentStage.requirement_analysis: "需求分析",
             AgentStage.confirmation: "确认",
@@ -278,8 +558,30 @@ class SessionWorkflowExecution:
             AgentStage.test_completion: "用例补全",
             AgentStage.completed: "完成",
         }
+        self._stage_senders = {
+            AgentStage.requirement_analysis: "需求分析师",
+            AgentStage.test_generation: "测试工程师",
+            AgentStage.review: "质量评审员",
+            AgentStage.test_completion: "测试补全工程师",
+        }
         self._vl_config = settings.get_vl_config()
         self._pdf_ocr_config = settings.get_pdf_ocr_config()
+        # 本次执行中用户是否修改过阶段结果
+        self._edited = False
+        self._checkpoints: dict[AgentStage, AgentRun] = {}
+        # 尚未写入数据库的状态变更，随下一次写入一并提交（后写覆盖先写）
+        self._pending_status: dict | None = None
+        # 进度事件先推送给客户端，再合并写入 Redis
+        self._progress = ProgressBuffer(session_id)
+        # 按模块内容指纹记录测试用例生成任务，供修改分析结果后的增量生成复用
+        self._module_tasks: dict[str, asyncio.Task] = {}
+        # 本会话文档及其近似重复原文档：按内容指纹查找可复用的 OCR 与分片分析结果
+        self._artifact_owners: list[str] = []
+        self._artifact_sources: list[str] = []
+        # 准入控制的租户标识：未填写 created_by 的会话各自独立计算配额
+        self._tenant = session_id
+        # 强制重新生成时不读取模型输出缓存
+        self._force_regenerate = False
 
     def _get_document_suffix(self, document: Document) -> str:
         if document.original_name:
@@ -289,150 +591,269 @@ class SessionWorkflowExecution:
         return Path(document.storage_path).suffix.lower()
 
 
-    async def execute(self) -> None:
-        # Refresh VL 配置，确保每次执行都使用最新设置
-        self._vl_config = settings.get_vl_config()
-        self._pdf_ocr_config = settings.get_pdf_ocr_config()
+    async def _prepare_documents(self, documents: list[Document]) -> list[dict]:
+        """并发预处理会话内的全部文档，返回与原始文档顺序一致的数据列表."""
+        total = len(documents)
+        if total == 0:
+            return []
+        await self._load_artifact_sources(documents)
 
-        session = await session_repository.get_session(self.db_session, self.session_id)
-        if session is None:
-            logger.warning("Session %s not found", self.session_id)
-            return
+        is_multimodal = settings.analysis_multimodal_enabled
+        semaphore = asyncio.Semaphore(settings.document_preprocess_concurrency)
+        progress_start, progress_end = 0.12, 0.18
+        completed = 0
+
+        async def _process(document: Document) -> dict:
+            nonlocal completed
+            with tracing.span("preprocess.document"):
+                waited = time.perf_counter()
+                async with semaphore:
+                    tracing.annotate(queue_wait_ms=round((time.perf_counter() - waited) * 1000, 3))
+                    data = await self._prepare_document(document, is_multimodal=is_multimodal)
+                tracing.annotate(
+                    document=data["name"],
+                    type=data["type"],
+                    content_chars=len(data.get("content") or ""),
+                )
+            completed += 1
+            await self._emit_system_message(
+                f"文档处理完成（{completed}/{total}）：{data['name']}",
+                progress=progress_start + (progress_end - progress_start) * completed / total,
+            )
+            return data
 
-        await session_repository.update_session_status(
-            self.db_session,
-            session_id=self.session_id,
-            from_status=session.status,
-            to_status=SessionStatus.processing,
-            stage=AgentStage.requirement_analysis,
-            progress=0.12,
+        logger.info(
+            "并发预处理 %s 个文档，并发上限 %s，session=%s",
+            total,
+            settings.document_preprocess_concurrency,
+            self.session_id,
         )
-        await self.db_session.commit()
+        # gather 按传入顺序返回结果，保证 document_data 与 session.documents 顺序一致
+        with tracing.span("preprocess", documents=total):
+            return list(await asyncio.gather(*(_process(document) for document in documents)))
+
+    async def _load_artifact_sources(self, documents: list[Document]) -> None:
+        """记录可复用结果的来源文档：会话内文档及上传时识别出的近似重复原文档."""
+        self._artifact_owners = [document.id for document in documents]
+        sources = list(self._artifact_owners)
+        if settings.near_duplicate_enabled:
+            for document in documents:
+                link = await document_index.get_link(document.id)
+                if link and link["source"] not in sources:
+                    logger.info(
+                        "文档 %s 与 %s 近似重复（相似度 %.2f），复用未变化部分的处理结果",
+                        document.id,
+                        link["source"],
+                        link["similarity"],
+                    )
+                    sources.append(link["source"])
+        self._artifact_sources = sources
+
+    async def _prepare_document(self, document: Document, *, is_multimodal: bool) -> dict:
+        """预处理单个文档：多模态模式仅准备路径，文本模式执行VL/OCR/文本提取."""
+        suffix = self._get_document_suffix(document)
+        doc_name = document.original_name or document.id
+
+        if is_multimodal:
+            # 多模态模式：直接传递文件路径，让多模态模型处理
+            logger.info(f"多模态模式 - 准备文档: {doc_name}")
+            doc_type = "image" if suffix in _IMAGE_SUFFIXES else (
+                "pdf" if suffix == ".pdf" else "text"
+            )
 
-        await self._emit_system_message("分析流程已开始，正在处理文档...", progress=0.12)
+            # 对于非图片/PDF，仍需提取文本内容
+            text_content = ""
+            if doc_type == "text":
+                text_content = await self._extract_text(document, doc_name)
 
-        # 准备文档数据供需求分析智能体使用
-        document_data: list[dict] = []
-        is_multimodal = settings.analysis_multimodal_enabled
+            return {
+                "path": document.storage_path,
+                "type": doc_type,
+                "content": text_content,  # 多模态模式下图片/PDF的content为空
+                "name": doc_name,
+            }
 
-        for document in session.documents:
-            suffix = self._get_document_suffix(document)
-            doc_name = document.original_name or document.id
+        # 文本模式：需要预先提取/OCR所有文档
+        logger.info(f"文本模式 - 处理文档: {doc_name}")
+
+        if suffix in _IMAGE_SUFFIXES:
+            # 图片文件：使用VL模型提取需求内容
+            vl_text = ""
+            if self._vl_config.get("enabled") and self._vl_config.get("api_key") and vision_engine.is_available():
+                try:
+                    with tracing.span("vl.call", kind="image", model=self._vl_config.get("model")):
+                        vl_text = await vision_engine.analyze(
+                            document.storage_path,
+                            api_key=self._vl_config.get("api_key"),
+                            model=self._vl_config.get("model"),
+                            base_url=self._vl_config.get("base_url"),
+                            prompt_mode="requirement",  # 需求分析模式
+                            use_cache=not self._force_regenerate,
+                        )
+                        tracing.annotate(response_chars=len(vl_text or ""))
+                except Exception as exc:
+                    logger.warning(f"VL模型处理图片失败: {doc_name}, error={exc}", exc_info=True)
+
+            return {
+                "path": document.storage_path,
+                "type": "image",
+                "content": vl_text or "[图片内容识别失败]",
+                "name": doc_name,
+            }
 
-            if is_multimodal:
-                # 多模态模式：直接传递文件路径，让多模态模型处理
-                logger.info(f"多模态模式 - 准备文档: {doc_name}")
-                doc_type = "image" if suffix in {".png", ".jpg", ".jpeg", ".bmp", ".gif"} else (
-                    "pdf" if suffix == ".pdf" else "text"
-                )
+        if suffix == ".pdf":
+            # PDF文件：优先使用PDF OCR
+            pdf_content = ""
+            if self._pdf_ocr_config.get("enabled") and self._pdf_ocr_config.get("api_key") and vision_engine.is_available() and fitz is not None:
+                pdf_content = await self._ocr_pdf(document, doc_name)
+
+            # 回退到文本提取
+            if not pdf_content:
+                pdf_content = await self._extract_text(document, doc_name)
+
+            return {
+                "path": document.storage_path,
+                "type": "pdf",
+                "content": pdf_content or "[PDF内容提取失败]",
+                "name": doc_name,
+            }
+
+        # 其他文本文件
+        text = await self._extract_text(document, doc_name)
+        return {
+            "path": document.storage_path,
+            "type": "text",
+            "content": text or "[文本提取失败]",
+            "name": doc_name,
+        }
 
-                # 对于非图片/PDF，仍需提取文本内容
-                text_content = ""
-                if doc_type == "text":
+    async def _ocr_pdf(self, document: Document, doc_name: str) -> str:
+        """OCR PDF 首页；首页文本未变化时复用本文档或近似重复原文档的识别结果."""
+        model = self._pdf_ocr_config.get("model")
+        page_key: str | None = None
+        if settings.near_duplicate_enabled:
+            try:
+                page_text = await asyncio.to_thread(_read_pdf_first_page_text, document.storage_path)
+            except Exception as exc:
+                logger.debug(f"读取PDF首页文本失败: {doc_name}, error={exc}")
+                page_text = ""
+            if page_text.strip():
+                page_key = _section_key(model, page_text)
+                # force_regenerate 时不复用，但仍保存新的识别结果
+                cached = None
+                if not self._force_regenerate:
+                    cached = await document_index.load_artifact(self._artifact_sources, "pdf_ocr", page_key)
+                if cached:
+                    logger.info(f"PDF首页内容未变化，复用OCR结果: {doc_name}")
+                    tracing.annotate(reused=True)
+                    return cached
+
+        pdf_content = ""
+        try:
+            tmp_path = await asyncio.to_thread(_render_pdf_first_page, document.storage_path)
+            if tmp_path is not None:
+                try:
+                    with tracing.span("vl.call", kind="pdf_ocr", model=model):
+                        pdf_content = await vision_engine.analyze(
+                            tmp_path,
+                            api_key=self._pdf_ocr_config.get("api_key"),
+                            model=model,
+                            base_url=self._pdf_ocr_config.get("base_url"),
+                            prompt_mode="requirement",
+                            use_cache=not self._force_regenerate,
+                        )
+                        tracing.annotate(response_chars=len(pdf_content or ""))
+                finally:
                     try:
-                        text_content = extract_text(document.storage_path, original_name=document.original_name)
-                    except Exception as exc:
-                        logger.warning(f"文本提取失败: {doc_name}, error={exc}", exc_info=True)
+                        tmp_path.unlink()
+                    except Exception:
+                        pass
+        except Exception as exc:
+            logger.warning(f"PDF OCR处理失败: {doc_name}, error={exc}", exc_info=True)
 
-                document_data.append({
-                    "path": document.storage_path,
-                    "type": doc_type,
-                    "content": text_content,  # 多模态模式下图片/PDF的content为空
-                    "name": doc_name,
-                })
+        if pdf_content and page_key is not None:
+            await document_index.save_artifact([document.id], "pdf_ocr", page_key, pdf_content)
+        return pdf_content
 
-            else:
-                # 文本模式：需要预先提取/OCR所有文档
-                logger.info(f"文本模式 - 处理文档: {doc_name}")
-
-                # 判断是否为图片文件
-                if suffix in {".png", ".jpg", ".jpeg", ".bmp", ".gif"}:
-                    # 图片文件：使用VL模型提取需求内容
-                    vl_text = ""
-                    if self._vl_config.get("enabled") and self._vl_config.get("api_key") and is_vl_available():
-                        try:
-                            vl_text = await extract_requirements_with_retry(
-                                Path(document.storage_path),
-                                api_key=self._vl_config.get("api_key"),
-                                model=self._vl_config.get("model"),
-                                base_url=self._vl_config.get("base_url"),
-                                use_cache=True,
-                                prompt_mode="requirement",  # 需求分析模式
-                            )
-                        except Exception as exc:
-                            logger.warning(f"VL模型处理图片失败: {doc_name}, error={exc}", exc_info=True)
-
-                    document_data.append({
-                        "path": document.storage_path,
-                        "type": "image",
-                        "content": vl_text or "[图片内容识别失败]",
-                        "name": doc_name,
-                    })
-
-                elif suffix == ".pdf":
-                    # PDF文件：优先使用PDF OCR
-                    pdf_content = ""
-                    if self._pdf_ocr_config.get("enabled") and self._pdf_ocr_config.get("api_key") and is_vl_available() and fitz is not None:
-                        try:
-                            with fitz.open(document.storage_path) as pdf_doc:  # type: ignore[arg-type]
-                                if pdf_doc.page_count > 0:
-                                    page = pdf_doc.load_page(0)
-                                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                                    tmp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                                    pix.save(tmp_file.name)
-                                    tmp_file.close()
-                                    tmp_path = Path(tmp_file.name)
-                                    try:
-                                        pdf_content = await extract_requirements_with_retry(
-                                            tmp_path,
-                                            api_key=self._pdf_ocr_config.get("api_key"),
-                                            model=self._pdf_ocr_config.get("model"),
-                                            base_url=self._pdf_ocr_config.get("base_url"),
-                                            use_cache=True,
-                                            prompt_mode="requirement",
-                                        )
-                                    finally:
-                                        try:
-                                            tmp_path.unlink()
-                                        except Exception:
-                                            pass
-                        except Exception as exc:
-                            logger.warning(f"PDF OCR处理失败: {doc_name}, error={exc}", exc_info=True)
-
-                    # 回退到文本提取
-                    if not pdf_content:
-                        try:
-                            pdf_content = extract_text(document.storage_path, original_name=document.original_name)
-                        except Exception as exc:
-                            logger.warning(f"PDF文本提取失败: {doc_name}, error={exc}", exc_info=True)
-
-                    document_data.append({
-                        "path": document.storage_path,
-                        "type": "pdf",
-                        "content": pdf_content or "[PDF内容提取失败]",
-                        "name": doc_name,
-                    })
+    async def _extract_text(self, document: Document, doc_name: str) -> str:
+        """在线程中执行同步的文本提取，避免阻塞事件循环."""
+        try:
+            with tracing.span("text.extract"):
+                return await asyncio.to_thread(
+                    extract_text,
+                    document.storage_path,
+                    limit=settings.document_text_limit,
+                    original_name=document.original_name,
+                )
+        except Exception as exc:
+            logger.warning(f"文本提取失败: {doc_name}, error={exc}", exc_info=True)
+            return ""
 
-                else:
-                    # 其他文本文件
-                    try:
-                        text = extract_text(document.storage_path, original_name=document.original_name)
-                    except Exception as exc:
-                        logger.warning(f"文本提取失败: {doc_name}, error={exc}", exc_info=True)
-                        text = ""
-
-                    document_data.append({
-                        "path": document.storage_path,
-                        "type": "text",
-                        "content": text or "[文本提取失败]",
-                        "name": doc_name,
-                    })
-
-        # 开始调用AutoGen智能体进行需求分析
-        await self._emit_system_message(
-            "文档处理完成，开始调用AutoGen智能体进行需求分析...",
-            progress=0.18,
-        )
+    async def execute(self) -> None:
+        # Refresh VL 配置，确保每次执行都使用最新设置
+        self._vl_config = settings.get_vl_config()
+        self._pdf_ocr_config = settings.get_pdf_ocr_config()
+
+        async with self._unit_of_work() as db_session:
+            session = await session_repository.get_session(db_session, self.session_id)
+            if session is None:
+                logger.warning("Session %s not found", self.session_id)
+                return
+            if not session_repository.is_resumable(session):
+                # 已结束或已取消的会话不再执行（重复投递的队列任务可能再次启动它）
+                logger.info("Session %s is %s, not running it again", self.session_id, session.status.value)
+                return
+            self._tenant = session.created_by or self.session_id
+            self._force_regenerate = bool(session.config.get("force_regenerate"))
+
+            await session_repository.update_session_status(
+                db_session,
+                session_id=self.session_id,
+                from_status=session.status,
+                to_status=SessionStatus.processing,
+                stage=AgentStage.requirement_analysis,
+                progress=0.12,
+            )
+
+            # 加载已完成阶段的检查点，进程重启后从最后完成的阶段继续
+            self._checkpoints = await session_repository.list_stage_checkpoints(
+                db_session, self.session_id
+            )
+
+        # 相同文档集合与配置的历史结果可直接复用；force_regenerate 时仍会刷新缓存
+        cache_key: str | None = None
+        if settings.result_cache_enabled:
+            cache_key = result_cache.compute_key(
+                (doc.checksum for doc in session.documents), session.config
+            )
+            if (
+                not self._checkpoints
+                and not session.config.get("force_regenerate")
+                and await self._reuse_cached_result(cache_key)
+            ):
+                return
+
+        document_data: list[dict] = []
+        if self._checkpoints:
+            resumed_labels = "、".join(
+                self._stage_labels.get(stage, stage.value) for stage in self._checkpoints
+            )
+            logger.info("从检查点恢复 session=%s, 已完成阶段: %s", self.session_id, resumed_labels)
+            await self._emit_system_message(
+                f"检测到中断的分析流程，已复用完成的阶段：{resumed_labels}",
+                progress=0.18,
+            )
+        else:
+            await self._emit_system_message("分析流程已开始，正在处理文档...", progress=0.12)
+
+            # 准备文档数据供需求分析智能体使用（并发处理，保持原始顺序）
+            document_data = await self._prepare_documents(list(session.documents))
+
+            # 开始调用AutoGen智能体进行需求分析
+            await self._emit_system_message(
+                "文档处理完成，开始调用AutoGen智能体进行需求分析...",
+                progress=0.18,
+            )
         logger.info("开始逐个调用 AutoGen 智能体...")
 
         merged_markdown = ""
@@ -451,11 +872,10 @@ class SessionWorkflowExecution:
             # 1. 需求分析阶段（非流式输出）
             logger.info("执行需求分析智能体（非流式输出）...")
 
-            analysis_started_at = time.time()
-            analysis_payload, analysis_content = await asyncio.to_thread(
-                run_requirement_analysis, document_data, None
+            analysis_payload, analysis_content, analysis_duration = await self._run_agent_stage(
+                AgentStage.requirement_analysis,
+                lambda: self._analyze_requirements(document_data),
             )
-            analysis_duration = time.time() - analysis_started_at
             stage_durations[AgentStage.requirement_analysis] = analysis_duration
             analysis_display_content = analysis_content or ""
             analysis_result = StageResult(
@@ -466,25 +886,63 @@ class SessionWorkflowExecution:
                 progress=0.3,
                 duration_seconds=analysis_duration,
             )
-            await self._handle_stage_result(
-                analysis_result,
-                skip_confirmation=False,
-                needs_confirmation=True,
+
+            # 推测执行：等待用户确认需求分析期间提前生成测试用例
+            speculative_task: asyncio.Task | None = None
+            if (
+                settings.speculative_test_generation
+                and AgentStage.test_generation not in self._checkpoints
+            ):
+                logger.info("推测执行测试用例生成，session=%s", self.session_id)
+                speculative_task = asyncio.create_task(self._generate_test_cases(analysis_payload))
+
+            try:
+                confirmation = await self._handle_stage_result(
+                    analysis_result,
+                    skip_confirmation=False,
+                    needs_confirmation=True,
+                )
+            except BaseException:
+                # 用户拒绝、超时或流程取消时丢弃推测结果
+                if speculative_task is not None:
+                    speculative_task.cancel()
+                raise
+
+            analysis_payload, edited = await self._apply_confirmed_edits(
+                AgentStage.requirement_analysis, confirmation, analysis_payload
             )
+            if edited and speculative_task is not None:
+                if self._module_tasks:
+                    # 只取消内容被修改的模块，未修改模块的推测结果（含生成中的）在重新生成时直接复用
+                    stale = self._discard_stale_modules(analysis_payload)
+                    logger.info(
+                        "用户修改了需求分析结果，放弃 %s 个已修改模块的推测生成，session=%s",
+                        stale,
+                        self.session_id,
+                    )
+                    speculative_task.add_done_callback(_consume_result)
+                else:
+                    logger.info("用户修改了需求分析结果，丢弃推测生成的测试用例，session=%s", self.session_id)
+                    speculative_task.cancel()
+                speculative_task = None
 
             # 2. 测试用例生成阶段（非流式输出）
             logger.info("执行测试用例生成智能体（非流式输出）...")
 
-            test_started_at = time.time()
-            test_payload, test_content = await asyncio.to_thread(
-                run_test_generation, analysis_payload, None
+            def test_runner() -> Awaitable[tuple[dict, str]]:
+                # 超出时间预算被取消的推测任务不再复用，改用备用模型重新生成
+                if speculative_task is not None and not speculative_task.cancelled():
+                    return self._await_speculative(speculative_task, analysis_payload)
+                return self._generate_test_cases(analysis_payload)
+
+            test_payload, test_content, test_duration = await self._run_agent_stage(
+                AgentStage.test_generation, test_runner
             )
-            test_duration = time.time() - test_started_at
             stage_durations[AgentStage.test_generation] = test_duration
             test_display_content = test_content or ""
 
-            # 解析测试用例Markdown为JSON，用于前端表格显示
-            test_cases_json = _parse_markdown_test_cases(test_display_content)
+            # 测试用例JSON（按模块生成时已合并），用于前端表格显示
+            test_cases_json = test_payload if test_payload.get("modules") else _parse_markdown_test_cases(test_display_content)
 
             test_result = StageResult(
                 stage=AgentStage.test_generation,
@@ -503,11 +961,12 @@ class SessionWorkflowExecution:
             # 3. 质量评审阶段（非流式输出）
             logger.info("执行质量评审智能体（非流式输出）...")
 
-            review_started_at = time.time()
-            review_payload, review_content = await asyncio.to_thread(
-                run_quality_review, test_content, None
+            review_payload, review_content, review_duration = await self._run_agent_stage(
+                AgentStage.review,
+                lambda: self._stream_agent(
+                    AgentStage.review, "review", run_quality_review, test_content
+                ),
             )
-            review_duration = time.time() - review_started_at
             stage_durations[AgentStage.review] = review_duration
             review_display_content = review_content or ""
 
@@ -531,16 +990,26 @@ class SessionWorkflowExecution:
             # 4. 用例补全阶段（非流式输出）
             logger.info("执行用例补全智能体（非流式输出）...")
 
-            completion_started_at = time.time()
-            completion_payload, completion_content = await asyncio.to_thread(
-                run_test_completion, test_content, review_content, None
+            completion_payload, completion_content, completion_duration = await self._run_agent_stage(
+                AgentStage.test_completion,
+                lambda: self._stream_agent(
+                    AgentStage.test_completion,
+                    "test",
+                    run_test_completion,
+                    test_content,
+                    review_content,
+                    parse_cases=True,
+                ),
             )
-            completion_duration = time.time() - completion_started_at
             stage_durations[AgentStage.test_completion] = completion_duration
             completion_display_content = completion_content or ""
 
-            # 解析补充用例Markdown为JSON，用于前端表格显示
-            completion_cases_json = _parse_markdown_test_cases(completion_display_content)
+            # 补充用例JSON（流式生成时已逐行解析），用于前端表格显示
+            completion_cases_json = (
+                completion_payload
+                if completion_payload.get("modules")
+                else _parse_markdown_test_cases(completion_display_content)
+            )
 
             completion_result = StageResult(
                 stage=AgentStage.test_completion,
@@ -559,23 +1028,20 @@ class SessionWorkflowExecution:
             # 5. 准备最终结果（解析Markdown并合并JSON）
             logger.info("准备最终结果...")
 
-            # 解析测试用例生成和补全的Markdown为JSON
-            test_cases_json = _parse_markdown_test_cases(test_display_content)
-            completion_cases_json = _parse_markdown_test_cases(completion_display_content)
-
             # 合并测试用例（使用autogen_runner的合并函数）
-            from app.llm.autogen_runner import _merge_test_cases
             merged_test_cases = _merge_test_cases(test_cases_json, completion_cases_json)
 
             logger.info(f"合并后的测试用例: {len(merged_test_cases.get('modules', []))} 个模块")
 
             # 准备最终结果
             summary = analysis_payload
-            metrics = {}  # Markdown模式下metrics为空
+            metrics = {}  # Markdown模式下metrics为空，仅保存耗时明细
 
             # 为completed阶段准备简洁的文本内容（用于日志和备份）
             merged_markdown = f"测试用例生成完成，共 {sum(len(m.get('cases', [])) for m in merged_test_cases.get('modules', []))} 个测试用例"
 
+        except WorkflowInterrupted:
+            raise
         except Exception as exc:
             # 当 LLM 出错时，直接以错误提示告知前端，避免界面无响应
             logger.exception("AutoGen 执行失败，返回错误提示: %s", exc)
@@ -605,15 +1071,8 @@ class SessionWorkflowExecution:
                 f"分析流程失败：{exc}",
                 progress=0.95,
             )
-            await session_repository.update_session_status(
-                self.db_session,
-                session_id=self.session_id,
-                from_status=None,
-                to_status=SessionStatus.completed,
-                stage=AgentStage.completed,
-                progress=1.0,
-            )
-            await self.db_session.commit()
+            self._queue_status(SessionStatus.completed, stage=AgentStage.completed, progress=1.0)
+            await self.flush_status()
             return
 
         # 发送"完成"阶段事件
@@ -627,38 +1086,503 @@ class SessionWorkflowExecution:
             duration_seconds=total_duration,
         )
 
+        trace = tracing.current_trace()
+        if trace is not None:
+            metrics["spans"] = trace.export()
+        fallback_stages = [
+            stage.value
+            for stage, checkpoint in self._checkpoints.items()
+            if (checkpoint.payload or {}).get("fallback")
+        ]
+        if fallback_stages:
+            metrics["fallback_stages"] = fallback_stages
+
         # 先保存最终结果，确保导出接口可立即读取
-        await session_repository.add_session_result(
-            self.db_session,
-            session_id=self.session_id,
-            summary=summary,
-            payload=merged_test_cases,  # 保存合并后的测试用例
-            metrics=metrics,
-            stage=AgentStage.completed,
-            progress=1.0,
-        )
-        await self.db_session.commit()
+        async with self._unit_of_work() as db_session:
+            result_record = await session_repository.add_session_result(
+                db_session,
+                session_id=self.session_id,
+                summary=summary,
+                payload=merged_test_cases,  # 保存合并后的测试用例
+                metrics=metrics,
+                stage=AgentStage.completed,
+                progress=1.0,
+            )
+
+        # 用户修改过或由备用模型生成的结果不代表该输入在主模型下的输出，不写入结果缓存；
+        # 含错误或没有测试用例的结果也不写入，避免后续相同输入的会话直接复用失败结果
+        stage_payloads = [
+            (checkpoint.payload or {}).get("payload") for checkpoint in self._checkpoints.values()
+        ]
+        if (
+            cache_key is not None
+            and not self._edited
+            and not fallback_stages
+            and result_cache.is_cacheable(stage_payloads, merged_test_cases)
+        ):
+            await result_cache.store(
+                cache_key, session_id=self.session_id, version=result_record.version
+            )
 
         # 再发送"完成"阶段事件
         if completed_result is not None:
             await self._handle_stage_result(completed_result)
 
+        self._queue_status(SessionStatus.completed, stage=AgentStage.completed, progress=1.0)
+        await self.flush_status()
 
-        await session_repository.update_session_status(
-            self.db_session,
-            session_id=self.session_id,
-            from_status=None,
-            to_status=SessionStatus.completed,
-            stage=AgentStage.completed,
+        await self._emit_system_message(
+            "分析流程完成，所有结果已生成。",
             progress=1.0,
+            status_value=SessionStatus.completed,
         )
-        await self.db_session.commit()
 
+    async def _reuse_cached_result(self, cache_key: str) -> bool:
+        """命中结果缓存时直接以历史结果完成会话，返回是否已复用."""
+        entry = await result_cache.lookup(cache_key)
+        if entry is None:
+            return False
+        async with AsyncSessionLocal() as db_session:
+            source = await session_repository.get_session_result(
+                db_session, session_id=entry["session_id"], version=entry["version"]
+            )
+        if source is None:
+            # 来源会话已过期清理
+            return False
+
+        logger.info(
+            "命中结果缓存 session=%s, 复用 session=%s version=%s",
+            self.session_id,
+            entry["session_id"],
+            entry["version"],
+        )
+        await self._emit_system_message(
+            "检测到相同文档与配置的历史分析结果，直接复用，无需重新调用模型",
+            progress=0.5,
+        )
+
+        test_cases = copy.deepcopy(source.test_cases)
+        metrics = copy.deepcopy(source.metrics or {})
+        metrics.pop("spans", None)
+        metrics["cached_from"] = {"session_id": entry["session_id"], "version": entry["version"]}
+        async with self._unit_of_work() as db_session:
+            await session_repository.add_session_result(
+                db_session,
+                session_id=self.session_id,
+                summary=copy.deepcopy(source.summary),
+                payload=test_cases,
+                metrics=metrics,
+                stage=AgentStage.completed,
+                progress=1.0,
+            )
+
+        case_count = sum(len(m.get("cases", [])) for m in test_cases.get("modules", []))
+        await self._handle_stage_result(
+            StageResult(
+                stage=AgentStage.completed,
+                sender="测试工程师",
+                content=f"已复用历史分析结果，共 {case_count} 个测试用例",
+                payload=test_cases,
+                progress=0.95,
+            )
+        )
+        self._queue_status(SessionStatus.completed, stage=AgentStage.completed, progress=1.0)
+        await self.flush_status()
         await self._emit_system_message(
             "分析流程完成，所有结果已生成。",
             progress=1.0,
             status_value=SessionStatus.completed,
         )
+        return True
+
+    async def _run_agent_stage(
+        self,
+        stage: AgentStage,
+        runner: Callable[[], Awaitable[tuple[dict, str]]],
+    ) -> tuple[dict, str, float]:
+        """执行智能体阶段并写入检查点；已有检查点时直接复用，不再调用 LLM.
+
+        Returns:
+            tuple[dict, str, float]: (payload, 原始响应内容, 耗时秒数)
+        """
+        with tracing.span("stage", stage=stage.value, checkpoint=stage in self._checkpoints):
+            checkpoint = self._checkpoints.get(stage)
+            if checkpoint is not None:
+                logger.info("复用阶段检查点: stage=%s, session=%s", stage.value, self.session_id)
+                data = checkpoint.payload or {}
+                return (
+                    data.get("payload") or {},
+                    data.get("content") or "",
+                    float(data.get("duration_seconds") or 0.0),
+                )
+
+            if self._stop_event.is_set():
+                # 服务停止中：不再开始新的阶段，已完成阶段均已写入检查点
+                raise WorkflowInterrupted(stage.value)
+
+            started_at = datetime.utcnow()
+            started = time.time()
+            try:
+                payload, content, fallback = await self._run_within_budget(stage, runner)
+            except Exception as exc:
+                async with self._unit_of_work() as db_session:
+                    await session_repository.record_agent_run(
+                        db_session,
+                        session_id=self.session_id,
+                        stage=stage,
+                        payload={},
+                        started_at=started_at,
+                        error=str(exc) or exc.__class__.__name__,
+                    )
+                raise
+            duration = time.time() - started
+
+            async with self._unit_of_work() as db_session:
+                self._checkpoints[stage] = await session_repository.record_agent_run(
+                    db_session,
+                    session_id=self.session_id,
+                    stage=stage,
+                    payload={
+                        "payload": payload,
+                        "content": content,
+                        "duration_seconds": duration,
+                        "fallback": fallback,
+                        "confirmed": False,
+                    },
+                    started_at=started_at,
+                )
+            return payload, content, duration
+
+    async def _run_within_budget(
+        self,
+        stage: AgentStage,
+        runner: Callable[[], Awaitable[tuple[dict, str]]],
+    ) -> tuple[dict, str, bool]:
+        """按会话时间预算执行阶段；超出阶段预算时取消主模型调用并改用备用模型重试.
+
+        Returns:
+            tuple[dict, str, bool]: (payload, 原始响应内容, 是否使用了备用模型)
+        """
+        spent = sum(
+            float((checkpoint.payload or {}).get("duration_seconds") or 0.0)
+            for checkpoint in self._checkpoints.values()
+        )
+        remaining = [item for item in deadlines.STAGE_WEIGHTS if item not in self._checkpoints]
+        agent_type = deadlines.STAGE_AGENTS.get(stage)
+        if agent_type is None:
+            payload, content = await runner()
+            return payload, content, False
+
+        plan = deadlines.plan_stage(stage, spent=spent, remaining_stages=remaining)
+        primary = settings.get_agent_config(agent_type)["model"]
+
+        if not plan.use_fallback:
+            started = time.perf_counter()
+            try:
+                with use_fallback_model(False):
+                    payload, content = await asyncio.wait_for(runner(), timeout=plan.timeout)
+                deadlines.stage_latency.observe(primary, stage, time.perf_counter() - started)
+                return payload, content, False
+            except asyncio.TimeoutError:
+                # 超时时长作为延迟下限计入统计，后续会话可提前切换备用模型
+                deadlines.stage_latency.observe(primary, stage, time.perf_counter() - started)
+                logger.warning(
+                    "阶段 %s 超出时间预算 %.1f 秒，改用备用模型重试，session=%s",
+                    stage.value,
+                    plan.timeout,
+                    self.session_id,
+                )
+
+        fallback_model = settings.get_agent_config(agent_type, fallback=True)["model"]
+        logger.info("阶段 %s 使用备用模型 %s，session=%s", stage.value, fallback_model, self.session_id)
+        tracing.annotate(fallback_model=fallback_model)
+        event = {
+            "type": "model_fallback",
+            "stage": stage.value,
+            "model": fallback_model,
+            "timed_out": not plan.use_fallback,
+            "timestamp": time.time(),
+        }
+        await self._progress.publish(event)
+        with use_fallback_model():
+            payload, content = await runner()
+        return payload, content, True
+
+    async def _call_agent(
+        self,
+        stage: AgentStage,
+        agent_type: str,
+        func: Callable[..., Awaitable[tuple[dict, str]]],
+        *args,
+    ) -> tuple[dict, str]:
+        """经准入控制获取调用槽位后执行智能体阶段函数.
+
+        阶段函数在事件循环中执行（共享连接池的流式请求），任务取消即关闭连接并释放槽位.
+        """
+        model = resolve_agent_config(agent_type)["model"]
+
+        async def _report_position(position: int) -> None:
+            await manager.broadcast(
+                self.session_id,
+                {
+                    "type": "queue_position",
+                    "stage": stage.value,
+                    "position": position,
+                    "timestamp": time.time(),
+                },
+            )
+
+        with tracing.span("llm.call", stage=stage.value, agent=agent_type, model=model):
+            async with admission_controller.slot(
+                model=model,
+                tenant=self._tenant,
+                on_position=_report_position,
+            ) as queue_wait:
+                tracing.annotate(queue_wait_ms=round(queue_wait * 1000, 3))
+                if queue_wait >= 0.1:
+                    logger.info(
+                        "阶段 %s 排队 %.2f 秒后获得调用槽位，session=%s",
+                        stage.value,
+                        queue_wait,
+                        self.session_id,
+                    )
+                with bypass_completion_cache(self._force_regenerate):
+                    return await func(*args)
+
+    async def _stream_agent(
+        self,
+        stage: AgentStage,
+        agent_type: str,
+        func: Callable[..., Awaitable[tuple[dict, str]]],
+        *args,
+        module: str | None = None,
+        parse_cases: bool = False,
+    ) -> tuple[dict, str]:
+        """调用智能体阶段函数，并将流式输出合并后实时推送到 WebSocket.
+
+        ``parse_cases`` 为 True 时边生成边解析测试用例表格，逐行推送，
+        并以解析结果作为 payload，生成结束后无需再次解析。
+        """
+        case_parser = MarkdownCaseParser() if parse_cases else None
+        async with StreamCoalescer(
+            self.session_id,
+            stage=stage,
+            sender=self._stage_senders.get(stage, "系统"),
+            module=module,
+            case_parser=case_parser,
+        ) as stream:
+            payload, content = await self._call_agent(stage, agent_type, func, *args, stream.on_chunk)
+        if case_parser is not None and not payload:
+            # 流式文本与最终结果不一致（如补全了模块标题）时退回整体解析
+            if case_parser.text == content:
+                payload = case_parser.result()
+            else:
+                payload = _parse_markdown_test_cases(content)
+        return payload, content
+
+    async def _mark_stage_confirmed(self, stage: AgentStage) -> None:
+        """记录阶段已被用户确认，恢复时无需再次等待确认."""
+        checkpoint = self._checkpoints.get(stage)
+        if checkpoint is None:
+            return
+        checkpoint.payload["confirmed"] = True
+        await self._save_checkpoint(checkpoint)
+
+    async def _apply_confirmed_edits(
+        self, stage: AgentStage, confirmation: dict | None, payload: dict
+    ) -> tuple[dict, bool]:
+        """应用用户确认时提交的修改，并写入检查点供恢复时使用.
+
+        Returns:
+            tuple[dict, bool]: (生效的 payload, 是否被用户修改)
+        """
+        edited = (confirmation or {}).get("payload")
+        checkpoint = self._checkpoints.get(stage)
+        if isinstance(edited, dict) and edited and edited != payload:
+            logger.info("用户修改了阶段结果: stage=%s, session=%s", stage.value, self.session_id)
+            self._edited = True
+            if checkpoint is not None:
+                checkpoint.payload["edited_payload"] = edited
+                await self._save_checkpoint(checkpoint)
+            return edited, True
+        if checkpoint is not None and checkpoint.payload.get("edited_payload"):
+            # 恢复执行时沿用之前确认过的修改
+            self._edited = True
+            return checkpoint.payload["edited_payload"], True
+        return payload, False
+
+    async def _generate_test_cases(self, analysis_payload: dict) -> tuple[dict, str]:
+        """按功能模块并行生成测试用例，每个模块完成后立即推送，最终合并为完整结果.
+
+        Returns:
+            tuple[dict, str]: (合并后的测试用例JSON, 按模块顺序拼接的Markdown)
+        """
+        modules = [
+            module
+            for module in (analysis_payload or {}).get("modules") or []
+            if isinstance(module, dict)
+        ]
+        if len(modules) <= 1:
+            return await self._stream_agent(
+                AgentStage.test_generation, "test", run_test_generation, analysis_payload, parse_cases=True
+            )
+
+        semaphore = asyncio.Semaphore(settings.test_generation_concurrency)
+        total = len(modules)
+        finished = 0
+        reused = 0
+
+        async def _run_module(module: dict, name: str) -> tuple[dict, str]:
+            async with semaphore:
+                return await self._stream_agent(
+                    AgentStage.test_generation,
+                    "test",
+                    run_test_generation_for_module,
+                    module,
+                    analysis_payload,
+                    module=name,
+                    parse_cases=True,
+                )
+
+        async def _generate_module(module: dict) -> tuple[dict, str]:
+            nonlocal finished, reused
+            name = module.get("name") or module.get("module") or "未命名模块"
+            event = {
+                "type": "module_test_cases",
+                "stage": AgentStage.test_generation.value,
+                "module": name,
+                "total": total,
+            }
+            # 内容相同的模块复用已完成或生成中的结果，修改分析结果后只重新生成变化的模块
+            key = _module_fingerprint(module)
+            task = self._module_tasks.get(key)
+            if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+                task = asyncio.create_task(_run_module(module, name))
+                self._module_tasks[key] = task
+            else:
+                reused += 1
+                event["reused"] = True
+            try:
+                cases, content = await task
+            except Exception as exc:
+                logger.warning("模块 %s 测试用例生成失败: %s", name, exc)
+                event["error"] = str(exc)
+                raise
+            else:
+                event["payload"] = cases
+                return cases, content
+            finally:
+                # 推送而不写入会话状态：推测执行期间会话仍处于等待确认
+                finished += 1
+                event["completed"] = finished
+                event["timestamp"] = time.time()
+                if "payload" in event or "error" in event:
+                    await manager.broadcast(self.session_id, event)
+
+        results = await asyncio.gather(
+            *(_generate_module(module) for module in modules), return_exceptions=True
+        )
+        if reused:
+            logger.info("复用 %s/%s 个未修改模块的测试用例，session=%s", reused, total, self.session_id)
+            tracing.annotate(reused_modules=reused)
+
+        merged: dict = {"modules": []}
+        sections: list[str] = []
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                continue
+            cases, content = result
+            merged = _merge_test_cases(merged, cases)
+            sections.append(content.strip())
+
+        if not sections:
+            raise RuntimeError("所有模块的测试用例生成均失败")
+        return merged, "\n\n".join(sections)
+
+    def _discard_stale_modules(self, analysis_payload: dict) -> int:
+        """取消内容已不在分析结果中的模块生成任务，返回被丢弃的模块数量."""
+        current = {
+            _module_fingerprint(module)
+            for module in (analysis_payload or {}).get("modules") or []
+            if isinstance(module, dict)
+        }
+        stale = [key for key in self._module_tasks if key not in current]
+        for key in stale:
+            self._module_tasks.pop(key).cancel()
+        return len(stale)
+
+    async def _analyze_requirements(self, document_data: list[dict]) -> tuple[dict, str]:
+        """需求分析：文档超出单次提示词上限时分片并行分析（map），再合并模块与风险（reduce）."""
+        chunks = [] if settings.analysis_multimodal_enabled else plan_analysis_chunks(document_data)
+        if len(chunks) <= 1:
+            return await self._stream_agent(
+                AgentStage.requirement_analysis, "analysis", run_requirement_analysis, document_data
+            )
+
+        total = len(chunks)
+        logger.info("文档较大，分为 %s 个片段并行分析，session=%s", total, self.session_id)
+        semaphore = asyncio.Semaphore(settings.analysis_map_concurrency)
+        model = resolve_agent_config("analysis")["model"]
+        reused = 0
+
+        async def _analyze(index: int, chunk: str) -> dict:
+            nonlocal reused
+            key = _section_key(model, chunk) if settings.near_duplicate_enabled else None
+            if key is not None and not self._force_regenerate:
+                # 近似重复文档中未变化的片段直接复用之前的分析结果（force_regenerate 时重新分析）
+                cached = await document_index.load_artifact(self._artifact_sources, "analysis_chunk", key)
+                if cached is not None:
+                    reused += 1
+                    return cached
+            async with semaphore:
+                with tracing.span("analysis.chunk", stage=AgentStage.requirement_analysis.value, index=index):
+                    payload, _ = await self._stream_agent(
+                        AgentStage.requirement_analysis,
+                        "analysis",
+                        run_requirement_analysis_chunk,
+                        chunk,
+                        index,
+                        total,
+                        module=f"第{index}/{total}部分",
+                    )
+            if key is not None and payload and not payload.get("error"):
+                await document_index.save_artifact(self._artifact_owners, "analysis_chunk", key, payload)
+            return payload
+
+        payloads = await asyncio.gather(
+            *(_analyze(index, chunk) for index, chunk in enumerate(chunks, 1))
+        )
+        if reused:
+            logger.info("复用 %s/%s 个未变化片段的分析结果，session=%s", reused, total, self.session_id)
+            tracing.annotate(reused_chunks=reused)
+            await self._emit_system_message(
+                f"文档与历史版本近似，复用 {reused}/{total} 个未变化片段的分析结果",
+                progress=0.2,
+            )
+        with tracing.span("analysis.reduce", chunks=total):
+            merged = merge_analysis_payloads(payloads)
+        return merged, json.dumps(merged, ensure_ascii=False, indent=2)
+
+    async def _await_speculative(
+        self, task: asyncio.Task, analysis_payload: dict
+    ) -> tuple[dict, str]:
+        """取用推测执行的结果；推测执行失败时按正常流程重新生成."""
+        hidden = task.done()
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("推测生成测试用例失败，重新生成: %s", exc)
+            return await self._generate_test_cases(analysis_payload)
+        logger.info(
+            "复用推测生成的测试用例（%s），session=%s",
+            "确认前已完成" if hidden else "确认后继续等待",
+            self.session_id,
+        )
+        return result
 
     def _from_autogen(self, outputs: AutogenOutputs):
         def _count_cases(data: dict) -> int:
@@ -721,16 +1645,21 @@ class SessionWorkflowExecution:
             outputs.metrics,
         )
 
-    async def _handle_stage_result(self, result: StageResult, *, skip_confirmation: bool = True, needs_confirmation: bool = False) -> None:
-        await session_repository.update_session_status(
-            self.db_session,
-            session_id=self.session_id,
-            from_status=None,
-            to_status=SessionStatus.processing,
+    async def _handle_stage_result(self, result: StageResult, *, skip_confirmation: bool = True, needs_confirmation: bool = False) -> dict | None:
+        """推送阶段结果；需要确认时等待用户确认并返回确认内容（含用户修改的 payload）."""
+        awaiting_confirmation = needs_confirmation and not skip_confirmation
+        checkpoint = self._checkpoints.get(result.stage)
+        if awaiting_confirmation and checkpoint is not None and checkpoint.payload.get("confirmed"):
+            # 恢复执行时，已确认过的阶段不再重复等待
+            awaiting_confirmation = False
+        self._queue_status(
+            SessionStatus.awaiting_confirmation if awaiting_confirmation else SessionStatus.processing,
             stage=result.stage,
             progress=result.progress,
         )
-        await self.db_session.commit()
+        if awaiting_confirmation:
+            # 确认接口校验 awaiting_confirmation 状态，必须在推送结果前写入
+            await self.flush_status()
 
         event = {
             "type": "agent_message",
@@ -739,7 +1668,7 @@ class SessionWorkflowExecution:
             "content": result.content,
             "payload": result.payload,
             "progress": result.progress,
-            "needs_confirmation": bool(needs_confirmation),  # 标记需要确认
+            "needs_confirmation": bool(awaiting_confirmation),  # 标记需要确认
             "timestamp": time.time(),
         }
         if result.duration_seconds is not None:
@@ -758,69 +1687,75 @@ class SessionWorkflowExecution:
                 modules = result.payload.get("modules", [])
                 logger.info(f"payload包含 {len(modules) if isinstance(modules, list) else 'invalid'} 个模块")
 
-        await session_events.append_event(self.session_id, event)
-        await session_events.set_status(
-            self.session_id,
+        if awaiting_confirmation:
+            # 在推送结果之前清除旧的确认数据，避免用户快速确认时被误清除
+            await session_events.clear_confirmation(self.session_id)
+
+        await self._progress.publish(
+            event,
             {
                 "stage": result.stage.value,
                 "progress": result.progress,
                 "status": (
                     SessionStatus.awaiting_confirmation.value
-                    if needs_confirmation and not skip_confirmation
+                    if awaiting_confirmation
                     else SessionStatus.processing.value
                 ),
             },
         )
-        await manager.broadcast(self.session_id, event)
+        # 阶段边界：立即写入，保证重连的客户端能回放阶段结果
+        await self._progress.flush()
 
         # 等待用户确认（可跳过）
-        if not skip_confirmation and needs_confirmation:
-            confirmed = await self._wait_for_confirmation(result.stage)
-            if not confirmed:
+        if awaiting_confirmation:
+            confirmation = await self._wait_for_confirmation(result.stage)
+            if confirmation is None:
                 # 用户拒绝或超时，抛出异常终止流程
                 raise RuntimeError(f"阶段 {result.stage.value} 确认失败或超时")
+            await self._mark_stage_confirmed(result.stage)
+            return confirmation
+        return None
 
-    async def _wait_for_confirmation(self, stage: AgentStage, timeout: int = 300) -> bool:
+    async def _wait_for_confirmation(self, stage: AgentStage, timeout: int = 300) -> dict | None:
         """等待用户确认当前阶段的结果.
 
         Returns:
-            bool: True if confirmed, False if timeout or rejected
+            dict | None: 确认内容；超时或被拒绝时返回 None
         """
         logger.info(f"等待用户确认 stage={stage.value}, session={self.session_id}")
 
-        # 清除之前的确认数据
-        await session_events.clear_confirmation(self.session_id)
-
-        # 轮询等待确认 (每秒检查一次,最多等待timeout秒)
-        for _ in range(timeout):
-            await asyncio.sleep(1)
-
-            confirmation = await session_events.get_confirmation(self.session_id)
-            if confirmation and confirmation.get("stage") == stage.value:
-                if confirmation.get("confirmed"):
-                    logger.info(f"收到用户确认: stage={stage.value}, session={self.session_id}")
-
-                    # 如果用户编辑了数据,更新payload
-                    if "payload" in confirmation and confirmation["payload"]:
-                        # 这里可以根据需要更新result的payload
-                        logger.info(f"用户更新了payload数据")
-
-                    # 清除确认数据
-                    await session_events.clear_confirmation(self.session_id)
-
-                    # 发送系统消息 - 根据不同阶段提供不同的反馈
-                    if stage != AgentStage.test_completion:
-                        stage_label = self._stage_labels.get(stage, stage.value)
-                        await self._emit_system_message(
-                            f"{stage_label}阶段已确认，继续执行",
-                            progress=0.0,  # 进度在下个阶段更新
-                        )
-
-                    return True
-                elif confirmation.get("rejected"):
-                    logger.info(f"用户拒绝确认: stage={stage.value}, session={self.session_id}")
-                    await session_events.clear_confirmation(self.session_id)
-                    return False
+        # 等待确认通知（进程内 asyncio.Event + 跨进程 Redis pub/sub），无需轮询；服务停止时立即让出
+        if self._on_awaiting is not None:
+            self._on_awaiting(True)
+        try:
+            confirmation = await self._until_stopped(
+                session_events.wait_for_confirmation(self.session_id, stage.value, timeout=timeout)
+            )
+        finally:
+            if self._on_awaiting is not None:
+                self._on_awaiting(False)
+        if confirmation is not None:
+            if confirmation.get("confirmed"):
+                logger.info(f"收到用户确认: stage={stage.value}, session={self.session_id}")
+
+                # 清除确认数据
+                await session_events.clear_confirmation(self.session_id)
+                # 确认接口已将状态置为 processing，这里随下一次写入一并提交
+                self._queue_status(SessionStatus.processing)
+
+                # 发送系统消息 - 根据不同阶段提供不同的反馈
+                if stage != AgentStage.test_completion:
+                    stage_label = self._stage_labels.get(stage, stage.value)
+                    await self._emit_system_message(
+                        f"{stage_label}阶段已确认，继续执行",
+                        progress=0.0,  # 进度在下个阶段更新
+                    )
+
+                return confirmation
+            if confirmation.get("rejected"):
+                logger.info(f"用户拒绝确认: stage={stage.value}, session={self.session_id}")
+                await session_events.clear_confirmation(self.session_id)
+                return None
 
         # 超时未确认,标记失败
         logger.warning(f"等待确认超时: stage={stage.value}, session={self.session_id}")
@@ -828,16 +1763,82 @@ class SessionWorkflowExecution:
             f"等待确认超时，流程已终止",
             progress=0.0,
         )
-        await session_repository.update_session_status(
-            self.db_session,
-            session_id=self.session_id,
-            from_status=None,
-            to_status=SessionStatus.failed,
-            stage=stage,
+        self._queue_status(SessionStatus.failed, stage=stage, progress=0.0)
+        await self.flush_status()
+        return None
+
+    async def _until_stopped(self, awaitable: Awaitable):
+        """等待 awaitable 完成；服务开始停止时取消等待并抛出 WorkflowInterrupted."""
+        waiter = asyncio.ensure_future(awaitable)
+        stopper = asyncio.create_task(self._stop_event.wait())
+        try:
+            await asyncio.wait({waiter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopper.cancel()
+            if not waiter.done():
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+        if waiter.cancelled():
+            raise WorkflowInterrupted("stopped while waiting")
+        return waiter.result()
+
+    async def close(self) -> None:
+        """写入尚未落盘的进度事件."""
+        await self._progress.close()
+
+    async def notify_interrupted(self) -> None:
+        await self._emit_system_message(
+            "服务正在重启，分析流程已暂停，恢复后将从已完成的阶段继续",
             progress=0.0,
         )
-        await self.db_session.commit()
-        return False
+
+    @asynccontextmanager
+    async def _unit_of_work(self) -> AsyncIterator[AsyncSession]:
+        """仅在写入时打开的短事务：先应用排队的状态变更，退出时提交并归还连接."""
+        async with AsyncSessionLocal() as db_session:
+            pending, self._pending_status = self._pending_status, None
+            try:
+                if pending is not None:
+                    await session_repository.update_session_status(
+                        db_session, session_id=self.session_id, from_status=None, **pending
+                    )
+                yield db_session
+                with tracing.span("db.commit"):
+                    await db_session.commit()
+            except BaseException:
+                # 写入失败时保留排队的状态变更，除非期间已有更新的变更
+                if pending is not None and self._pending_status is None:
+                    self._pending_status = pending
+                raise
+
+    def _queue_status(
+        self,
+        to_status: SessionStatus,
+        *,
+        stage: AgentStage | None = None,
+        progress: float | None = None,
+    ) -> None:
+        """记录状态变更，随下一次写入批量提交；连续的变更只保留最终状态."""
+        pending = self._pending_status or {}
+        pending["to_status"] = to_status
+        if stage is not None:
+            pending["stage"] = stage
+        if progress is not None:
+            pending["progress"] = progress
+        self._pending_status = pending
+
+    async def flush_status(self) -> None:
+        """立即写入排队中的状态变更."""
+        if self._pending_status is None:
+            return
+        async with self._unit_of_work():
+            pass
+
+    async def _save_checkpoint(self, checkpoint: AgentRun) -> None:
+        async with self._unit_of_work() as db_session:
+            await session_repository.update_agent_run_payload(
+                db_session, checkpoint.id, dict(checkpoint.payload)
+            )
 
     async def _emit_system_message(
         self,
@@ -854,15 +1855,15 @@ class SessionWorkflowExecution:
             "progress": progress,
             "timestamp": time.time(),
         }
-        await session_events.append_event(self.session_id, event)
-        await session_events.set_status(
-            self.session_id,
+        await self._progress.publish(
+            event,
             {
                 "stage": event["stage"],
                 "progress": progress,
                 "status": (status_value or SessionStatus.processing).value,
             },
         )
-        await manager.broadcast(self.session_id, event)
+        if status_value is not None:
+            await self._progress.flush()
 
 workflow = AnalysisWorkflow()
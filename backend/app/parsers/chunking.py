@@ -0,0 +1,97 @@
+"""Split requirement documents into token-bounded chunks for map-reduce analysis."""
+
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from typing import Iterable
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+# Past the half-full mark a chunk may end after a paragraph whose content hash marks a cut
+# point (on average every fourth), so chunks realign with the previous version after an edit
+_CUT_POINT_MODULUS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in ``text`` (CJK one per character, other text one per four)."""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _is_cut_point(piece: str) -> bool:
+    return zlib.crc32(" ".join(piece.split()).encode("utf-8")) % _CUT_POINT_MODULUS == 0
+
+
+def _split_oversized(text: str, max_tokens: int) -> Iterable[str]:
+    """Split a paragraph that exceeds ``max_tokens`` on lines, then characters."""
+    current: list[str] = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = estimate_tokens(line) + 1
+        if line_tokens > max_tokens:
+            if current:
+                yield "\n".join(current)
+                current, current_tokens = [], 0
+            # Every character is at most one token, so max_tokens characters always fit
+            for start in range(0, len(line), max_tokens):
+                yield line[start : start + max_tokens]
+            continue
+        if current and current_tokens + line_tokens > max_tokens:
+            yield "\n".join(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        yield "\n".join(current)
+
+
+def split_documents(sections: list[tuple[str, str]], max_tokens: int) -> list[str]:
+    """Pack ``(header, text)`` sections into chunks of at most ``max_tokens`` tokens.
+
+    Small documents share a chunk; large ones are split across several chunks
+    with their header repeated and marked as a continuation.
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current).strip())
+        current, current_tokens = [], 0
+
+    cut = False
+    for header, text in sections:
+        header_tokens = estimate_tokens(header) + 1
+        budget = max(1, max_tokens - header_tokens * 2)
+        paragraphs = [part for part in _PARAGRAPH_PATTERN.split(text or "") if part.strip()]
+        pieces: list[str] = []
+        for paragraph in paragraphs:
+            if estimate_tokens(paragraph) > budget:
+                pieces.extend(_split_oversized(paragraph, budget))
+            else:
+                pieces.append(paragraph)
+
+        if current and (cut or current_tokens + header_tokens > max_tokens):
+            flush()
+        current.append(header)
+        current_tokens += header_tokens
+        cut = False
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 2
+            if cut or current_tokens + piece_tokens > max_tokens:
+                flush()
+                continuation = f"{header}（续）"
+                current.append(continuation)
+                current_tokens = estimate_tokens(continuation) + 1
+            current.append(piece)
+            current.append("")
+            current_tokens += piece_tokens
+            cut = current_tokens * 2 >= max_tokens and _is_cut_point(piece)
+    flush()
+    return chunks
@@ -0,0 +1,124 @@
+"""Incremental parser for Markdown test-case tables produced by the test agents."""
+
+from __future__ import annotations
+
+import re
+from typing import Iterator
+
+_BR_PATTERN = re.compile(r"<br\s*/?>", flags=re.IGNORECASE)
+
+
+def _clean_field(text: str | None) -> str | None:
+    if not text or text == "-":
+        return None
+    return _BR_PATTERN.sub("\n", text).strip()
+
+
+def _is_section_break(line: str) -> bool:
+    return line.startswith("##") and (len(line) == 2 or line[2].isspace())
+
+
+def _is_table_header(line: str) -> bool:
+    return "|" in line and ("用例" in line or "ID" in line or "标题" in line)
+
+
+# 与工作流中的批量解析规则一致：每节首个非空行为模块名，只读取第一张表
+class MarkdownCaseParser:
+    """Parse ``## 模块`` sections with case tables from a stream of chunks."""
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._text: list[str] = []
+        self._modules: list[dict] = []
+        self._start_section(name_line=None)
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return "".join(self._text)
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        """Consume a chunk and return ``(module, case)`` for every row it completed."""
+        if not chunk:
+            return []
+        self._text.append(chunk)
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        return [row for line in lines for row in self._consume(line)]
+
+    def close(self) -> list[tuple[str, dict]]:
+        """Consume the trailing partial line once the stream has ended."""
+        line, self._buffer = self._buffer, ""
+        rows = list(self._consume(line)) if line else []
+        self._stop_table()
+        return rows
+
+    def result(self) -> dict:
+        """Return the parsed cases as ``{"modules": [{"name", "cases"}]}``."""
+        return {"modules": [module for module in self._modules if module["cases"]]}
+
+    def _start_section(self, name_line: str | None) -> None:
+        self._module: dict | None = None
+        self._state = "name"
+        self._case_counter = 1
+        if name_line is not None:
+            self._consume_name(name_line)
+
+    def _stop_table(self) -> None:
+        self._state = "done"
+
+    def _consume(self, line: str) -> Iterator[tuple[str, dict]]:
+        if _is_section_break(line):
+            self._start_section(name_line=line[2:])
+            return
+
+        if self._state == "name":
+            self._consume_name(line)
+        elif self._state == "header":
+            if _is_table_header(line):
+                self._state = "separator"
+        elif self._state == "separator":
+            self._state = "rows"
+        elif self._state == "rows":
+            row = line.strip()
+            if not row or row.startswith("#") or not row.startswith("|"):
+                self._stop_table()
+                return
+            case = self._build_case(row)
+            if case is not None:
+                yield self._module["name"], case
+
+    def _consume_name(self, line: str) -> None:
+        if not line.strip():
+            # 段落开头的空行会被忽略，模块名取第一行非空文本
+            return
+        name = line.strip().lstrip("#").strip()
+        if not name:
+            self._stop_table()
+            return
+        self._module = {"name": name, "cases": []}
+        self._modules.append(self._module)
+        self._state = "separator" if _is_table_header(line) else "header"
+
+    def _build_case(self, row: str) -> dict | None:
+        cells = [cell.strip() for cell in row.split("|")]
+        cells = [cell for cell in cells if cell]
+        if len(cells) < 2:
+            return None
+
+        module_name = self._module["name"]
+        case = {
+            "id": _clean_field(cells[0]) or f"TC-{module_name}-{self._case_counter:02d}",
+            "title": _clean_field(cells[1]) or "未命名测试用例",
+        }
+        for key, index in (("preconditions", 2), ("steps", 3), ("expected", 4)):
+            value = _clean_field(cells[index]) if len(cells) > index else None
+            if value:
+                case[key] = value
+        priority = _clean_field(cells[5]) if len(cells) > 5 else None
+        if priority:
+            case["priority"] = priority.upper()
+
+        self._module["cases"].append(case)
+        self._case_counter += 1
+        return case
@@ -0,0 +1,67 @@
+"""MinHash signatures and LSH band keys for near-duplicate document detection."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+
+# One permutation hashing over character shingles (works for Chinese and English alike);
+# two documents become LSH candidates when any band of ROWS values matches
+NUM_BINS = 128
+BANDS = 32
+ROWS = NUM_BINS // BANDS
+SHINGLE_SIZE = 5
+
+_HASH_BITS = 64
+_BIN_WIDTH = (1 << _HASH_BITS) // NUM_BINS
+_EMPTY = -1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so layout changes do not count as edits."""
+    return _WHITESPACE.sub(" ", text or "").strip().lower()
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def signature(text: str) -> list[int] | None:
+    """Return the MinHash signature of ``text``, or ``None`` when it is too short."""
+    normalized = normalize(text)
+    if len(normalized) < SHINGLE_SIZE:
+        return None
+    bins = [_EMPTY] * NUM_BINS
+    for start in range(len(normalized) - SHINGLE_SIZE + 1):
+        value = _hash(normalized[start : start + SHINGLE_SIZE])
+        index, offset = divmod(value, _BIN_WIDTH)
+        if bins[index] == _EMPTY or offset < bins[index]:
+            bins[index] = offset
+    for index in range(NUM_BINS):
+        if bins[index] != _EMPTY:
+            continue
+        # Densification: take the next non-empty bin, shifted so it cannot collide with a real value
+        for step in range(1, NUM_BINS):
+            donor = bins[(index + step) % NUM_BINS]
+            if donor != _EMPTY and donor < _BIN_WIDTH:
+                bins[index] = donor + step * _BIN_WIDTH
+                break
+    return bins
+
+
+def similarity(left: list[int], right: list[int]) -> float:
+    """Estimate the Jaccard similarity of the shingle sets behind two signatures."""
+    if not left or len(left) != len(right):
+        return 0.0
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def band_keys(sig: list[int]) -> list[str]:
+    """Return one bucket key per LSH band of ``sig``."""
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode("ascii"), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
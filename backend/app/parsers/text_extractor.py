@@ -39,13 +39,13 @@ def _read_docx(path: Path, limit: int) -> str:
 
 
 def _read_image_with_vl(path: Path, limit: int) -> str:
-    """使用 VL 模型从图片中提取需求信息."""
+    """使用 VL 模型从图片中提取需求信息（在线程中调用，阻塞等待结果）."""
     try:
         from app.config import settings
-        from app.llm.vision_client import extract_requirements_from_image, is_vl_available
+        from app.llm import vision_engine
 
         # 检查 VL 模型是否可用
-        if not is_vl_available():
+        if not vision_engine.is_available():
             logger.warning("VL model not available, skipping image processing")
             return ""
 
@@ -56,11 +56,12 @@ def _read_image_with_vl(path: Path, limit: int) -> str:
             return ""
 
         # 使用 VL 模型提取需求
-        text = extract_requirements_from_image(
-            image_path=path,
+        text = vision_engine.analyze_sync(
+            path,
             api_key=vl_config["api_key"],
             model=vl_config["model"],
             base_url=vl_config.get("base_url"),
+            prompt_mode="requirement",
         )
         return text[:limit]
 
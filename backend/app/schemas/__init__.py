@@ -3,6 +3,10 @@
 from app.schemas.document import DocumentOut, DocumentUploadResponse  # noqa: F401
 from app.schemas.session import (  # noqa: F401
     PaginationMeta,
+    SessionBatchCreateRequest,
+    SessionBatchCreateResponse,
+    SessionBatchItem,
+    SessionBatchProgress,
     SessionConfirmationRequest,
     ExportRequest,
     SessionCreateRequest,
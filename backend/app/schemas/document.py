@@ -24,4 +24,6 @@ class DocumentOut(BaseModel):
 class DocumentUploadResponse(BaseModel):
     document: DocumentOut
     is_duplicate: bool = False
+    near_duplicate_of: str | None = None
+    similarity: float | None = None
 
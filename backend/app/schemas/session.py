@@ -18,6 +18,25 @@ class SessionCreateRequest(BaseModel):
     document_ids: list[str] = Field(..., min_length=1)
     config: dict[str, Any] = Field(default_factory=dict)
     created_by: str | None = None
+    force_regenerate: bool = Field(
+        default=False,
+        description="Ignore memoized results for the same documents and configuration",
+    )
+
+
+class SessionBatchItem(BaseModel):
+    document_ids: list[str] = Field(..., min_length=1)
+    config: dict[str, Any] = Field(default_factory=dict)
+
+
+class SessionBatchCreateRequest(BaseModel):
+    items: list[SessionBatchItem] = Field(..., min_length=1)
+    config: dict[str, Any] = Field(
+        default_factory=dict,
+        description="Configuration shared by every item; item config overrides it",
+    )
+    created_by: str | None = None
+    force_regenerate: bool = False
 
 
 class SessionConfirmationRequest(BaseModel):
@@ -56,6 +75,21 @@ class SessionCreateResponse(BaseModel):
     expires_at: datetime | None
 
 
+class SessionBatchCreateResponse(BaseModel):
+    batch_id: str
+    session_ids: list[str]
+
+
+class SessionBatchProgress(BaseModel):
+    batch_id: str
+    total: int
+    status_counts: dict[str, int]
+    finished: int
+    progress: float
+    created_at: datetime
+    sessions: list[SessionSummary]
+
+
 class SessionResultsResponse(BaseModel):
     analysis: dict[str, Any] | str
     test_cases: dict[str, Any]
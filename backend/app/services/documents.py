@@ -1,6 +1,8 @@
 """Domain services for document handling."""
 
+import asyncio
 import hashlib
+import logging
 from pathlib import Path
 from typing import Tuple
 from uuid import uuid4
@@ -8,8 +10,17 @@ from uuid import uuid4
 from fastapi import HTTPException, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import document_index
 from app.config import settings
 from app.db import document_repository
+from app.models.document import Document
+from app.parsers import minhash
+from app.parsers.text_extractor import extract_text
+
+logger = logging.getLogger(__name__)
+
+# Images only yield text through the VL model, which is too costly at upload time
+_IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
 
 
 async def _write_upload_to_disk(file: UploadFile) -> Tuple[Path, str, int]:
@@ -78,7 +89,41 @@ async def handle_upload(
         checksum=checksum,
         size=size,
     )
-    return {
+    result = {
         "document": document,
         "is_duplicate": False,
     }
+    if settings.near_duplicate_enabled:
+        match = await _index_document(document)
+        if match is not None:
+            result["near_duplicate_of"], result["similarity"] = match
+    return result
+
+
+async def _index_document(document: Document) -> tuple[str, float] | None:
+    """Add the document to the near-duplicate index and return its closest match."""
+
+    if Path(document.original_name or "").suffix.lower() in _IMAGE_SUFFIXES:
+        return None
+    try:
+        text = await asyncio.to_thread(
+            extract_text,
+            document.storage_path,
+            limit=settings.document_text_limit,
+            original_name=document.original_name,
+        )
+        signature = await asyncio.to_thread(minhash.signature, text)
+    except Exception as exc:  # noqa: BLE001 - indexing must not fail the upload
+        logger.warning("Failed to index document %s: %s", document.id, exc)
+        return None
+    if signature is None:
+        return None
+
+    match = await document_index.find_similar(signature, exclude=document.id)
+    await document_index.register(document.id, signature)
+    if match is not None:
+        logger.info(
+            "Document %s is a near duplicate of %s (similarity %.2f)", document.id, *match
+        )
+        await document_index.link(document.id, *match)
+    return match
@@ -1,12 +1,24 @@
 """Domain services for session lifecycle."""
 
+import time
 from typing import Any
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import session_events
 from app.db import session_repository
-from app.models.session import AgentStage, Session, SessionStatus
+from app.config import settings
+from app.models.session import AgentStage, Session, SessionBatch, SessionStatus
+from app.orchestrator import workflow
+from app.websocket.manager import manager
+
+_TERMINAL_STATUSES = {
+    SessionStatus.completed,
+    SessionStatus.failed,
+    SessionStatus.archived,
+    SessionStatus.expired,
+}
 
 
 async def create_session(
@@ -15,10 +27,14 @@ async def create_session(
     document_ids: list[str],
     config: dict[str, Any],
     created_by: str | None,
+    force_regenerate: bool = False,
 ) -> Session:
     if not document_ids:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "At least one document is required")
 
+    if force_regenerate:
+        config = {**config, "force_regenerate": True}
+
     session = await session_repository.create_session(
         db_session,
         document_ids=document_ids,
@@ -32,6 +48,70 @@ async def create_session(
     return session
 
 
+async def create_batch(
+    db_session: AsyncSession,
+    *,
+    items: list[dict[str, Any]],
+    config: dict[str, Any],
+    created_by: str | None,
+    force_regenerate: bool = False,
+) -> SessionBatch:
+    """Create every session of a batch in a single transaction.
+
+    The transaction is committed before returning so the scheduler never picks
+    up a session that is not yet visible to the workflow's own DB session.
+    """
+    if len(items) > settings.batch_max_sessions:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"A batch may contain at most {settings.batch_max_sessions} sessions",
+        )
+
+    batch = await session_repository.create_batch(db_session, session_ids=[], created_by=created_by)
+    session_ids = []
+    for item in items:
+        session = await create_session(
+            db_session,
+            document_ids=item["document_ids"],
+            config={**config, **item.get("config", {}), "batch_id": batch.id},
+            created_by=created_by,
+            force_regenerate=force_regenerate,
+        )
+        session_ids.append(session.id)
+
+    batch.session_ids = session_ids
+    await db_session.commit()
+    return batch
+
+
+async def get_batch_progress(db_session: AsyncSession, batch_id: str) -> dict[str, Any]:
+    """Aggregate status and progress of the sessions in a batch."""
+    batch = await session_repository.get_batch(db_session, batch_id)
+    if batch is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Batch not found")
+
+    sessions = await session_repository.list_sessions_by_ids(db_session, batch.session_ids)
+    status_counts: dict[str, int] = {}
+    for session in sessions:
+        status_counts[session.status.value] = status_counts.get(session.status.value, 0) + 1
+    finished = sum(1 for session in sessions if session.status in _TERMINAL_STATUSES)
+    progress = (
+        sum(1.0 if session.status in _TERMINAL_STATUSES else session.progress for session in sessions)
+        / len(sessions)
+        if sessions
+        else 0.0
+    )
+    return {
+        "batch_id": batch.id,
+        "total": len(sessions),
+        "status_counts": status_counts,
+        "finished": finished,
+        "progress": round(progress, 4),
+        "created_at": batch.created_at,
+        "sessions": sessions,
+    }
+
+
 async def get_session(db_session: AsyncSession, session_id: str) -> Session:
     session = await session_repository.get_session(db_session, session_id)
     if session is None:
@@ -65,6 +145,7 @@ async def advance_session(
     db_session: AsyncSession,
     *,
     session_id: str,
+    stage: str,
     decision: str,
     comment: str | None,
 ) -> Session:
@@ -86,7 +167,59 @@ async def advance_session(
     )
 
     confirmations = list(session.config.get("confirmations", []))
-    confirmations.append({"decision": decision, "comment": comment})
+    confirmations.append({"stage": stage, "decision": decision, "comment": comment})
     session.config["confirmations"] = confirmations
     await db_session.flush()
+
+    rejected = decision.strip().lower() in {"reject", "rejected"}
+    await session_events.publish_confirmation(
+        session_id,
+        {
+            "stage": stage,
+            "confirmed": not rejected,
+            "rejected": rejected,
+            "comment": comment,
+        },
+    )
+    return session
+
+
+async def cancel_session(db_session: AsyncSession, *, session_id: str) -> Session:
+    """Stop a running workflow and mark the session as cancelled.
+
+    Cancelled sessions are stored as ``failed`` with ``config["cancelled"]`` set,
+    so they are neither resumed on restart nor reported as completed.
+    """
+    session = await session_repository.get_session(db_session, session_id)
+    if session is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    if session.status in _TERMINAL_STATUSES:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Session already finished")
+
+    await workflow.cancel(session_id)
+
+    await db_session.refresh(session)
+    await session_repository.update_session_status(
+        db_session,
+        session_id=session_id,
+        from_status=None,
+        to_status=SessionStatus.failed,
+    )
+    session.config = {**session.config, "cancelled": True}
+    await db_session.flush()
+
+    event = {
+        "type": "system_message",
+        "sender": "系统",
+        "stage": "system",
+        "content": "分析已取消",
+        "progress": session.progress,
+        "timestamp": time.time(),
+    }
+    await session_events.append_event(session_id, event)
+    await session_events.set_status(
+        session_id,
+        {"stage": "system", "progress": session.progress, "status": SessionStatus.failed.value},
+    )
+    await manager.broadcast(session_id, event)
     return session
@@ -0,0 +1,169 @@
+"""Lightweight span tracing for workflow stages and their sub-steps."""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Any, Callable, Iterator, TypeVar
+from uuid import uuid4
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds of the latency buckets in milliseconds
+LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000)
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: str | None
+    started_at: float
+    duration_ms: float | None = None
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+class SessionTrace:
+    """Collect the spans of one session workflow execution."""
+
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self._spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def export(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [asdict(span) for span in self._spans]
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.count += 1
+        self.total += value_ms
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value_ms <= bound:
+                self.buckets[index] += 1
+
+
+_histograms: dict[tuple[str, str], _Histogram] = defaultdict(_Histogram)
+_histogram_lock = threading.Lock()
+
+_current_trace: contextvars.ContextVar[SessionTrace | None] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+@contextmanager
+def session_trace(session_id: str) -> Iterator[SessionTrace]:
+    """Activate span collection for a session workflow."""
+    trace = SessionTrace(session_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> SessionTrace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Time a block as a child of the current span.
+
+    Works in synchronous and asynchronous code; exceptions are recorded on the
+    span and re-raised.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        span_id=uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        started_at=time.time(),
+        attributes={k: v for k, v in attributes.items() if v is not None},
+    )
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _current_span.reset(token)
+        trace.add(current)
+        _observe(current)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorate a synchronous function so every call is recorded as a span."""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def annotate(**attributes: Any) -> None:
+    """Attach attributes to the innermost active span, if any."""
+    current = _current_span.get()
+    if current is None:
+        return
+    current.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+
+def _observe(current: Span) -> None:
+    stage = str(current.attributes.get("stage", ""))
+    with _histogram_lock:
+        _histograms[(current.name, stage)].observe(current.duration_ms or 0.0)
+        queue_wait = current.attributes.get("queue_wait_ms")
+        if isinstance(queue_wait, (int, float)):
+            _histograms[(f"{current.name}.queue_wait", stage)].observe(float(queue_wait))
+
+
+def render_metrics() -> str:
+    """Render span latency histograms in the Prometheus text exposition format."""
+    lines = [
+        "# HELP workflow_span_duration_ms Duration of workflow spans in milliseconds.",
+        "# TYPE workflow_span_duration_ms histogram",
+    ]
+    with _histogram_lock:
+        items = sorted(_histograms.items())
+        for (name, stage), histogram in items:
+            labels = f'span="{name}",stage="{stage}"'
+            for bound, count in zip(LATENCY_BUCKETS_MS, histogram.buckets):
+                lines.append(f'workflow_span_duration_ms_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'workflow_span_duration_ms_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"workflow_span_duration_ms_sum{{{labels}}} {histogram.total:.3f}")
+            lines.append(f"workflow_span_duration_ms_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
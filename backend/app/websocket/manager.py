@@ -3,30 +3,68 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import logging
+import os
 from collections import defaultdict
 from typing import Dict, Set
+from uuid import uuid4
 
 from fastapi import WebSocket
+from redis import RedisError
+
+from app.cache.redis_client import redis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _broadcast_channel(session_id: str) -> str:
+    return f"session:{session_id}:broadcast"
 
 
 class ConnectionManager:
     def __init__(self) -> None:
         self._connections: Dict[str, Set[WebSocket]] = defaultdict(set)
         self._lock = asyncio.Lock()
+        # 队列模式下工作流运行在独立 worker 进程，事件经 Redis pub/sub 转发到持有连接的 API 进程
+        self._origin = f"{os.getpid()}:{uuid4().hex[:8]}"
+        self._relays: Dict[str, asyncio.Task] = {}
+
+    @property
+    def _relay_enabled(self) -> bool:
+        return settings.workflow_mode == "queue" and redis is not None and hasattr(redis, "pubsub")
 
     async def connect(self, session_id: str, websocket: WebSocket) -> None:
         async with self._lock:
             self._connections[session_id].add(websocket)
+            if self._relay_enabled and session_id not in self._relays:
+                self._relays[session_id] = asyncio.create_task(self._relay(session_id))
 
     async def disconnect(self, session_id: str, websocket: WebSocket) -> None:
         async with self._lock:
             websockets = self._connections.get(session_id)
             if websockets and websocket in websockets:
                 websockets.remove(websocket)
-            if websockets and not websockets:
+            if websockets is not None and not websockets:
                 self._connections.pop(session_id, None)
+                relay = self._relays.pop(session_id, None)
+                if relay is not None:
+                    relay.cancel()
 
     async def broadcast(self, session_id: str, message: dict) -> None:
+        await self._send_local(session_id, message)
+
+        if self._relay_enabled:
+            try:
+                await redis.publish(
+                    _broadcast_channel(session_id),
+                    json.dumps({"origin": self._origin, "message": message}),
+                )
+            except RedisError as exc:  # pragma: no cover - relay is best effort
+                logger.warning("Failed to relay broadcast for session %s: %s", session_id, exc)
+
+    async def _send_local(self, session_id: str, message: dict) -> None:
         async with self._lock:
             targets = list(self._connections.get(session_id, set()))
 
@@ -44,6 +82,25 @@ class ConnectionManager:
                 for websocket in disconnected:
                     self._connections.get(session_id, set()).discard(websocket)
 
+    async def _relay(self, session_id: str) -> None:
+        """Forward broadcasts published by other processes to local connections."""
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(_broadcast_channel(session_id))
+            async for item in pubsub.listen():
+                if item.get("type") != "message":
+                    continue
+                envelope = json.loads(item["data"])
+                if envelope.get("origin") == self._origin:
+                    continue
+                await self._send_local(session_id, envelope["message"])
+        except RedisError as exc:  # pragma: no cover - connection dropped
+            logger.warning("Broadcast relay for session %s stopped: %s", session_id, exc)
+        finally:
+            try:
+                await pubsub.reset()
+            except RedisError:  # pragma: no cover - best effort cleanup
+                pass
 
-manager = ConnectionManager()
 
+manager = ConnectionManager()
@@ -0,0 +1,146 @@
+"""Workflow worker consuming the Redis job queue; run with ``python -m app.worker``."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+from uuid import uuid4
+
+from app.config import settings
+from app.db import AsyncSessionLocal, init_models, session_repository
+from app.llm import client_pool, vision_engine
+from app.orchestrator import job_queue
+from app.orchestrator.workflow import workflow
+from app.utils.logger import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowWorker:
+    """Pull session jobs from the queue and run them under a lease."""
+
+    def __init__(self, concurrency: int) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._concurrency = concurrency
+        self._stopping = asyncio.Event()
+        self._reaper = job_queue.LeaseReaper()
+        self._jobs: dict[str, asyncio.Task] = {}
+        self._cancelled: set[str] = set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        workflow.begin_drain()
+
+    async def run(self) -> None:
+        logger.info("Worker %s started with concurrency %s", self.worker_id, self._concurrency)
+        await asyncio.gather(
+            self._reap_loop(),
+            self._cancel_loop(),
+            *(self._consume_loop() for _ in range(self._concurrency)),
+        )
+        logger.info("Worker %s stopped", self.worker_id)
+
+    async def _consume_loop(self) -> None:
+        while not self._stopping.is_set():
+            session_id = await job_queue.claim(self.worker_id, timeout=1)
+            if session_id is None:
+                continue
+            await self._process(session_id)
+
+    async def _process(self, session_id: str) -> None:
+        async with AsyncSessionLocal() as db_session:
+            session = await session_repository.get_session(db_session, session_id)
+        if session is None or not session_repository.is_resumable(session):
+            # 租约回收或崩溃后重复投递的任务：会话已结束、已取消或已删除，直接确认完成
+            logger.info("Skipping job for session %s, which has nothing left to run", session_id)
+            await job_queue.complete(session_id)
+            return
+        job = asyncio.create_task(workflow.run(session_id))
+        self._jobs[session_id] = job
+        heartbeat = asyncio.create_task(self._heartbeat(session_id, job))
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            await asyncio.wait({job, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if not job.done():
+                # 进程退出时等待当前阶段完成，超时后中断任务
+                done, _ = await asyncio.wait({job}, timeout=settings.shutdown_drain_timeout)
+                if not done:
+                    job.cancel()
+                    await asyncio.gather(job, return_exceptions=True)
+            if session_id in self._cancelled:
+                # 用户主动取消的会话不再交还队列
+                await job_queue.complete(session_id)
+                return
+            if job.cancelled() and not self._stopping.is_set():
+                # 租约已丢失，任务由其他 worker 接管，不能再移除其队列记录
+                return
+            if job.cancelled() or job.result() is False:
+                # 未完成的任务交还队列，由其他 worker 从检查点继续
+                await job_queue.release(session_id)
+                return
+            await job_queue.complete(session_id)
+        finally:
+            heartbeat.cancel()
+            stopping.cancel()
+            self._jobs.pop(session_id, None)
+            self._cancelled.discard(session_id)
+
+    async def _heartbeat(self, session_id: str, job: asyncio.Task) -> None:
+        while not job.done():
+            await asyncio.sleep(settings.workflow_heartbeat_interval)
+            if not await job_queue.heartbeat(session_id, self.worker_id):
+                logger.warning("Lease for session %s was lost, abandoning job", session_id)
+                job.cancel()
+                return
+
+    async def _cancel_loop(self) -> None:
+        pubsub = await job_queue.subscribe_cancellations()
+        try:
+            while not self._stopping.is_set():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                session_id = message["data"]
+                job = self._jobs.get(session_id)
+                if job is not None and not job.done():
+                    logger.info("Cancelling workflow for session %s on user request", session_id)
+                    self._cancelled.add(session_id)
+                    job.cancel()
+        finally:
+            await pubsub.reset()
+
+    async def _reap_loop(self) -> None:
+        while not self._stopping.is_set():
+            await self._reaper.sweep()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.workflow_lease_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+
+async def main() -> None:
+    configure_logging("DEBUG" if settings.debug else "INFO")
+    if not job_queue.is_available():
+        raise SystemExit("Workflow worker requires a Redis backend (REDIS_URL)")
+
+    _ = settings.resolved_upload_dir
+    await init_models()
+    await client_pool.warm_up()
+    await vision_engine.start()
+
+    worker = WorkflowWorker(settings.worker_concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await client_pool.close_all()
+        await vision_engine.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Share one event loop across tests; the module-level Redis client is bound to it."""
+
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def create_session():
+    """Factory that stores an empty analysis session and returns its id."""
+
+    # 延迟导入：各测试模块需先设置 REDIS_URL / LLM_MODE 再加载应用配置
+    from app.db import AsyncSessionLocal, init_models, session_repository
+
+    async def _create(status=None) -> str:
+        await init_models()
+        async with AsyncSessionLocal() as db_session:
+            session = await session_repository.create_session(db_session, document_ids=[], config={})
+            if status is not None:
+                session.status = status
+            await db_session.commit()
+            return session.id
+
+    return _create
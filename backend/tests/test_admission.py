@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.orchestrator.admission import AdmissionController  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_queued_tenants_are_served_round_robin():
+    controller = AdmissionController(max_total=1, max_per_model=1, max_per_tenant=1)
+    order: list[str] = []
+    positions: dict[str, list[int]] = {}
+    release_first = asyncio.Event()
+
+    async def call(name: str, tenant: str, hold: asyncio.Event | None = None):
+        async def report(position: int) -> None:
+            positions.setdefault(name, []).append(position)
+
+        async with controller.slot(model="qwen", tenant=tenant, on_position=report):
+            order.append(name)
+            if hold is not None:
+                await hold.wait()
+
+    first = asyncio.create_task(call("heavy-1", "heavy", release_first))
+    await asyncio.sleep(0)
+    # heavy 租户积压 3 个请求后，light 租户才到达
+    waiting = [asyncio.create_task(call(f"heavy-{i}", "heavy")) for i in (2, 3, 4)]
+    await asyncio.sleep(0)
+    waiting.append(asyncio.create_task(call("light-1", "light")))
+    await asyncio.sleep(0.01)
+
+    assert controller.queued == 4
+    assert positions["light-1"][-1] == 2
+
+    release_first.set()
+    await asyncio.gather(first, *waiting)
+
+    assert order == ["heavy-1", "heavy-2", "light-1", "heavy-3", "heavy-4"]
+    assert positions["light-1"][-1] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    controller = AdmissionController(max_total=4, max_per_model=4, max_per_tenant=1)
+    hold = asyncio.Event()
+
+    async def call():
+        async with controller.slot(model="qwen", tenant="t1"):
+            await hold.wait()
+
+    running = asyncio.create_task(call())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(call())
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+    assert controller.queued == 0
+
+    hold.set()
+    await running
+    async with controller.slot(model="qwen", tenant="t1") as waited:
+        assert waited < 0.1
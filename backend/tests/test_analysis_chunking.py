@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.llm.autogen_runner import merge_analysis_payloads  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+from app.parsers.chunking import estimate_tokens, split_documents  # noqa: E402
+
+
+def test_chunks_stay_within_budget_and_repeat_headers():
+    text = "\n\n".join(f"第{i}条需求：设备登录需要校验密码强度。" * 20 for i in range(30))
+    chunks = split_documents([("=== 文档 1: 需求.md (text) ===", text), ("=== 文档 2: 附录 ===", "短")], 800)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 800 for chunk in chunks)
+    assert chunks[0].startswith("=== 文档 1")
+    assert chunks[1].startswith("=== 文档 1: 需求.md (text) ===（续）")
+    assert "=== 文档 2: 附录 ===" in chunks[-1]
+
+
+def test_small_documents_share_one_chunk():
+    chunks = split_documents([("=== 文档 1 ===", "登录"), ("=== 文档 2 ===", "注册")], 6000)
+    assert len(chunks) == 1
+
+
+def test_merge_combines_modules_by_name_and_deduplicates():
+    merged = merge_analysis_payloads(
+        [
+            {
+                "modules": [{"name": "设备登录", "scenarios": [{"description": "密码登录"}], "rules": []}],
+                "risks": [{"description": "弱口令"}],
+            },
+            {
+                "modules": [
+                    {"name": "设备登录 ", "scenarios": [{"description": "密码登录"}, {"description": "扫码登录"}]},
+                    {"name": "网络设置", "rules": [{"description": "支持 DHCP"}]},
+                ],
+                "risks": [{"description": "弱口令"}],
+            },
+        ]
+    )
+
+    assert [module["name"] for module in merged["modules"]] == ["设备登录", "网络设置"]
+    assert [item["description"] for item in merged["modules"][0]["scenarios"]] == ["密码登录", "扫码登录"]
+    assert merged["risks"] == [{"description": "弱口令"}]
+
+
+@pytest.mark.asyncio
+async def test_large_documents_are_analysed_in_parallel_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_multimodal_enabled", False)
+    monkeypatch.setattr(settings, "analysis_chunk_tokens", 600)
+    content = "\n\n".join(f"模块{i}：需求说明" * 40 for i in range(6))
+    calls = []
+
+    async def _call_agent(stage, agent_type, func, chunk, index, total, on_chunk):
+        calls.append((index, total))
+        return {"modules": [{"name": f"模块{index}", "scenarios": [], "rules": []}], "risks": []}, ""
+
+    executor = SessionWorkflowExecution(session_id="chunk-session")
+    executor._call_agent = _call_agent
+    payload, content = await executor._analyze_requirements(
+        [{"name": "需求.md", "type": "text", "content": content}]
+    )
+
+    total = calls[0][1]
+    assert total > 1
+    assert sorted(index for index, _ in calls) == list(range(1, total + 1))
+    assert [module["name"] for module in payload["modules"]] == [f"模块{i}" for i in range(1, total + 1)]
+    assert '"modules"' in content
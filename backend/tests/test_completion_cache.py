@@ -0,0 +1,98 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache import completion_cache  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.llm import autogen_runner, client_pool  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    completion_cache.reset()
+    yield
+    completion_cache.reset()
+
+
+class _FakeStream:
+    def __init__(self, text):
+        self.response = SimpleNamespace(aclose=self._aclose)
+        self._text = text
+
+    async def _aclose(self):
+        return None
+
+    async def __aiter__(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self._text))])
+
+
+def test_memory_tier_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(settings, "completion_cache_max_entries", 2)
+    lru = completion_cache._LRU()
+    lru.put("a", "1", ttl=60)
+    lru.put("b", "2", ttl=60)
+    assert lru.get("a") == "1"
+    lru.put("c", "3", ttl=60)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == "1"
+    assert lru.get("c") == "3"
+
+    lru.put("d", "4", ttl=-1)
+    assert lru.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_identical_review_prompt_is_served_from_cache(monkeypatch):
+    calls: list[dict] = []
+
+    async def _create(**kwargs):
+        calls.append(kwargs)
+        return _FakeStream("## 评审摘要\n覆盖完整")
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+    monkeypatch.setattr(client_pool, "get_client", lambda base_url, api_key: fake_client)
+
+    first = await autogen_runner.run_quality_review("| TC-1 | 登录 |")
+    chunks: list[str] = []
+    second = await autogen_runner.run_quality_review("| TC-1 | 登录 |", chunks.append)
+
+    assert len(calls) == 1
+    assert first == second
+    # 命中缓存时流式回调仍收到完整内容
+    assert chunks == ["## 评审摘要\n覆盖完整"]
+
+    # 进程内缓存丢失（如重启）后由 Redis 提供
+    completion_cache._memory.clear()
+    await autogen_runner.run_quality_review("| TC-1 | 登录 |")
+    assert len(calls) == 1
+
+    await autogen_runner.run_quality_review("| TC-2 | 注册 |")
+    assert len(calls) == 2
+
+    stats = completion_cache.stats()["review"]
+    assert (stats["memory_hit"], stats["redis_hit"], stats["miss"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+    assert 'stage="review",result="miss"} 2' in completion_cache.render_metrics()
+
+
+@pytest.mark.asyncio
+async def test_bypass_skips_lookup_but_refreshes_cached_output(monkeypatch):
+    replies = iter(["## 评审摘要\n旧结论", "## 评审摘要\n新结论"])
+
+    async def _create(**kwargs):
+        return _FakeStream(next(replies))
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+    monkeypatch.setattr(client_pool, "get_client", lambda base_url, api_key: fake_client)
+
+    assert (await autogen_runner.run_quality_review("| TC-9 | 找回密码 |"))[1] == "## 评审摘要\n旧结论"
+    with autogen_runner.bypass_completion_cache():
+        assert (await autogen_runner.run_quality_review("| TC-9 | 找回密码 |"))[1] == "## 评审摘要\n新结论"
+
+    # 强制重新生成的输出覆盖了缓存
+    assert (await autogen_runner.run_quality_review("| TC-9 | 找回密码 |"))[1] == "## 评审摘要\n新结论"
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.llm import autogen_runner, client_pool, hedging  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _FakeStream:
+    def __init__(self, chunks, first_token_delay=0.0):
+        self.response = _FakeResponse()
+        self._chunks = chunks
+        self._delay = first_token_delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self._delay)
+        for text in self._chunks:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_base_url", "https://backup.example/v1")
+    monkeypatch.setattr(settings, "llm_hedge_delay_ms", 50)
+    hedging.endpoint_latency.reset()
+    streams: dict[str, object] = {}
+
+    def _get_client(base_url, api_key):
+        async def _create(**kwargs):
+            stream = streams[base_url]
+            if isinstance(stream, Exception):
+                raise stream
+            return stream
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+    monkeypatch.setattr(client_pool, "get_client", _get_client)
+    yield streams
+    hedging.endpoint_latency.reset()
+
+
+def test_hedge_delay_uses_percentile_of_recent_latency(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_delay_ms", 3000)
+    monkeypatch.setattr(settings, "llm_hedge_percentile", 90)
+    config = {"model": "qwen-plus", "base_url": "https://primary.example/v1"}
+    hedging.endpoint_latency.reset()
+
+    assert hedging.hedge_delay(config) == 3.0
+    for index in range(1, 101):
+        hedging.endpoint_latency.observe(hedging.endpoint_key(config), index / 100)
+    assert hedging.hedge_delay(config) == pytest.approx(0.9)
+    hedging.endpoint_latency.reset()
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_cancelled(endpoints):
+    primary_url = autogen_runner.resolve_agent_config("test")["base_url"]
+    slow = _FakeStream(["主端点"], first_token_delay=5)
+    fast = _FakeStream(["备用", "端点"])
+    endpoints[primary_url] = slow
+    endpoints["https://backup.example/v1"] = fast
+    chunks: list[str] = []
+
+    result = await asyncio.wait_for(
+        autogen_runner._generate_streaming("系统", "生成用例", agent_type="test", on_chunk=chunks.append),
+        timeout=2,
+    )
+
+    assert result == "备用端点"
+    assert chunks == ["备用", "端点"]
+    assert slow.response.closed and fast.response.closed
+    # 被取消的主请求按截尾样本记录，不低于对冲延迟
+    primary_samples = hedging.endpoint_latency._samples[
+        hedging.endpoint_key(autogen_runner.resolve_agent_config("test"))
+    ]
+    assert list(primary_samples) and min(primary_samples) >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_primary_failure_fails_over_immediately(endpoints, monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_delay_ms", 10_000)
+    primary_url = autogen_runner.resolve_agent_config("review")["base_url"]
+    endpoints[primary_url] = RuntimeError("503 Service Unavailable")
+    endpoints["https://backup.example/v1"] = _FakeStream(["评审结论"])
+
+    result = await asyncio.wait_for(
+        autogen_runner._generate_streaming("系统", "评审", agent_type="review"), timeout=2
+    )
+
+    assert result == "评审结论"
+
+
+@pytest.mark.asyncio
+async def test_hedging_disabled_sends_single_request(endpoints, monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+    primary_url = autogen_runner.resolve_agent_config("test")["base_url"]
+    endpoints[primary_url] = RuntimeError("503 Service Unavailable")
+    endpoints["https://backup.example/v1"] = _FakeStream(["不应使用"])
+
+    with pytest.raises(RuntimeError):
+        await autogen_runner._generate_streaming("系统", "生成用例", agent_type="test")
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache.redis_client import redis  # noqa: E402
+from app.db import AsyncSessionLocal, init_models, session_repository  # noqa: E402
+from app.models.session import SessionStatus  # noqa: E402
+from app.orchestrator import job_queue  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+from app.worker import WorkflowWorker  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_requeued_for_another_worker():
+    await job_queue.enqueue("job-session")
+
+    assert await job_queue.claim("worker-a", timeout=0.1) == "job-session"
+    assert await job_queue.heartbeat("job-session", "worker-a")
+    assert await job_queue.claim("worker-b", timeout=0.1) is None
+
+    # 模拟 worker-a 崩溃：租约过期
+    await redis.delete("workflow:jobs:lease:job-session")
+    reaper = job_queue.LeaseReaper()
+    assert await reaper.sweep() == []  # 首次发现仅标记为可疑
+    assert await reaper.sweep() == ["job-session"]
+
+    assert await job_queue.claim("worker-b", timeout=0.1) == "job-session"
+    assert not await job_queue.heartbeat("job-session", "worker-a")
+
+    await job_queue.complete("job-session")
+    assert await redis.lrange("workflow:jobs:processing", 0, -1) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, config", [(SessionStatus.completed, {}), (SessionStatus.failed, {"cancelled": True})])
+async def test_redelivered_job_of_finished_session_is_not_run_again(monkeypatch, status, config):
+    """租约回收后重复投递的任务不会重新执行已完成或已取消的会话"""
+    await init_models()
+    async with AsyncSessionLocal() as db_session:
+        session = await session_repository.create_session(db_session, document_ids=[], config=config)
+        session.status = status
+        await db_session.commit()
+        session_id = session.id
+
+    executed: list[str] = []
+
+    async def _execute(self):
+        executed.append(self.session_id)
+
+    monkeypatch.setattr(SessionWorkflowExecution, "execute", _execute)
+    await job_queue.enqueue(session_id)
+    assert await job_queue.claim("worker-a", timeout=0.1) == session_id
+
+    await WorkflowWorker(concurrency=1)._process(session_id)
+
+    assert executed == []
+    assert session_id not in await redis.lrange("workflow:jobs:processing", 0, -1)
+    async with AsyncSessionLocal() as db_session:
+        assert (await session_repository.get_session(db_session, session_id)).status == status
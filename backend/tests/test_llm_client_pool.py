@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.llm import autogen_runner, client_pool  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator.admission import admission_controller  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _FakeStream:
+    def __init__(self, chunks, block_after=None):
+        self.response = _FakeResponse()
+        self._chunks = chunks
+        self._block_after = block_after
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, text in enumerate(self._chunks):
+            if index == self._block_after:
+                await asyncio.Event().wait()
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _fake_client(stream):
+    async def _create(**kwargs):
+        return stream
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+
+@pytest.mark.asyncio
+async def test_clients_are_shared_per_endpoint():
+    first = client_pool.get_client("https://llm.example/v1", "key-a")
+    assert client_pool.get_client("https://llm.example/v1", "key-a") is first
+    assert client_pool.get_client("https://llm.example/v1", "key-b") is not first
+    await client_pool.close_all()
+    assert client_pool.get_client("https://llm.example/v1", "key-a") is not first
+    await client_pool.close_all()
+
+
+@pytest.mark.asyncio
+async def test_stage_runs_on_event_loop_and_cancel_closes_stream(monkeypatch):
+    stream = _FakeStream(["## 登录", "\n| TC-1 |"], block_after=1)
+    threads: list[int] = []
+    chunks: list[str] = []
+
+    def _get_client(base_url, api_key):
+        threads.append(threading.get_ident())
+        return _fake_client(stream)
+
+    monkeypatch.setattr(client_pool, "get_client", _get_client)
+    executor = SessionWorkflowExecution(session_id="pooled-call")
+    task = asyncio.create_task(
+        executor._call_agent(
+            AgentStage.review, "review", autogen_runner.run_quality_review, "cases", chunks.append
+        )
+    )
+    await asyncio.sleep(0.05)
+    assert chunks == ["## 登录"]
+    assert threads == [threading.get_ident()]
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert stream.response.closed
+    assert admission_controller._active_total == 0
@@ -0,0 +1,69 @@
+import os
+import random
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.orchestrator.workflow import _parse_markdown_test_cases  # noqa: E402
+from app.parsers.markdown_cases import MarkdownCaseParser  # noqa: E402
+
+SAMPLE = """# 测试用例
+
+说明文字
+
+## 登录模块
+
+| 用例ID | 标题 | 前置条件 | 测试步骤 | 预期结果 | 优先级 |
+|--------|------|----------|----------|----------|--------|
+| TC-001 | 正常登录 | 已注册 | 1. 输入账号<br>2. 点击登录 | 登录成功 | p0 |
+| - | 密码错误 | - | 输入错误密码 | 提示错误 | P1 |
+| 仅一列 |
+| TC-003 | 锁定账号 | 连续失败 | 重试5次 | 账号锁定 | P2 |
+
+### 备注
+| TC-999 | 不应解析 | - | - | - | P3 |
+
+##
+  支付 | 用例ID 标题
+|---|
+| PAY-1 | 余额支付 | 余额充足 | 支付 | 成功 | P0 |
+
+##无空格标题
+| 用例ID | 标题 |
+|---|---|
+| X-1 | 行 |
+## 空模块
+
+没有表格
+## 注册
+| 用例ID | 标题 | 前置条件 | 测试步骤 | 预期结果 | 优先级 |
+| --- | --- | --- | --- | --- | --- |
+| REG-1 | 手机号注册 | 无 | 填写手机号 | 注册成功 | P0 |"""
+
+
+def test_streamed_parse_matches_batch_parse_for_any_chunking():
+    """逐块解析与整体解析结果一致，且每行在完成时立即产出"""
+    expected = _parse_markdown_test_cases(SAMPLE)
+    rng = random.Random(7)
+
+    for _ in range(50):
+        parser = MarkdownCaseParser()
+        rows = []
+        position = 0
+        while position < len(SAMPLE):
+            size = rng.randint(1, 40)
+            rows.extend(parser.feed(SAMPLE[position:position + size]))
+            position += size
+        rows.extend(parser.close())
+
+        assert parser.result() == expected
+        assert parser.text == SAMPLE
+        assert [case for _, case in rows] == [
+            case for module in expected["modules"] for case in module["cases"]
+        ]
+
+
+def test_row_is_emitted_as_soon_as_its_line_completes():
+    parser = MarkdownCaseParser()
+    assert parser.feed("## 登录\n| 用例ID | 标题 |\n|---|---|\n| TC-1 | 正常") == []
+    assert parser.feed("登录 |\n") == [("登录", {"id": "TC-1", "title": "正常登录"})]
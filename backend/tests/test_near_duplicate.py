@@ -0,0 +1,95 @@
+import io
+import itertools
+import os
+
+import pytest
+from fastapi import UploadFile
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.db import AsyncSessionLocal, init_models  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+from app.parsers import minhash  # noqa: E402
+from app.services import documents as document_service  # noqa: E402
+
+
+def _spec(version: str, changed: int | None = None) -> str:
+    paragraphs = [
+        f"第{i}条：用户在设备管理页面配置第{i}项参数，保存后立即生效并记录操作日志，版本{version if i == changed else '一'}。"
+        for i in range(80)
+    ]
+    return "\n\n".join(paragraphs)
+
+
+def test_signature_similarity_tracks_edits():
+    original = minhash.signature(_spec("一"))
+    edited = minhash.signature(_spec("二", changed=40))
+    unrelated = minhash.signature("网络模块支持 IPv6 与 DHCP，断线后自动重连。" * 40)
+
+    assert minhash.similarity(original, edited) >= 0.9
+    assert minhash.similarity(original, unrelated) < 0.3
+    assert set(minhash.band_keys(original)) & set(minhash.band_keys(edited))
+    assert minhash.signature("短") is None
+
+
+@pytest.mark.asyncio
+async def test_upload_links_near_duplicate_document():
+    await init_models()
+    marker = os.urandom(4).hex()
+
+    async def _upload(name: str, text: str) -> dict:
+        async with AsyncSessionLocal() as db_session:
+            result = await document_service.handle_upload(
+                db_session,
+                file=UploadFile(file=io.BytesIO(text.encode("utf-8")), filename=name),
+            )
+            await db_session.commit()
+            return result
+
+    first = await _upload("spec_v1.md", f"{marker}\n\n{_spec('一')}")
+    second = await _upload("spec_v2.md", f"{marker}\n\n{_spec('二', changed=40)}")
+
+    assert first.get("near_duplicate_of") is None
+    assert second["near_duplicate_of"] == first["document"].id
+    assert second["similarity"] >= settings.near_duplicate_threshold
+
+
+@pytest.mark.asyncio
+async def test_unchanged_chunks_reuse_analysis_of_source_document(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_multimodal_enabled", False)
+    monkeypatch.setattr(settings, "analysis_chunk_tokens", 400)
+    calls: list[int] = []
+    names = itertools.count(1)
+
+    async def _call_agent(stage, agent_type, func, chunk, index, total, on_chunk):
+        calls.append(index)
+        return {"modules": [{"name": f"模块{next(names)}", "scenarios": [], "rules": []}], "risks": []}, ""
+
+    async def _analyze(document_id: str, sources: list[str], name: str, content: str, force: bool = False):
+        executor = SessionWorkflowExecution(session_id=f"dedupe-{document_id}")
+        executor._call_agent = _call_agent
+        executor._force_regenerate = force
+        executor._artifact_owners = [document_id]
+        executor._artifact_sources = [document_id, *sources]
+        return await executor._analyze_requirements([{"name": name, "type": "text", "content": content}])
+
+    marker = os.urandom(4).hex()
+    await _analyze(f"a-{marker}", [], "spec_v1.md", f"{marker}\n\n{_spec('一')}")
+    first_calls = len(calls)
+    calls.clear()
+
+    payload, _ = await _analyze(
+        f"b-{marker}", [f"a-{marker}"], "spec_v2.md", f"{marker}\n\n{_spec('二', changed=40)}"
+    )
+
+    # 只有包含修改段落的片段重新分析
+    assert first_calls > 3
+    assert 1 <= len(calls) <= 2
+    assert len(payload["modules"]) == first_calls + len(calls) - 1
+
+    # force_regenerate 时不复用任何片段
+    calls.clear()
+    await _analyze(f"a-{marker}", [], "spec_v1.md", f"{marker}\n\n{_spec('一')}", force=True)
+    assert len(calls) == first_calls
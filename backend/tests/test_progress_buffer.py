@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache import session_events  # noqa: E402
+from app.orchestrator import progress as progress_module  # noqa: E402
+from app.orchestrator.progress import ProgressBuffer  # noqa: E402
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent: list[dict] = []
+
+    async def _broadcast(session_id, message):
+        sent.append(message)
+
+    monkeypatch.setattr(progress_module.manager, "broadcast", _broadcast)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_updates_are_broadcast_at_once_and_persisted_in_one_batch(monkeypatch, broadcasts):
+    appends: list[int] = []
+    original = session_events.append_events
+
+    async def _append_events(session_id, events):
+        appends.append(len(events))
+        await original(session_id, events)
+
+    monkeypatch.setattr(session_events, "append_events", _append_events)
+    buffer = ProgressBuffer("progress-batch", interval=60)
+
+    for progress in (0.1, 0.2, 0.3):
+        await buffer.publish(
+            {"type": "system_message", "progress": progress},
+            {"stage": "system", "progress": progress, "status": "processing"},
+        )
+
+    # 客户端立即收到每条事件，Redis 中尚未写入
+    assert [event["progress"] for event in broadcasts] == [0.1, 0.2, 0.3]
+    assert await session_events.fetch_events("progress-batch") == []
+    assert buffer.pending == 4
+
+    await buffer.close()
+
+    assert appends == [3]
+    assert [event["progress"] for event in await session_events.fetch_events("progress-batch")] == [
+        0.1,
+        0.2,
+        0.3,
+    ]
+    assert (await session_events.get_status("progress-batch"))["progress"] == 0.3
+    assert buffer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_on_interval(broadcasts):
+    buffer = ProgressBuffer("progress-interval", interval=0.01)
+    await buffer.publish({"type": "system_message", "progress": 0.5}, {"progress": 0.5})
+
+    await asyncio.sleep(0.05)
+
+    assert await session_events.fetch_events("progress-interval") == [
+        {"type": "system_message", "progress": 0.5}
+    ]
+    assert await session_events.get_status("progress-interval") == {"progress": 0.5}
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.llm import autogen_runner, client_pool, rate_limiter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_buckets():
+    rate_limiter.reset()
+    yield
+    rate_limiter.reset()
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill(monkeypatch):
+    # 60000 TPM refills 1000 tokens per second
+    monkeypatch.setattr(settings, "llm_rpm_limit", 0)
+    monkeypatch.setattr(settings, "llm_tpm_limit", 60_000)
+
+    assert await rate_limiter.acquire("qwen-plus", "key-a", tokens=60_000) == 0
+    waited = await rate_limiter.acquire("qwen-plus", "key-a", tokens=100)
+    assert 0.05 <= waited < 1
+
+    # Buckets are per (model, api_key)
+    assert await rate_limiter.acquire("qwen-plus", "key-b", tokens=100) == 0
+    assert await rate_limiter.acquire("qwen-max", "key-a", tokens=100) == 0
+
+
+@pytest.mark.asyncio
+async def test_consume_charges_tokens_beyond_estimate(monkeypatch):
+    monkeypatch.setattr(settings, "llm_rpm_limit", 0)
+    monkeypatch.setattr(settings, "llm_tpm_limit", 60_000)
+
+    await rate_limiter.acquire("qwen-plus", "key-a", tokens=59_900)
+    await rate_limiter.consume("qwen-plus", "key-a", 200)
+    waited = await rate_limiter.acquire("qwen-plus", "key-a", tokens=100)
+    assert waited >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_request_bucket_and_disabled_limits(monkeypatch):
+    monkeypatch.setattr(settings, "vl_rpm_limit", 2)
+    monkeypatch.setattr(settings, "vl_tpm_limit", 0)
+
+    await rate_limiter.acquire("qwen3-vl-flash", "key-a", kind="vl")
+    await rate_limiter.acquire("qwen3-vl-flash", "key-a", kind="vl")
+    keys = rate_limiter._bucket_keys("qwen3-vl-flash", "key-a")
+    assert rate_limiter._take_local(keys, (2, 0), 0, False) > 0
+
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    assert await rate_limiter.acquire("qwen3-vl-flash", "key-a", kind="vl") == 0
+
+
+@pytest.mark.asyncio
+async def test_streaming_call_takes_quota_before_request(monkeypatch):
+    calls: list[tuple] = []
+
+    async def _acquire(model, api_key, *, tokens=0, kind="chat"):
+        calls.append(("acquire", model, tokens))
+        return 0.0
+
+    async def _consume(model, api_key, tokens, *, kind="chat"):
+        calls.append(("consume", model, tokens))
+
+    class _Stream:
+        response = SimpleNamespace(aclose=lambda: asyncio.sleep(0))
+
+        def __aiter__(self):
+            return self._iterate()
+
+        async def _iterate(self):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="测试用例"))])
+
+    async def _create(**kwargs):
+        calls.append(("create", kwargs["model"], None))
+        return _Stream()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+    monkeypatch.setattr(client_pool, "get_client", lambda base_url, api_key: client)
+    monkeypatch.setattr(rate_limiter, "acquire", _acquire)
+    monkeypatch.setattr(rate_limiter, "consume", _consume)
+
+    result = await autogen_runner._generate_streaming("系统", "生成用例", agent_type="test")
+
+    model = autogen_runner.resolve_agent_config("test")["model"]
+    assert result == "测试用例"
+    assert [call[0] for call in calls] == ["acquire", "create", "consume"]
+    assert calls[0][1] == model and calls[0][2] > 0
+    assert calls[2][2] == 4
@@ -0,0 +1,88 @@
+import os
+from uuid import uuid4
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache import result_cache  # noqa: E402
+from app.db import AsyncSessionLocal, init_models  # noqa: E402
+from app.db import document_repository, session_repository  # noqa: E402
+from app.models.session import AgentStage, SessionStatus  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+
+def test_cache_key_ignores_document_order_and_volatile_config():
+    key = result_cache.compute_key(["b", "a"], {"mode": "full", "force_regenerate": True})
+
+    assert key == result_cache.compute_key(["a", "b"], {"mode": "full"})
+    assert key != result_cache.compute_key(["a", "b"], {"mode": "quick"})
+    assert key != result_cache.compute_key(["a", "c"], {"mode": "full"})
+
+
+def test_identical_sessions_in_different_batches_share_cache_key():
+    first = result_cache.compute_key(["a"], {"mode": "full", "batch_id": "batch-1"})
+    second = result_cache.compute_key(["a"], {"mode": "full", "batch_id": "batch-2"})
+
+    assert first == second == result_cache.compute_key(["a"], {"mode": "full"})
+    assert first == result_cache.compute_key(["a"], {"mode": "full", "cancelled": True})
+
+
+def test_failed_or_empty_results_are_not_cacheable():
+    cases = {"modules": [{"name": "登录", "cases": [{"id": "TC-1"}]}]}
+
+    assert result_cache.is_cacheable([{"modules": []}, None], cases)
+    assert not result_cache.is_cacheable([{"modules": [], "error": "JSON解析失败"}], cases)
+    assert not result_cache.is_cacheable([], {"modules": [{"name": "登录", "cases": []}]})
+    assert not result_cache.is_cacheable([], {})
+
+
+@pytest.mark.asyncio
+async def test_session_with_same_documents_reuses_stored_result():
+    """相同文档与配置的新会话直接复用历史结果，不再调用智能体"""
+    await init_models()
+    test_cases = {"modules": [{"name": "登录", "cases": [{"id": "TC-1", "title": "正常登录"}]}]}
+
+    async with AsyncSessionLocal() as db_session:
+        document = await document_repository.create_document(
+            db_session,
+            original_name="需求.txt",
+            storage_path="/tmp/missing.txt",
+            checksum=uuid4().hex,
+            size=1,
+        )
+        source = await session_repository.create_session(
+            db_session, document_ids=[document.id], config={"mode": "full"}
+        )
+        await session_repository.add_session_result(
+            db_session,
+            session_id=source.id,
+            summary={"modules": [{"name": "登录"}]},
+            payload=test_cases,
+            metrics={},
+        )
+        target = await session_repository.create_session(
+            db_session, document_ids=[document.id], config={"mode": "full"}
+        )
+        await db_session.commit()
+        cache_key = result_cache.compute_key([document.checksum], {"mode": "full"})
+        source_id, target_id = source.id, target.id
+
+    await result_cache.store(cache_key, session_id=source_id, version=1)
+
+    executor = SessionWorkflowExecution(session_id=target_id)
+
+    async def _fail(*args, **kwargs):
+        raise AssertionError("LLM stages must not run on a cache hit")
+
+    executor._call_agent = _fail
+    await executor.execute()
+
+    async with AsyncSessionLocal() as db_session:
+        session = await session_repository.get_session(db_session, target_id)
+
+    assert session.status == SessionStatus.completed
+    assert session.current_stage == AgentStage.completed
+    assert session.results[0].test_cases == test_cases
+    assert session.results[0].metrics["cached_from"] == {"session_id": source_id, "version": 1}
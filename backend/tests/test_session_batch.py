@@ -0,0 +1,130 @@
+import asyncio
+import os
+from uuid import uuid4
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal, init_models  # noqa: E402
+from app.db import document_repository, session_repository  # noqa: E402
+from app.models.session import SessionStatus  # noqa: E402
+from app.orchestrator.batch import BatchScheduler  # noqa: E402
+from app.services import sessions as session_service  # noqa: E402
+
+
+async def _create_batch(size: int):
+    async with AsyncSessionLocal() as db_session:
+        document = await document_repository.create_document(
+            db_session,
+            original_name="需求.txt",
+            storage_path="/tmp/missing.txt",
+            checksum=uuid4().hex,
+            size=1,
+        )
+        batch = await session_service.create_batch(
+            db_session,
+            items=[{"document_ids": [document.id], "config": {"index": i}} for i in range(size)],
+            config={"mode": "full"},
+            created_by="importer",
+        )
+        return batch.id, list(batch.session_ids)
+
+
+@pytest.mark.asyncio
+async def test_batch_sessions_are_created_together_and_aggregated():
+    await init_models()
+    batch_id, session_ids = await _create_batch(3)
+
+    async with AsyncSessionLocal() as db_session:
+        await session_repository.update_session_status(
+            db_session, session_id=session_ids[0], from_status=None, to_status=SessionStatus.completed
+        )
+        await session_repository.update_session_status(
+            db_session,
+            session_id=session_ids[1],
+            from_status=None,
+            to_status=SessionStatus.processing,
+            progress=0.5,
+        )
+        await db_session.commit()
+
+        progress = await session_service.get_batch_progress(db_session, batch_id)
+
+    assert progress["total"] == 3
+    assert progress["status_counts"] == {"completed": 1, "processing": 1, "created": 1}
+    assert progress["finished"] == 1
+    assert progress["progress"] == 0.5
+    assert [session.id for session in progress["sessions"]] == session_ids
+    assert progress["sessions"][2].config == {"mode": "full", "index": 2, "batch_id": batch_id}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_bounds_active_sessions_and_skips_cancelled():
+    """调度器限制同时执行的批量会话数量，排队期间被取消的会话不再启动"""
+    await init_models()
+    _, session_ids = await _create_batch(4)
+
+    async with AsyncSessionLocal() as db_session:
+        await session_repository.update_session_status(
+            db_session, session_id=session_ids[3], from_status=None, to_status=SessionStatus.failed
+        )
+        await db_session.commit()
+
+    releases: dict[str, asyncio.Event] = {}
+    launched: list[str] = []
+    peak = 0
+
+    async def _launch(session_id: str):
+        nonlocal peak
+        launched.append(session_id)
+        releases[session_id] = asyncio.Event()
+        task = asyncio.create_task(releases[session_id].wait())
+        peak = max(peak, sum(1 for event in releases.values() if not event.is_set()))
+        return task
+
+    scheduler = BatchScheduler(_launch, max_active=2, launch_interval=0)
+    scheduler.submit(session_ids)
+    await asyncio.sleep(0.1)
+    assert launched == session_ids[:2]
+
+    releases[session_ids[0]].set()
+    await asyncio.sleep(0.1)
+    releases[session_ids[1]].set()
+    releases[session_ids[2]].set()
+    await asyncio.sleep(0.1)
+
+    assert launched == session_ids[:3]
+    assert peak == 2
+    assert scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_sessions_awaiting_confirmation_release_their_slot():
+    await init_models()
+    _, session_ids = await _create_batch(2)
+    awaiting: set[str] = set()
+    releases: dict[str, asyncio.Event] = {}
+    launched: list[str] = []
+
+    async def _launch(session_id: str):
+        launched.append(session_id)
+        releases[session_id] = asyncio.Event()
+        return asyncio.create_task(releases[session_id].wait())
+
+    scheduler = BatchScheduler(
+        _launch, max_active=1, launch_interval=0, is_awaiting=lambda session_id: session_id in awaiting
+    )
+    scheduler.submit(session_ids)
+    await asyncio.sleep(0.05)
+    assert launched == session_ids[:1]
+
+    # 第一个会话开始等待用户确认，让出槽位
+    awaiting.add(session_ids[0])
+    scheduler.wake()
+    await asyncio.sleep(0.05)
+
+    assert launched == session_ids
+    for event in releases.values():
+        event.set()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from uuid import uuid4
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal, init_models  # noqa: E402
+from app.db import document_repository, session_repository  # noqa: E402
+from app.models.session import AgentStage, SessionStatus  # noqa: E402
+from app.orchestrator.admission import admission_controller  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution, workflow  # noqa: E402
+from app.services import sessions as session_service  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_cancelling_agent_call_closes_stream_and_frees_slot():
+    """任务取消后流式调用随之取消，准入槽位被释放"""
+    started = asyncio.Event()
+    closed = asyncio.Event()
+
+    async def _stream(payload, on_chunk):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        finally:
+            closed.set()
+
+    executor = SessionWorkflowExecution(session_id="cancel-call")
+    task = asyncio.create_task(
+        executor._call_agent(AgentStage.requirement_analysis, "analysis", _stream, {}, lambda _: None)
+    )
+    await asyncio.wait_for(started.wait(), 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert closed.is_set()
+    assert admission_controller._active_total == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_session_stops_workflow_and_marks_session(monkeypatch):
+    await init_models()
+
+    async def _execute(self):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(SessionWorkflowExecution, "execute", _execute)
+
+    async with AsyncSessionLocal() as db_session:
+        document = await document_repository.create_document(
+            db_session,
+            original_name="需求.txt",
+            storage_path="/tmp/missing.txt",
+            checksum=uuid4().hex,
+            size=1,
+        )
+        session = await session_repository.create_session(
+            db_session, document_ids=[document.id], config={}
+        )
+        await db_session.commit()
+        session_id = session.id
+
+    await workflow.launch(session_id)
+    task = workflow._session_tasks[session_id]
+    await asyncio.sleep(0.01)
+
+    async with AsyncSessionLocal() as db_session:
+        await session_service.cancel_session(db_session, session_id=session_id)
+        await db_session.commit()
+
+    assert task.cancelled()
+    assert session_id not in workflow._session_tasks
+
+    async with AsyncSessionLocal() as db_session:
+        session = await session_repository.get_session(db_session, session_id)
+        assert session.status == SessionStatus.failed
+        assert session.config["cancelled"] is True
+
+        with pytest.raises(Exception) as excinfo:
+            await session_service.cancel_session(db_session, session_id=session_id)
+    assert excinfo.value.status_code == 409
@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache import session_events  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_wait_for_confirmation_wakes_on_publish():
+    session_id = "confirm-wake"
+    await session_events.clear_confirmation(session_id)
+
+    async def confirm_later():
+        await asyncio.sleep(0.05)
+        # 其他阶段的确认不应唤醒当前等待
+        await session_events.publish_confirmation(session_id, {"stage": "review", "confirmed": True})
+        await asyncio.sleep(0.05)
+        await session_events.publish_confirmation(
+            session_id, {"stage": "requirement_analysis", "confirmed": True}
+        )
+
+    publisher = asyncio.create_task(confirm_later())
+    started = asyncio.get_running_loop().time()
+    confirmation = await session_events.wait_for_confirmation(
+        session_id, "requirement_analysis", timeout=5
+    )
+    elapsed = asyncio.get_running_loop().time() - started
+    await publisher
+
+    assert confirmation == {"stage": "requirement_analysis", "confirmed": True}
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+async def test_wait_for_confirmation_returns_stored_confirmation_and_times_out():
+    session_id = "confirm-stored"
+    await session_events.set_confirmation(session_id, {"stage": "review", "rejected": True})
+
+    confirmation = await session_events.wait_for_confirmation(session_id, "review", timeout=1)
+    assert confirmation == {"stage": "review", "rejected": True}
+
+    await session_events.clear_confirmation(session_id)
+    assert await session_events.wait_for_confirmation(session_id, "review", timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_wait_for_confirmation_polls_without_subscription(monkeypatch):
+    """订阅失败时，其他进程写入的确认在轮询间隔内被读取到"""
+    session_id = "confirm-poll"
+    await session_events.clear_confirmation(session_id)
+
+    async def _no_subscription(channel):
+        return None
+
+    monkeypatch.setattr(session_events, "_subscribe", _no_subscription)
+    monkeypatch.setattr(session_events, "_CONFIRMATION_POLL_SECONDS", 0.05)
+
+    async def confirm_elsewhere():
+        await asyncio.sleep(0.1)
+        # 只写入 Redis，不触发本进程的信号，模拟 API 进程中的确认
+        await session_events.set_confirmation(session_id, {"stage": "review", "confirmed": True})
+
+    writer = asyncio.create_task(confirm_elsewhere())
+    confirmation = await asyncio.wait_for(
+        session_events.wait_for_confirmation(session_id, "review", timeout=60), timeout=2
+    )
+    await writer
+
+    assert confirmation == {"stage": "review", "confirmed": True}
+    await session_events.clear_confirmation(session_id)
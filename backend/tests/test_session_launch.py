@@ -0,0 +1,42 @@
+import os
+from uuid import uuid4
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal, document_repository, init_models, session_repository  # noqa: E402
+from app.main import app  # noqa: E402
+from app.orchestrator import workflow  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_session_is_committed_before_it_is_launched(monkeypatch):
+    await init_models()
+    async with AsyncSessionLocal() as db_session:
+        document = await document_repository.create_document(
+            db_session,
+            original_name="需求.txt",
+            storage_path="/tmp/missing.txt",
+            checksum=uuid4().hex,
+            size=1,
+        )
+        await db_session.commit()
+
+    visible: list[bool] = []
+
+    async def _launch(session_id: str):
+        # 模拟 worker 立即取到任务：用独立的数据库会话读取
+        async with AsyncSessionLocal() as other:
+            visible.append(await session_repository.get_session(other, session_id) is not None)
+        return None
+
+    monkeypatch.setattr(workflow, "launch", _launch)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post("/api/sessions", json={"document_ids": [document.id]})
+
+    assert response.status_code == 200, response.text
+    assert visible == [True]
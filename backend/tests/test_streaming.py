@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.cache import session_events  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator import streaming  # noqa: E402
+from app.orchestrator.streaming import StreamCoalescer  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_coalesced_and_snapshot_accumulates(monkeypatch):
+    """大量片段被合并为少量推送，中途加入的客户端可取得累计文本"""
+    broadcasts = []
+
+    async def _broadcast(session_id, message):
+        broadcasts.append(message)
+
+    monkeypatch.setattr(streaming.manager, "broadcast", _broadcast)
+    monkeypatch.setattr(streaming.settings, "stream_flush_interval_ms", 50)
+    monkeypatch.setattr(streaming.settings, "stream_flush_max_chars", 10_000)
+
+    async with StreamCoalescer("stream-session", stage=AgentStage.review, sender="质量评审员") as stream:
+        for _ in range(100):
+            stream.on_chunk("字")
+        await asyncio.sleep(0.07)
+        for _ in range(100):
+            stream.on_chunk("字")
+        await asyncio.sleep(0.07)
+        snapshots = await session_events.fetch_stream_snapshots("stream-session")
+        stream.on_chunk("完")
+
+    deltas = [event for event in broadcasts if "delta" in event]
+    assert 2 <= len(deltas) < 10
+    assert "".join(event["delta"] for event in deltas) == "字" * 200 + "完"
+    assert deltas[-1]["offset"] == 200
+    assert broadcasts[-1]["done"] is True
+    assert snapshots[0]["content"] == "字" * 200
+    assert snapshots[0]["stream_id"] == "review"
+    assert await session_events.fetch_stream_snapshots("stream-session") == []
@@ -0,0 +1,42 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.utils import tracing  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_threads_and_record_errors():
+    """线程中的 span 挂在发起线程的 span 之下，异常写入 span"""
+
+    def _call_model():
+        with tracing.span("llm.request"):
+            tracing.annotate(prompt_chars=12, response_chars=34)
+
+    with tracing.session_trace("trace-session") as trace:
+        with tracing.span("llm.call", stage="review"):
+            tracing.annotate(queue_wait_ms=5.0)
+            await asyncio.to_thread(_call_model)
+        with pytest.raises(ValueError):
+            with tracing.span("markdown.parse_review"):
+                raise ValueError("bad table")
+
+    spans = {span["name"]: span for span in trace.export()}
+    assert spans["llm.request"]["parent_id"] == spans["llm.call"]["span_id"]
+    assert spans["llm.request"]["attributes"] == {"prompt_chars": 12, "response_chars": 34}
+    assert spans["llm.call"]["attributes"]["queue_wait_ms"] == 5.0
+    assert spans["markdown.parse_review"]["error"] == "ValueError: bad table"
+
+    metrics = tracing.render_metrics()
+    assert 'workflow_span_duration_ms_count{span="llm.call",stage="review"}' in metrics
+    assert 'workflow_span_duration_ms_bucket{span="llm.call.queue_wait",stage="review",le="10"}' in metrics
+
+
+def test_spans_are_noops_without_active_trace():
+    with tracing.span("db.commit") as span:
+        tracing.annotate(ignored=True)
+    assert span is None
@@ -1,17 +1,33 @@
 """Test VL model integration for image requirement extraction."""
 
+import os
+
 import pytest
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+_PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82'
+
+
+def _response(status_code, content=None, message=""):
+    response = Mock()
+    response.status_code = status_code
+    response.output.choices = [{"message": {"content": content}}]
+    response.message = message
+    return response
+
 
 def test_vl_client_import():
-    """Test that VL client can be imported."""
-    from app.llm.vision_client import is_vl_available, extract_requirements_from_image
+    """Test that the vision engine can be imported."""
+    from app.llm.vision_engine import analyze, analyze_sync, is_available
 
     # 检查函数是否可导入
-    assert callable(is_vl_available)
-    assert callable(extract_requirements_from_image)
+    assert callable(is_available)
+    assert callable(analyze)
+    assert callable(analyze_sync)
 
 
 def test_vl_config():
@@ -27,108 +43,194 @@ def test_vl_config():
     assert vl_config["model"] == "qwen-vl-max"  # 默认模型
 
 
-@patch('app.llm.vision_client.DASHSCOPE_AVAILABLE', True)
-@patch('app.llm.vision_client.MultiModalConversation')
-def test_extract_requirements_from_image_success(mock_mm_conv):
+@pytest.mark.asyncio
+@patch('app.llm.vision_engine.DASHSCOPE_AVAILABLE', True)
+@patch('app.llm.vision_engine.MultiModalConversation')
+async def test_extract_requirements_from_image_success(mock_mm_conv, tmp_path):
     """Test successful image requirement extraction."""
-    from app.llm.vision_client import extract_requirements_from_image
+    from app.llm.vision_engine import analyze
     from http import HTTPStatus
 
-    # 创建临时测试图片
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-        test_image_path = f.name
-        # 写入一个简单的 1x1 像素 PNG
-        f.write(b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82')
+    test_image_path = tmp_path / "page.png"
+    test_image_path.write_bytes(_PNG)
 
-    try:
-        # Mock 成功响应
-        mock_response = Mock()
-        mock_response.status_code = HTTPStatus.OK
-        mock_response.output.choices = [
-            {"message": {"content": "这是测试需求：用户登录功能"}}
-        ]
-        mock_mm_conv.call.return_value = mock_response
-
-        # 调用提取函数
-        result = extract_requirements_from_image(
-            image_path=test_image_path,
-            api_key="test-api-key",
-            model="qwen-vl-max"
-        )
-
-        # 验证结果
-        assert isinstance(result, str)
-        assert len(result) > 0
-        assert "测试需求" in result
-
-        # 验证 API 被正确调用
-        mock_mm_conv.call.assert_called_once()
-        call_args = mock_mm_conv.call.call_args
-        assert call_args[1]["model"] == "qwen-vl-max"
-        assert call_args[1]["api_key"] == "test-api-key"
+    # Mock 成功响应（qwen3-vl 返回列表格式）
+    mock_mm_conv.call.return_value = _response(HTTPStatus.OK, [{"text": "这是测试需求：用户登录功能"}])
 
-    finally:
-        # 清理测试文件
-        Path(test_image_path).unlink(missing_ok=True)
+    result = await analyze(test_image_path, api_key="test-api-key", model="qwen-vl-max", use_cache=False)
+
+    # 验证结果
+    assert result == "这是测试需求：用户登录功能"
+
+    # 验证 API 被正确调用
+    mock_mm_conv.call.assert_called_once()
+    call_args = mock_mm_conv.call.call_args
+    assert call_args[1]["model"] == "qwen-vl-max"
+    assert call_args[1]["api_key"] == "test-api-key"
+
+
+@pytest.mark.asyncio
+@patch('app.llm.vision_engine.DASHSCOPE_AVAILABLE', True)
+@patch('app.llm.vision_engine.MultiModalConversation')
+async def test_rate_limited_call_is_retried_and_cached(mock_mm_conv, tmp_path, monkeypatch):
+    """Rate-limited calls are retried; a successful result is served from cache afterwards."""
+    from app.llm import vision_engine
+    from http import HTTPStatus
+
+    monkeypatch.setattr(vision_engine, "_INITIAL_DELAY", 0)
+    test_image_path = tmp_path / "page.png"
+    test_image_path.write_bytes(_PNG + os.urandom(8))
+    mock_mm_conv.call.side_effect = [
+        _response(HTTPStatus.TOO_MANY_REQUESTS, message="Throttling"),
+        _response(HTTPStatus.OK, "重试后的识别结果"),
+    ]
+
+    first = await vision_engine.analyze(test_image_path, api_key="test-api-key", model="qwen-vl-max")
+    second = await vision_engine.analyze(test_image_path, api_key="test-api-key", model="qwen-vl-max")
+
+    assert first == second == "重试后的识别结果"
+    assert mock_mm_conv.call.call_count == 2
+
+
+@pytest.mark.asyncio
+@patch('app.llm.vision_engine.DASHSCOPE_AVAILABLE', True)
+@patch('app.llm.vision_engine.MultiModalConversation')
+async def test_cancelled_call_is_charged_but_not_cached(mock_mm_conv, tmp_path, monkeypatch):
+    """A call cancelled in flight still settles its token usage but is not cached."""
+    import asyncio
+    import threading
+    from app.llm import rate_limiter, vision_engine
+    from http import HTTPStatus
+
+    test_image_path = tmp_path / "page.png"
+    test_image_path.write_bytes(_PNG + os.urandom(8))
+    started, release = threading.Event(), threading.Event()
+    response = _response(HTTPStatus.OK, "取消后才返回的结果")
+    response.usage = {"input_tokens": 3000, "output_tokens": 200}
+
+    def _call(**kwargs):
+        started.set()
+        release.wait(5)
+        return response
+
+    mock_mm_conv.call.side_effect = _call
+    charged = []
+
+    async def _consume(model, api_key, tokens, *, kind="chat"):
+        charged.append(tokens)
+
+    monkeypatch.setattr(rate_limiter, "consume", _consume)
+    task = asyncio.create_task(
+        vision_engine.analyze(test_image_path, api_key="test-api-key", model="qwen-vl-max")
+    )
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    release.set()
+    for _ in range(100):
+        if charged:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(charged) == 1 and charged[0] > 0
+    assert await vision_engine.image_cache.get_cached_extraction(test_image_path, "qwen-vl-max", "requirement") is None
+
+
+@pytest.mark.asyncio
+@patch('app.llm.vision_engine.DASHSCOPE_AVAILABLE', True)
+@patch('app.llm.vision_engine.MultiModalConversation')
+async def test_auth_error_is_not_retried(mock_mm_conv, tmp_path):
+    """Authentication errors fail immediately."""
+    from app.llm import vision_engine
+    from http import HTTPStatus
+
+    test_image_path = tmp_path / "page.png"
+    test_image_path.write_bytes(_PNG)
+    mock_mm_conv.call.return_value = _response(HTTPStatus.UNAUTHORIZED, message="Invalid API-key")
+
+    with pytest.raises(vision_engine.VisionAuthError):
+        await vision_engine.analyze(test_image_path, api_key="bad-key", model="qwen-vl-max", use_cache=False)
+    mock_mm_conv.call.assert_called_once()
 
 
-@patch('app.llm.vision_client.DASHSCOPE_AVAILABLE', False)
-def test_extract_requirements_from_image_dashscope_unavailable():
+@pytest.mark.asyncio
+@patch('app.llm.vision_engine.DASHSCOPE_AVAILABLE', False)
+async def test_extract_requirements_from_image_dashscope_unavailable(tmp_path):
     """Test handling when dashscope is not available."""
-    from app.llm.vision_client import extract_requirements_from_image
+    from app.llm.vision_engine import analyze
 
+    test_image_path = tmp_path / "page.png"
+    test_image_path.write_bytes(_PNG)
     with pytest.raises(ImportError, match="dashscope package is not installed"):
-        extract_requirements_from_image(
-            image_path="/fake/path.png",
-            api_key="test-key"
-        )
+        await analyze(test_image_path, api_key="test-key", model="qwen-vl-max")
 
 
-def test_extract_requirements_from_image_no_api_key():
+@pytest.mark.asyncio
+async def test_extract_requirements_from_image_no_api_key():
     """Test handling when API key is missing."""
-    from app.llm.vision_client import extract_requirements_from_image
+    from app.llm.vision_engine import analyze
 
     with pytest.raises(ValueError, match="api_key is required"):
-        extract_requirements_from_image(
-            image_path="/fake/path.png",
-            api_key=None
-        )
+        await analyze("/fake/path.png", api_key=None, model="qwen-vl-max")
 
 
-def test_extract_requirements_from_image_file_not_found():
+@pytest.mark.asyncio
+async def test_extract_requirements_from_image_file_not_found():
     """Test handling when image file doesn't exist."""
-    from app.llm.vision_client import extract_requirements_from_image
+    from app.llm.vision_engine import analyze
 
     with pytest.raises(FileNotFoundError):
-        extract_requirements_from_image(
-            image_path="/non/existent/path.png",
-            api_key="test-key"
-        )
+        await analyze("/non/existent/path.png", api_key="test-key", model="qwen-vl-max")
 
 
-@patch('app.parsers.text_extractor.is_vl_available', return_value=True)
-@patch('app.parsers.text_extractor.extract_requirements_from_image')
-def test_text_extractor_uses_vl_for_images(mock_extract, mock_is_available):
+@patch('app.llm.vision_engine.is_available', return_value=True)
+@patch('app.llm.vision_engine.analyze_sync')
+def test_text_extractor_uses_vl_for_images(mock_extract, mock_is_available, tmp_path):
     """Test that text extractor uses VL model for images."""
     from app.parsers.text_extractor import extract_text
-    import tempfile
 
-    # 创建临时图片文件
-    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-        test_image_path = f.name
-        f.write(b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82')
+    test_image_path = tmp_path / "upload"
+    test_image_path.write_bytes(_PNG)
 
-    try:
-        # Mock VL 提取结果
-        mock_extract.return_value = "VL 提取的需求内容"
+    # Mock VL 提取结果
+    mock_extract.return_value = "VL 提取的需求内容"
+
+    # 调用 extract_text
+    result = extract_text(test_image_path, original_name="test.png")
+
+    # 验证使用了 VL 模型
+    assert result == "VL 提取的需求内容"
+    mock_extract.assert_called_once()
 
-        # 调用 extract_text
-        result = extract_text(test_image_path, original_name="test.png")
 
-        # 验证使用了 VL 模型
-        assert result == "VL 提取的需求内容"
-        mock_extract.assert_called_once()
+@pytest.mark.asyncio
+async def test_analyze_sync_runs_on_bound_loop(monkeypatch):
+    """Synchronous callers in worker threads are served by the application loop."""
+    import asyncio
+    from app.llm import vision_engine
 
+    loops = []
+
+    async def _analyze(path, **kwargs):
+        loops.append(asyncio.get_running_loop())
+        return "识别结果"
+
+    monkeypatch.setattr(vision_engine, "analyze", _analyze)
+    await vision_engine.start()
+    try:
+        result = await asyncio.to_thread(vision_engine.analyze_sync, "page.png", model="qwen-vl-max")
     finally:
-        Path(test_image_path).unlink(missing_ok=True)
+        await vision_engine.shutdown()
+
+    assert result == "识别结果"
+    assert loops == [asyncio.get_running_loop()]
+
+
+def test_analyze_sync_requires_started_engine():
+    """Without a bound loop the shared Redis client has no loop to run on."""
+    from app.llm import vision_engine
+
+    with pytest.raises(RuntimeError, match="not started"):
+        vision_engine.analyze_sync("page.png", model="qwen-vl-max")
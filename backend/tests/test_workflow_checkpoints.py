@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal, init_models  # noqa: E402
+from app.db import session_repository  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_completed_stage_is_checkpointed_and_reused_after_restart():
+    """阶段输出写入 agent_runs，新的执行实例直接复用而不再调用 LLM"""
+    await init_models()
+    async with AsyncSessionLocal() as db_session:
+        session = await session_repository.create_session(
+            db_session, document_ids=[], config={}
+        )
+        await db_session.commit()
+        session_id = session.id
+
+    calls = 0
+
+    async def runner():
+        nonlocal calls
+        calls += 1
+        return {"modules": [{"name": "登录"}]}, "analysis markdown"
+
+    executor = SessionWorkflowExecution(session_id=session_id)
+    first = await executor._run_agent_stage(AgentStage.requirement_analysis, runner)
+
+    # 模拟进程重启：新的数据库会话和执行实例
+    async with AsyncSessionLocal() as db_session:
+        executor = SessionWorkflowExecution(session_id=session_id)
+        executor._checkpoints = await session_repository.list_stage_checkpoints(db_session, session_id)
+        resumed = await executor._run_agent_stage(AgentStage.requirement_analysis, runner)
+
+    assert calls == 1
+    assert resumed[:2] == first[:2] == ({"modules": [{"name": "登录"}]}, "analysis markdown")
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.llm.autogen_runner import resolve_agent_config  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator import deadlines  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+ALL_STAGES = list(deadlines.STAGE_WEIGHTS)
+
+
+@pytest.fixture(autouse=True)
+def _fallback_settings(monkeypatch):
+    monkeypatch.setattr(settings, "review_agent_model", "slow-model")
+    monkeypatch.setattr(settings, "review_agent_fallback_model", "flash-model")
+    monkeypatch.setattr(settings, "session_time_budget_seconds", 110)
+    monkeypatch.setattr(settings, "llm_fallback_latency_ms", 0)
+    deadlines.stage_latency.reset()
+    yield
+    deadlines.stage_latency.reset()
+
+
+def test_budget_is_shared_by_remaining_stages():
+    budget = deadlines.stage_budget(AgentStage.review, spent=0, remaining_stages=ALL_STAGES)
+    assert budget == pytest.approx(110 * 1.5 / 11)
+
+    # 前序阶段已完成，剩余预算只在剩下的阶段之间分配
+    budget = deadlines.stage_budget(
+        AgentStage.review,
+        spent=70,
+        remaining_stages=[AgentStage.review, AgentStage.test_completion],
+    )
+    assert budget == pytest.approx(40 * 1.5 / 4)
+
+
+def test_plan_switches_to_fallback_when_primary_is_too_slow():
+    plan = deadlines.plan_stage(AgentStage.review, spent=0, remaining_stages=ALL_STAGES)
+    assert not plan.use_fallback
+    assert plan.timeout == pytest.approx(15)
+
+    deadlines.stage_latency.observe("slow-model", AgentStage.review, 30)
+    plan = deadlines.plan_stage(AgentStage.review, spent=0, remaining_stages=ALL_STAGES)
+    assert plan.use_fallback
+
+    exhausted = deadlines.plan_stage(AgentStage.review, spent=200, remaining_stages=ALL_STAGES)
+    assert exhausted.use_fallback
+
+
+def test_plan_without_fallback_model_keeps_primary_without_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "review_agent_fallback_model", None)
+    plan = deadlines.plan_stage(AgentStage.review, spent=200, remaining_stages=ALL_STAGES)
+    assert plan == deadlines.StagePlan(timeout=None, use_fallback=False)
+
+
+@pytest.mark.asyncio
+async def test_stage_over_budget_is_retried_with_fallback_model(monkeypatch):
+    monkeypatch.setattr(settings, "session_time_budget_seconds", 1)
+    models: list[str] = []
+
+    async def _runner():
+        model = resolve_agent_config("review")["model"]
+        models.append(model)
+        if model == "slow-model":
+            await asyncio.sleep(10)
+        return {"summary": model}, model
+
+    executor = SessionWorkflowExecution(session_id="deadline-session")
+    payload, content, fallback = await executor._run_within_budget(AgentStage.review, _runner)
+
+    assert models == ["slow-model", "flash-model"]
+    assert fallback is True
+    assert content == "flash-model"
+    assert deadlines.stage_latency.estimate("slow-model", AgentStage.review) > 0
@@ -0,0 +1,53 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import init_models  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator.workflow import AnalysisWorkflow, SessionWorkflowExecution  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_drain_releases_sessions_waiting_for_confirmation(monkeypatch):
+    """停止服务时等待确认的会话立即让出，run 返回 False 以便恢复"""
+    await init_models()
+
+    async def _execute(self):
+        await self._wait_for_confirmation(AgentStage.requirement_analysis, timeout=60)
+
+    monkeypatch.setattr(SessionWorkflowExecution, "execute", _execute)
+    engine = AnalysisWorkflow()
+    await engine.launch("drain-session")
+    task = next(iter(engine._tasks))
+    await asyncio.sleep(0.05)
+    assert engine.is_awaiting_confirmation("drain-session")
+
+    await engine.drain(timeout=5)
+
+    assert task.result() is False
+    assert not engine.is_awaiting_confirmation("drain-session")
+    assert engine.draining
+    await engine.launch("late-session")
+    assert not engine._tasks
+
+
+@pytest.mark.asyncio
+async def test_drain_cancels_stages_still_running_at_deadline(monkeypatch):
+    await init_models()
+
+    async def _execute(self):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(SessionWorkflowExecution, "execute", _execute)
+    engine = AnalysisWorkflow()
+    await engine.launch("slow-session")
+    task = next(iter(engine._tasks))
+    await asyncio.sleep(0.01)
+
+    await engine.drain(timeout=0.05)
+
+    assert task.cancelled()
@@ -0,0 +1,43 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_prepare_documents_runs_concurrently_and_keeps_order(monkeypatch):
+    """并发预处理文档时并发数受限，且结果顺序与原始文档一致"""
+    monkeypatch.setattr(settings, "document_preprocess_concurrency", 2)
+
+    active = 0
+    peak = 0
+
+    async def fake_prepare(self, document, *, is_multimodal):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        # 越靠前的文档耗时越长，验证结果不按完成顺序排列
+        await asyncio.sleep(0.01 * (5 - int(document.id)))
+        active -= 1
+        return {"name": document.id, "type": "text", "content": "", "path": ""}
+
+    async def fake_emit(self, message, *, progress, status_value=None):
+        return None
+
+    monkeypatch.setattr(SessionWorkflowExecution, "_prepare_document", fake_prepare)
+    monkeypatch.setattr(SessionWorkflowExecution, "_emit_system_message", fake_emit)
+
+    executor = SessionWorkflowExecution(session_id="session-1")
+    documents = [SimpleNamespace(id=str(index)) for index in range(5)]
+
+    document_data = await executor._prepare_documents(documents)
+
+    assert [item["name"] for item in document_data] == ["0", "1", "2", "3", "4"]
+    assert peak == 2
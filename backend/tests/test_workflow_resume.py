@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.config import settings  # noqa: E402
+from app.db import AsyncSessionLocal, session_repository  # noqa: E402
+from app.models.session import SessionStatus  # noqa: E402
+from app.orchestrator import session_lease  # noqa: E402
+from app.orchestrator.workflow import AnalysisWorkflow, SessionWorkflowExecution  # noqa: E402
+
+
+@pytest.fixture
+def started(monkeypatch):
+    calls: list[str] = []
+
+    async def _execute(self):
+        calls.append(self.session_id)
+        await self._stop_event.wait()
+
+    monkeypatch.setattr(SessionWorkflowExecution, "execute", _execute)
+    return calls
+
+
+def _only(monkeypatch, session_ids: list[str]) -> None:
+    original = session_repository.list_resumable_sessions
+
+    async def _list(db_session, **kwargs):
+        return [item for item in await original(db_session, **kwargs) if item.id in session_ids]
+
+    monkeypatch.setattr(session_repository, "list_resumable_sessions", _list)
+
+
+async def _stop(*engines: AnalysisWorkflow) -> None:
+    for engine in engines:
+        await engine.drain(timeout=1)
+        if engine._adopter is not None:
+            await engine._adopter
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_sessions_owned_by_a_live_process(monkeypatch, started, create_session):
+    """另一个进程仍持有租约的会话不会被重复启动"""
+    session_id = await create_session(SessionStatus.processing)
+    _only(monkeypatch, [session_id])
+    owner, restarted = AnalysisWorkflow(), AnalysisWorkflow()
+
+    assert await owner.launch(session_id) is not None
+    await asyncio.sleep(0.01)
+
+    assert await restarted.resume_interrupted() == []
+    assert not restarted._tasks
+    assert started == [session_id]
+
+    await _stop(owner, restarted)
+    assert not await session_lease.is_held(session_id)
+
+
+@pytest.mark.asyncio
+async def test_session_of_crashed_owner_is_adopted_after_lease_expires(monkeypatch, started, create_session):
+    monkeypatch.setattr(settings, "workflow_lease_seconds", 0.05)
+    session_id = await create_session(SessionStatus.processing)
+    _only(monkeypatch, [session_id])
+    # 持有者崩溃：租约不再续约
+    assert await session_lease.acquire(session_id, "crashed-process")
+    engine = AnalysisWorkflow()
+
+    assert await engine.resume_interrupted() == []
+    for _ in range(50):
+        if started:
+            break
+        await asyncio.sleep(0.02)
+
+    assert started == [session_id]
+    await _stop(engine)
+
+
+@pytest.mark.asyncio
+async def test_recently_created_sessions_are_left_to_their_creator(monkeypatch, started, create_session):
+    monkeypatch.setattr(settings, "workflow_resume_grace_seconds", 3600)
+    fresh = await create_session(SessionStatus.created)
+    interrupted = await create_session(SessionStatus.processing)
+    _only(monkeypatch, [fresh, interrupted])
+    engine = AnalysisWorkflow()
+
+    assert await engine.resume_interrupted() == [interrupted]
+
+    monkeypatch.setattr(settings, "workflow_resume_grace_seconds", 0)
+    assert await engine.resume_interrupted() == [fresh]
+    await asyncio.sleep(0.01)
+    assert sorted(started) == sorted([fresh, interrupted])
+    await _stop(engine)
+
+
+@pytest.mark.asyncio
+async def test_execute_leaves_finished_sessions_alone(create_session):
+    session_id = await create_session(SessionStatus.completed)
+
+    await SessionWorkflowExecution(session_id=session_id).execute()
+
+    async with AsyncSessionLocal() as db_session:
+        session = await session_repository.get_session(db_session, session_id)
+    assert session.status == SessionStatus.completed
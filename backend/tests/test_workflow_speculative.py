@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal  # noqa: E402
+from app.db import session_repository  # noqa: E402
+from app.models.session import AgentStage  # noqa: E402
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_confirmed_edits_are_detected_and_survive_restart(create_session):
+    """用户修改需求分析时丢弃推测结果，修改内容写入检查点供恢复使用"""
+    session_id = await create_session()
+    original = {"modules": [{"name": "登录"}]}
+    edited = {"modules": [{"name": "登录"}, {"name": "注册"}]}
+
+    async def runner():
+        return original, "analysis markdown"
+
+    executor = SessionWorkflowExecution(session_id=session_id)
+    await executor._run_agent_stage(AgentStage.requirement_analysis, runner)
+
+    # 未修改直接确认：推测结果可以复用
+    unchanged = await executor._apply_confirmed_edits(
+        AgentStage.requirement_analysis, {"confirmed": True, "payload": original}, original
+    )
+    assert unchanged == (original, False)
+
+    changed = await executor._apply_confirmed_edits(
+        AgentStage.requirement_analysis, {"confirmed": True, "payload": edited}, original
+    )
+    assert changed == (edited, True)
+
+    async with AsyncSessionLocal() as db_session:
+        executor = SessionWorkflowExecution(session_id=session_id)
+        executor._checkpoints = await session_repository.list_stage_checkpoints(db_session, session_id)
+        resumed = await executor._apply_confirmed_edits(AgentStage.requirement_analysis, None, original)
+
+    assert resumed == (edited, True)
+
+
+@pytest.mark.asyncio
+async def test_failed_speculation_falls_back_to_regular_generation(create_session):
+    session_id = await create_session()
+
+    executor = SessionWorkflowExecution(session_id=session_id)
+    calls = []
+
+    async def _generate(analysis_payload):
+        calls.append(analysis_payload)
+        return {"modules": []}, "regenerated"
+
+    executor._generate_test_cases = _generate
+
+    async def _broken():
+        raise RuntimeError("模型超时")
+
+    speculative = asyncio.create_task(_broken())
+    payload, content = await executor._await_speculative(speculative, {"modules": [{"name": "登录"}]})
+
+    assert content == "regenerated"
+    assert calls == [{"modules": [{"name": "登录"}]}]
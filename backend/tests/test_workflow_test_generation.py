@@ -0,0 +1,107 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.orchestrator.workflow import SessionWorkflowExecution  # noqa: E402
+
+workflow_module = importlib.import_module("app.orchestrator.workflow")
+
+
+def _module_markdown(name: str) -> str:
+    return (
+        f"## {name}\n\n"
+        "| 用例ID | 标题 | 前置条件 | 测试步骤 | 预期结果 | 优先级 |\n"
+        "|---|---|---|---|---|---|\n"
+        f"| TC-{name}-01 | {name}成功 | 无 | 执行{name} | 成功 | P0 |\n"
+    )
+
+
+@pytest.mark.asyncio
+async def test_modules_are_generated_concurrently_and_merged(monkeypatch):
+    """每个模块独立生成并立即推送；单个模块失败不影响其他模块"""
+    broadcasts = []
+
+    async def _broadcast(session_id, message):
+        broadcasts.append(message)
+
+    monkeypatch.setattr(workflow_module.manager, "broadcast", _broadcast)
+    monkeypatch.setattr(workflow_module.settings, "test_generation_concurrency", 2)
+
+    executor = SessionWorkflowExecution(session_id="session-1")
+    running = 0
+    peak = 0
+
+    async def _call_agent(stage, agent_type, func, module, analysis_payload, on_chunk):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if module["name"] == "支付":
+            raise RuntimeError("模型超时")
+        return {}, _module_markdown(module["name"])
+
+    executor._call_agent = _call_agent
+
+    analysis = {"modules": [{"name": "登录"}, {"name": "支付"}, {"name": "注册"}]}
+    payload, content = await executor._generate_test_cases(analysis)
+
+    assert peak == 2
+    assert [module["name"] for module in payload["modules"]] == ["登录", "注册"]
+    assert content.index("## 登录") < content.index("## 注册")
+    events = {event["module"]: event for event in broadcasts if event["type"] == "module_test_cases"}
+    assert events["登录"]["payload"]["modules"][0]["cases"][0]["id"] == "TC-登录-01"
+    assert events["支付"]["error"] == "模型超时"
+    assert sorted(event["completed"] for event in events.values()) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_edited_analysis_only_regenerates_changed_modules(monkeypatch):
+    """修改分析结果后只重新生成内容变化的模块，未修改模块复用推测执行中的结果"""
+
+    async def _broadcast(session_id, message):
+        return None
+
+    monkeypatch.setattr(workflow_module.manager, "broadcast", _broadcast)
+    executor = SessionWorkflowExecution(session_id="session-delta")
+    release = asyncio.Event()
+    calls = []
+
+    async def _call_agent(stage, agent_type, func, module, analysis_payload, on_chunk):
+        calls.append(module["name"])
+        await release.wait()
+        return {}, _module_markdown(module["name"])
+
+    executor._call_agent = _call_agent
+
+    original = {
+        "modules": [
+            {"name": "登录", "rules": ["密码至少8位"]},
+            {"name": "支付", "rules": ["单笔限额5000"]},
+        ]
+    }
+    edited = {
+        "modules": [
+            {"name": "登录", "rules": ["密码至少8位"]},
+            {"name": "支付", "rules": ["单笔限额2000"]},
+        ]
+    }
+
+    speculative = asyncio.create_task(executor._generate_test_cases(original))
+    await asyncio.sleep(0.01)
+    assert executor._discard_stale_modules(edited) == 1
+
+    regenerated = asyncio.create_task(executor._generate_test_cases(edited))
+    await asyncio.sleep(0.01)
+    release.set()
+    payload, content = await regenerated
+    await asyncio.gather(speculative, return_exceptions=True)
+
+    assert sorted(calls) == ["支付", "支付", "登录"]
+    assert [module["name"] for module in payload["modules"]] == ["登录", "支付"]
+    assert "## 登录" in content
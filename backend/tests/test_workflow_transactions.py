@@ -0,0 +1,104 @@
+import importlib
+import os
+
+import pytest
+
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("LLM_MODE", "mock")
+
+from app.db import AsyncSessionLocal  # noqa: E402
+from app.db import session_repository  # noqa: E402
+from app.models.session import AgentStage, SessionStatus  # noqa: E402
+
+workflow_module = importlib.import_module("app.orchestrator.workflow")
+
+
+class _CountingSessionFactory:
+    """记录工作流打开的数据库会话数量及当前仍未关闭的会话数量"""
+
+    def __init__(self):
+        self.opened = 0
+        self.active = 0
+
+    def __call__(self):
+        factory = self
+
+        class _Session:
+            async def __aenter__(self):
+                factory.opened += 1
+                factory.active += 1
+                self._session = AsyncSessionLocal()
+                return await self._session.__aenter__()
+
+            async def __aexit__(self, *exc_info):
+                factory.active -= 1
+                return await self._session.__aexit__(*exc_info)
+
+        return _Session()
+
+
+async def _load(session_id: str):
+    async with AsyncSessionLocal() as db_session:
+        return await session_repository.get_session(db_session, session_id)
+
+
+@pytest.mark.asyncio
+async def test_status_updates_are_batched_into_the_next_write(monkeypatch, create_session):
+    session_id = await create_session()
+    sessions = _CountingSessionFactory()
+    monkeypatch.setattr(workflow_module, "AsyncSessionLocal", sessions)
+    executor = workflow_module.SessionWorkflowExecution(session_id=session_id)
+
+    for progress in (0.3, 0.4):
+        await executor._handle_stage_result(
+            workflow_module.StageResult(
+                stage=AgentStage.requirement_analysis,
+                sender="需求分析师",
+                content="",
+                payload={},
+                progress=progress,
+            )
+        )
+    assert sessions.opened == 0
+
+    async def runner():
+        return {"modules": []}, "markdown"
+
+    await executor._run_agent_stage(AgentStage.test_generation, runner)
+
+    # 两次状态变更与检查点在同一个事务中写入，且只保留最新的进度
+    assert sessions.opened == 1
+    assert sessions.active == 0
+    session = await _load(session_id)
+    assert session.status == SessionStatus.processing
+    assert session.progress == 0.4
+
+
+@pytest.mark.asyncio
+async def test_no_connection_is_held_while_waiting_for_confirmation(monkeypatch, create_session):
+    session_id = await create_session()
+    sessions = _CountingSessionFactory()
+    monkeypatch.setattr(workflow_module, "AsyncSessionLocal", sessions)
+    executor = workflow_module.SessionWorkflowExecution(session_id=session_id)
+    observed = {}
+
+    async def _wait(stage, timeout=300):
+        observed["active"] = sessions.active
+        observed["status"] = (await _load(session_id)).status
+        return {"confirmed": True}
+
+    executor._wait_for_confirmation = _wait
+    await executor._handle_stage_result(
+        workflow_module.StageResult(
+            stage=AgentStage.requirement_analysis,
+            sender="需求分析师",
+            content="",
+            payload={},
+            progress=0.3,
+        ),
+        skip_confirmation=False,
+        needs_confirmation=True,
+    )
+
+    # 等待确认前状态已写入，等待期间不占用数据库连接
+    assert observed == {"active": 0, "status": SessionStatus.awaiting_confirmation}